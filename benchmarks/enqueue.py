@@ -0,0 +1,339 @@
+"""
+Enqueue throughput and latency benchmarks against local provider stand-ins.
+
+Drives the provider helpers and the routes built by the delayed route builders
+against the fakes in benchmarks/fakes.py at several concurrency levels and payload
+sizes, and reports ops/sec with p50/p95/p99 latency. Results are written to
+benchmarks/results/<git sha>.json so runs can be compared across commits:
+
+    python benchmarks/enqueue.py
+    python benchmarks/enqueue.py --compare benchmarks/results/<older sha>.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+sys.path.insert(0, str(REPO_ROOT))
+
+from fastapi import APIRouter, FastAPI  # noqa: E402
+
+from benchmarks.fakes import FakeAWS, FakeGoogleCloud  # noqa: E402
+
+QUEUE_PATH = "projects/bench/locations/local/queues/bench"
+LOCATION_PATH = "projects/bench/locations/local"
+BASE_URL = "https://bench.invalid"
+
+
+def make_body(payload_bytes: int) -> dict:
+    # json.dumps adds the key and quotes, close enough for sizing
+    return {"data": "x" * max(payload_bytes - 12, 0)}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run_threaded(operation: Callable[[], object], *, ops: int, concurrency: int) -> dict:
+    def worker(count: int) -> list[float]:
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    shares = [ops // concurrency + (1 if index < ops % concurrency else 0) for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for result in results for latency in result], elapsed)
+
+
+async def run_async(operation: Callable[[], object], *, ops: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    remaining = iter(range(ops))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await operation()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def gcp_scenarios(google: FakeGoogleCloud):
+    from fastapi_cloud_tasks.delayed_route import GCPDelayedRouteBuilder
+    from fastapi_cloud_tasks.providers.gcp.delayer import gcp_create_delay_task, gcp_create_delay_task_async
+    from fastapi_cloud_tasks.providers.gcp.scheduler import gcp_create_scheduler_job
+    from fastapi_cloud_tasks.resilience import CircuitBreaker, EnqueuePolicy
+
+    tasks_client = google.tasks_client()
+    scheduler_client = google.scheduler_client()
+
+    def create_delay_task(body):
+        return lambda: gcp_create_delay_task(
+            client=tasks_client,
+            queue_path=QUEUE_PATH,
+            endpoint_url=f"{BASE_URL}/delay",
+            http_method="POST",
+            body=body,
+        )
+
+    def create_scheduler_job(body):
+        return lambda: gcp_create_scheduler_job(
+            name=f"bench-{uuid.uuid4().hex}",
+            schedule="* * * * *",
+            base_url=BASE_URL,
+            location_path=LOCATION_PATH,
+            client=scheduler_client,
+            endpoint_url=f"{BASE_URL}/schedule",
+            http_method="POST",
+            body=body,
+        )
+
+    DelayedRoute = GCPDelayedRouteBuilder(
+        base_url=BASE_URL,
+        queue_path=QUEUE_PATH,
+        client=tasks_client,
+        auto_create_queue=False,
+    )
+    router = APIRouter(route_class=DelayedRoute)
+
+    @router.post("/delay")
+    async def delay_route():
+        return {}
+
+    FastAPI().include_router(router)
+
+    def route_delay(body):
+        return lambda: delay_route.delay(body=body)
+
+    # A breaker held open with a fallback: delay_many must hand back the fallback per body, not fail
+    breaker = CircuitBreaker(minimum_calls=1, open_seconds=3600)
+    breaker.record_failure()
+    OpenCircuitRoute = GCPDelayedRouteBuilder(
+        base_url=BASE_URL,
+        queue_path=QUEUE_PATH,
+        client=tasks_client,
+        auto_create_queue=False,
+        resilience=EnqueuePolicy(circuit_breaker=breaker, fallback=lambda exc, task: "parked"),
+    )
+    open_circuit_router = APIRouter(route_class=OpenCircuitRoute)
+
+    @open_circuit_router.post("/delay-open-circuit")
+    async def open_circuit_route():
+        return {}
+
+    FastAPI().include_router(open_circuit_router)
+
+    def route_delay_many_open_circuit(body):
+        def operation():
+            summary = open_circuit_route.delay_many([body] * 10, concurrency=4)
+            if summary.failed or len(summary.results) != 10:
+                raise RuntimeError(f"delay_many with an open circuit lost results: {summary}")
+
+        return operation
+
+    yield "gcp_create_delay_task", "threads", create_delay_task
+    yield "gcp_create_scheduler_job", "threads", create_scheduler_job
+    yield "GCPDelayedRouteBuilder.delay", "threads", route_delay
+    yield "GCPDelayedRouteBuilder.delay_many (open)", "threads", route_delay_many_open_circuit
+
+    async_clients = {}
+
+    def create_delay_task_async(body):
+        async def operation():
+            loop = asyncio.get_running_loop()
+            if loop not in async_clients:
+                async_clients[loop] = google.tasks_async_client()
+            return await gcp_create_delay_task_async(
+                client=async_clients[loop],
+                queue_path=QUEUE_PATH,
+                endpoint_url=f"{BASE_URL}/delay",
+                http_method="POST",
+                body=body,
+            )
+
+        return operation
+
+    yield "gcp_create_delay_task_async", "asyncio", create_delay_task_async
+
+
+def aws_scenarios(aws: FakeAWS):
+    from fastapi_cloud_tasks.delayed_route import AWSDelayedRouteBuilder
+    from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry
+    from fastapi_cloud_tasks.providers.aws.delayer import aws_create_delay_task
+
+    clients = AWSClientRegistry(region_name=aws.region_name, clients=aws.clients())
+    sqs_client = clients.client("sqs")
+    queue_url = sqs_client.create_queue(QueueName="bench")["QueueUrl"]
+
+    def create_delay_task(body):
+        return lambda: aws_create_delay_task(
+            sqs_client=sqs_client,
+            lambda_client=None,
+            role_arn=None,
+            lambda_arn=None,
+            queue_url=queue_url,
+            endpoint_url=f"{BASE_URL}/delay",
+            body=body,
+            delay_seconds=0,
+        )
+
+    DelayedRoute = AWSDelayedRouteBuilder(base_url=BASE_URL, clients=clients)
+    router = APIRouter(route_class=DelayedRoute)
+
+    @router.post("/delay")
+    async def delay_route():
+        return {}
+
+    FastAPI().include_router(router)
+
+    def route_delay(body):
+        return lambda: delay_route.delay(body=body)
+
+    yield "aws_create_delay_task", "threads", create_delay_task
+    yield "AWSDelayedRouteBuilder.delay", "threads", route_delay
+
+
+def run_benchmarks(args) -> list[dict]:
+    results = []
+
+    with FakeGoogleCloud(latency_seconds=args.fake_latency_ms / 1000) as google:
+        aws = FakeAWS(latency_seconds=args.fake_latency_ms / 1000)
+        scenarios = [*gcp_scenarios(google), *aws_scenarios(aws)]
+
+        for name, mode, factory in scenarios:
+            if args.only and not any(selected in name for selected in args.only):
+                continue
+            for payload_bytes in args.payload_bytes:
+                operation = factory(make_body(payload_bytes))
+                for concurrency in args.concurrency:
+                    # Warm up connections and caches before measuring
+                    if mode == "asyncio":
+                        async def measure():
+                            await run_async(operation, ops=min(args.ops, 50), concurrency=concurrency)
+                            return await run_async(operation, ops=args.ops, concurrency=concurrency)
+
+                        stats = asyncio.run(measure())
+                    else:
+                        run_threaded(operation, ops=min(args.ops, 50), concurrency=concurrency)
+                        stats = run_threaded(operation, ops=args.ops, concurrency=concurrency)
+
+                    result = {
+                        "scenario": name,
+                        "mode": mode,
+                        "payload_bytes": payload_bytes,
+                        "concurrency": concurrency,
+                        **stats,
+                    }
+                    results.append(result)
+                    print(
+                        f"{name:<34} {payload_bytes:>7}B c={concurrency:<4} "
+                        f"{stats['ops_per_sec']:>9.0f} ops/s  p50={stats['p50_ms']:.2f}ms "
+                        f"p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+                    )
+
+    return results
+
+
+def git_revision() -> str:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = json.loads(baseline_path.read_text())
+    previous = {
+        (row["scenario"], row["payload_bytes"], row["concurrency"]): row for row in baseline["results"]
+    }
+
+    print(f"\nCompared with {baseline['revision']} ({baseline_path.name}):")
+    for row in results:
+        old = previous.get((row["scenario"], row["payload_bytes"], row["concurrency"]))
+        if old is None or not old["ops_per_sec"]:
+            continue
+        throughput = (row["ops_per_sec"] - old["ops_per_sec"]) / old["ops_per_sec"] * 100
+        p99 = (row["p99_ms"] - old["p99_ms"]) / old["p99_ms"] * 100 if old["p99_ms"] else 0.0
+        print(
+            f"{row['scenario']:<34} {row['payload_bytes']:>7}B c={row['concurrency']:<4} "
+            f"ops/s {throughput:+6.1f}%  p99 {p99:+6.1f}%"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=500, help="operations per measurement")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--payload-bytes", type=int, nargs="+", default=[128, 4096, 65536])
+    parser.add_argument("--fake-latency-ms", type=float, default=0.0, help="simulated round-trip time of the fakes")
+    parser.add_argument("--only", nargs="+", help="run scenarios whose name contains one of these strings")
+    parser.add_argument("--output", type=Path, help="where to write results, defaults to benchmarks/results/<sha>.json")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    revision = git_revision()
+    output = args.output or RESULTS_DIR / f"{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "revision": revision,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "fake_latency_ms": args.fake_latency_ms,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
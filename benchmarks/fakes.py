@@ -0,0 +1,287 @@
+"""
+Local stand-ins for the cloud APIs used by the benchmarks.
+
+FakeGoogleCloud serves Cloud Tasks and Cloud Scheduler over a real in-process gRPC
+server, so the GAPIC clients, protobuf serialization and the gRPC channel are all
+exercised. FakeAWS mimics the boto3 clients the package calls for SQS, EventBridge,
+Lambda and IAM and can be plugged into an AWSClientRegistry.
+"""
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.cloud import scheduler_v1, tasks_v2
+from google.cloud.scheduler_v1.services.cloud_scheduler.transports import CloudSchedulerGrpcTransport
+from google.cloud.tasks_v2.services.cloud_tasks.transports import (
+    CloudTasksGrpcAsyncIOTransport,
+    CloudTasksGrpcTransport,
+)
+from google.protobuf import empty_pb2
+
+
+class FakeGoogleCloud:
+    def __init__(self, *, latency_seconds: float = 0.0, max_workers: int = 64):
+        self.latency_seconds = latency_seconds
+        self.queues: dict[str, tasks_v2.Queue] = {}
+        self.tasks: dict[str, tasks_v2.Task] = {}
+        self.jobs: dict[str, scheduler_v1.Job] = {}
+        self.calls: dict[str, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self._server = grpc.server(ThreadPoolExecutor(max_workers=max_workers))
+        self._server.add_generic_rpc_handlers(
+            (
+                self._handlers(
+                    "google.cloud.tasks.v2.CloudTasks",
+                    {
+                        "GetQueue": (tasks_v2.GetQueueRequest, tasks_v2.Queue, self._get_queue),
+                        "CreateQueue": (tasks_v2.CreateQueueRequest, tasks_v2.Queue, self._create_queue),
+                        "UpdateQueue": (tasks_v2.UpdateQueueRequest, tasks_v2.Queue, self._update_queue),
+                        "CreateTask": (tasks_v2.CreateTaskRequest, tasks_v2.Task, self._create_task),
+                    },
+                ),
+                self._handlers(
+                    "google.cloud.scheduler.v1.CloudScheduler",
+                    {
+                        "ListJobs": (scheduler_v1.ListJobsRequest, scheduler_v1.ListJobsResponse, self._list_jobs),
+                        "GetJob": (scheduler_v1.GetJobRequest, scheduler_v1.Job, self._get_job),
+                        "CreateJob": (scheduler_v1.CreateJobRequest, scheduler_v1.Job, self._create_job),
+                        "UpdateJob": (scheduler_v1.UpdateJobRequest, scheduler_v1.Job, self._update_job),
+                        "DeleteJob": (scheduler_v1.DeleteJobRequest, None, self._delete_job),
+                    },
+                ),
+            )
+        )
+        self.port = self._server.add_insecure_port("127.0.0.1:0")
+        self.address = f"127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self._server.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.stop(grace=None)
+
+    def tasks_client(self) -> tasks_v2.CloudTasksClient:
+        return tasks_v2.CloudTasksClient(transport=CloudTasksGrpcTransport(channel=grpc.insecure_channel(self.address)))
+
+    def tasks_async_client(self) -> tasks_v2.CloudTasksAsyncClient:
+        # Must be called with the event loop that will use the client running
+        channel = grpc.aio.insecure_channel(self.address)
+        return tasks_v2.CloudTasksAsyncClient(transport=CloudTasksGrpcAsyncIOTransport(channel=channel))
+
+    def scheduler_client(self) -> scheduler_v1.CloudSchedulerClient:
+        channel = grpc.insecure_channel(self.address)
+        return scheduler_v1.CloudSchedulerClient(transport=CloudSchedulerGrpcTransport(channel=channel))
+
+    def _handlers(self, service: str, methods: dict):
+        handlers = {}
+        for name, (request_type, response_type, implementation) in methods.items():
+            handlers[name] = grpc.unary_unary_rpc_method_handler(
+                self._timed(name, implementation),
+                request_deserializer=request_type.deserialize,
+                response_serializer=(response_type.serialize if response_type else empty_pb2.Empty.SerializeToString),
+            )
+        return grpc.method_handlers_generic_handler(service, handlers)
+
+    def _timed(self, name, implementation):
+        def handler(request, context):
+            with self._lock:
+                self.calls[name] = self.calls.get(name, 0) + 1
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds)
+            return implementation(request, context)
+
+        return handler
+
+    def _get_queue(self, request, context):
+        with self._lock:
+            queue = self.queues.get(request.name)
+        if queue is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Queue {request.name} not found")
+        return queue
+
+    def _create_queue(self, request, context):
+        with self._lock:
+            if request.queue.name in self.queues:
+                context.abort(grpc.StatusCode.ALREADY_EXISTS, f"Queue {request.queue.name} exists")
+            self.queues[request.queue.name] = request.queue
+        return request.queue
+
+    def _update_queue(self, request, context):
+        with self._lock:
+            queue = self.queues.get(request.queue.name)
+            if queue is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Queue {request.queue.name} not found")
+            merged = tasks_v2.Queue.pb(queue).__deepcopy__()
+            request.update_mask.MergeMessage(tasks_v2.Queue.pb(request.queue), merged)
+            self.queues[request.queue.name] = tasks_v2.Queue.wrap(merged)
+            return self.queues[request.queue.name]
+
+    def _create_task(self, request, context):
+        task = request.task
+        name = task.name or f"{request.parent}/tasks/{next(self._ids)}"
+        with self._lock:
+            if name in self.tasks:
+                context.abort(grpc.StatusCode.ALREADY_EXISTS, f"Task {name} exists")
+            # Only the name is kept, storing every body would make memory the bottleneck
+            self.tasks[name] = tasks_v2.Task(name=name)
+        return tasks_v2.Task(name=name, schedule_time=task.schedule_time, http_request=task.http_request)
+
+    def _list_jobs(self, request, context):
+        with self._lock:
+            jobs = [job for name, job in self.jobs.items() if name.startswith(f"{request.parent}/jobs/")]
+        return scheduler_v1.ListJobsResponse(jobs=jobs)
+
+    def _get_job(self, request, context):
+        with self._lock:
+            job = self.jobs.get(request.name)
+        if job is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Job {request.name} not found")
+        return job
+
+    def _create_job(self, request, context):
+        with self._lock:
+            if request.job.name in self.jobs:
+                context.abort(grpc.StatusCode.ALREADY_EXISTS, f"Job {request.job.name} exists")
+            self.jobs[request.job.name] = request.job
+        return request.job
+
+    def _update_job(self, request, context):
+        with self._lock:
+            job = self.jobs.get(request.job.name)
+            if job is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Job {request.job.name} not found")
+            merged = scheduler_v1.Job.pb(job).__deepcopy__()
+            request.update_mask.MergeMessage(scheduler_v1.Job.pb(request.job), merged)
+            self.jobs[request.job.name] = scheduler_v1.Job.wrap(merged)
+            return self.jobs[request.job.name]
+
+    def _delete_job(self, request, context):
+        with self._lock:
+            if self.jobs.pop(request.name, None) is None:
+                context.abort(grpc.StatusCode.NOT_FOUND, f"Job {request.name} not found")
+        return empty_pb2.Empty()
+
+
+class _FakeAWSService:
+    def __init__(self, fake: "FakeAWS", service_name: str):
+        self._fake = fake
+        self._service_name = service_name
+
+    def __getattr__(self, operation: str):
+        implementation = getattr(self._fake, f"_{self._service_name}_{operation}", None)
+        if implementation is None:
+            raise AttributeError(f"FakeAWS does not implement {self._service_name}.{operation}")
+
+        def call(**kwargs):
+            with self._fake.lock:
+                key = f"{self._service_name}.{operation}"
+                self._fake.calls[key] = self._fake.calls.get(key, 0) + 1
+            if self._fake.latency_seconds:
+                time.sleep(self._fake.latency_seconds)
+            return implementation(**kwargs)
+
+        return call
+
+
+class FakeAWS:
+    """
+    In-memory SQS, EventBridge, Lambda and IAM. Only the operations the package uses
+    are implemented; each call sleeps `latency_seconds` to stand in for the network.
+    """
+
+    def __init__(self, *, latency_seconds: float = 0.0, region_name: str = "us-east-1"):
+        self.latency_seconds = latency_seconds
+        self.region_name = region_name
+        self.lock = threading.Lock()
+        self.calls: dict[str, int] = {}
+        self.messages: dict[str, list[dict]] = {}
+        self.rules: dict[str, dict] = {}
+        self.targets: dict[str, dict[str, dict]] = {}
+        self.functions: dict[str, str] = {}
+
+    def clients(self) -> dict:
+        return {name: _FakeAWSService(self, name) for name in ("sqs", "events", "lambda", "iam", "scheduler")}
+
+    # IAM
+    def _iam_create_role(self, RoleName, **kwargs):
+        return {"Role": {"Arn": f"arn:aws:iam::000000000000:role/{RoleName}"}}
+
+    def _iam_put_role_policy(self, **kwargs):
+        return {}
+
+    # Lambda
+    def _lambda_create_function(self, FunctionName, **kwargs):
+        arn = f"arn:aws:lambda:{self.region_name}:000000000000:function:{FunctionName}"
+        self.functions[FunctionName] = arn
+        return {"Configuration": {"FunctionArn": arn}}
+
+    def _lambda_create_event_source_mapping(self, **kwargs):
+        return {"UUID": uuid.uuid4().hex}
+
+    def _lambda_add_permission(self, **kwargs):
+        return {}
+
+    # SQS
+    def _sqs_create_queue(self, QueueName, **kwargs):
+        with self.lock:
+            self.messages.setdefault(QueueName, [])
+        return {"QueueUrl": f"https://sqs.{self.region_name}.amazonaws.com/000000000000/{QueueName}"}
+
+    def _sqs_get_queue_attributes(self, QueueUrl, **kwargs):
+        name = QueueUrl.rsplit("/", 1)[-1]
+        return {"Attributes": {"QueueArn": f"arn:aws:sqs:{self.region_name}:000000000000:{name}"}}
+
+    def _sqs_send_message(self, QueueUrl, MessageBody, **kwargs):
+        message_id = uuid.uuid4().hex
+        with self.lock:
+            self.messages.setdefault(QueueUrl, []).append({"MessageId": message_id, "Size": len(MessageBody)})
+        return {"MessageId": message_id}
+
+    def _sqs_send_message_batch(self, QueueUrl, Entries):
+        successful = []
+        with self.lock:
+            for entry in Entries:
+                message_id = uuid.uuid4().hex
+                self.messages.setdefault(QueueUrl, []).append({"MessageId": message_id, "Size": len(entry["MessageBody"])})
+                successful.append({"Id": entry["Id"], "MessageId": message_id})
+        return {"Successful": successful, "Failed": []}
+
+    # EventBridge
+    def _events_put_rule(self, Name, **kwargs):
+        with self.lock:
+            self.rules[Name] = kwargs
+        return {"RuleArn": f"arn:aws:events:{self.region_name}:000000000000:rule/{Name}"}
+
+    def _events_put_targets(self, Rule, Targets):
+        with self.lock:
+            rule_targets = self.targets.setdefault(Rule, {})
+            for target in Targets:
+                rule_targets[target["Id"]] = target
+        return {"FailedEntryCount": 0, "FailedEntries": []}
+
+    def _events_list_targets_by_rule(self, Rule, **kwargs):
+        with self.lock:
+            return {"Targets": list(self.targets.get(Rule, {}).values())}
+
+    def _events_describe_rule(self, Name, **kwargs):
+        with self.lock:
+            rule = self.rules.get(Name)
+        return {"Name": Name, **(rule or {})}
+
+    def _events_remove_targets(self, Rule, Ids, **kwargs):
+        with self.lock:
+            for target_id in Ids:
+                self.targets.get(Rule, {}).pop(target_id, None)
+        return {"FailedEntryCount": 0, "FailedEntries": []}
+
+    def _events_delete_rule(self, Name, **kwargs):
+        with self.lock:
+            self.rules.pop(Name, None)
+            self.targets.pop(Name, None)
+        return {}
@@ -0,0 +1,95 @@
+"""
+Import-time budget check for the base package.
+
+Runs `python -X importtime` on the route modules in a fresh interpreter, and fails
+(exit code 1) when a provider SDK is imported eagerly or when the package's own
+import cost, on top of FastAPI which it is built on, exceeds the budget.
+
+    python benchmarks/import_time.py --budget-ms 30 --runs 5
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+BASE_IMPORT = "import fastapi_cloud_tasks.delayed_route, fastapi_cloud_tasks.scheduled_route"
+
+# FastAPI is imported first so its cost is reported on its own instead of inside the package's
+STATEMENT = f"import fastapi, fastapi.routing; {BASE_IMPORT}"
+
+# Nothing under these may be imported until a provider builder is called
+FORBIDDEN_PREFIXES = (
+    "google.cloud.tasks_v2",
+    "google.cloud.scheduler_v1",
+    "google.protobuf",
+    "grpc",
+    "boto3",
+    "botocore",
+    "pydantic.v1",
+)
+
+LINE_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(statement: str) -> tuple[int, int, list[str]]:
+    """
+    Returns (cumulative us of the package, cumulative us of fastapi, imported module names).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    package = 0
+    fastapi = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        modules.append(name)
+        if len(indent) > 1:
+            continue
+        if name.startswith("fastapi_cloud_tasks"):
+            package += int(cumulative)
+        elif name.startswith("fastapi"):
+            fastapi += int(cumulative)
+
+    return package, fastapi, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=30.0, help="allowed package overhead on top of FastAPI")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to sample, the fastest run counts")
+    args = parser.parse_args()
+
+    samples = [measure(STATEMENT) for _ in range(args.runs)]
+    package, fastapi, modules = min(samples, key=lambda sample: sample[0])
+    overhead_ms = package / 1000
+
+    print(f"base import: {overhead_ms:.1f} ms package, {fastapi / 1000:.1f} ms fastapi")
+
+    failed = False
+
+    eager = sorted({prefix for name in modules for prefix in FORBIDDEN_PREFIXES if name.startswith(prefix)})
+    if eager:
+        print(f"FAIL: provider modules imported eagerly: {', '.join(eager)}")
+        failed = True
+
+    if overhead_ms > args.budget_ms:
+        print(f"FAIL: package import overhead {overhead_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -63,7 +63,7 @@ async def test():
         "Content-Type": "application/json",
         "ngrok-skip-browser-warning": "true"
     }
-    delay_route.delay(5, headers=headers)
+    await delay_route.adelay(5, headers=headers)
     return 
 
 app.include_router(hello_router)
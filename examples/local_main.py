@@ -0,0 +1,29 @@
+from fastapi import FastAPI, APIRouter
+
+from fastapi_cloud_tasks.delayed_route import LocalDelayedRouteBuilder
+
+app = FastAPI()
+
+# No cloud project or tunnel needed: tasks are dispatched to this app in-process
+DelayedRoute = LocalDelayedRouteBuilder(
+    app=app,
+    max_concurrency=50,
+)
+
+delayed_router = APIRouter(route_class=DelayedRoute)
+
+@delayed_router.post("/delay")
+async def delay_route(payload: dict):
+    print("Task received:", payload)
+    return {"message": "delay"}
+
+@app.get("/trigger")
+async def test():
+    delay_route.delay(5, body={"hello": "world"})
+    return 
+
+@app.on_event("shutdown")
+async def shutdown():
+    await DelayedRoute.scheduler.aclose()
+
+app.include_router(delayed_router)
@@ -0,0 +1,170 @@
+import atexit
+import heapq
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 1.0
+
+
+def last_write_wins(pending: Any, body: Any) -> Any:
+    return body
+
+
+class _PendingDelay:
+    __slots__ = ("enqueue", "body", "headers", "kwargs", "future", "triggers")
+
+    def __init__(self, enqueue: Callable[..., Any], body: Any, headers: dict | None, kwargs: dict):
+        self.enqueue = enqueue
+        self.body = body
+        self.headers = dict(headers) if headers else None
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.triggers = 1
+
+
+class DelayCoalescer:
+    """
+    Collapses delays that share a coalesce key into one enqueue.
+
+    The first call for a key opens a window of `window_seconds`; every call for the same
+    key inside it folds its body into the pending one with `merge(pending_body, body)`
+    (last write wins by default), updates the headers and replaces the other arguments.
+    When the window closes the merged task is enqueued once. The window is not extended
+    by later calls, so a key that is triggered continuously is still enqueued once per
+    window. All callers of a window share the Future of that single enqueue.
+    """
+
+    def __init__(
+        self,
+        *,
+        merge: Callable[[Any, Any], Any] | None = None,
+        max_workers: int = 4,
+    ):
+        self.merge = merge or last_write_wins
+
+        self._pending: Dict[Hashable, _PendingDelay] = {}
+        self._deadlines: List[Tuple[float, int, Hashable]] = []
+        self._counter = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._senders = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="delay-coalescer")
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def submit(
+        self,
+        key: Hashable,
+        *,
+        window_seconds: float,
+        enqueue: Callable[..., Any],
+        body: Any = None,
+        headers: dict | None = None,
+        **kwargs,
+    ) -> Future:
+        """
+        Adds one trigger for `key`. `enqueue` is called as enqueue(body=..., headers=..., **kwargs)
+        with the merged values once the window closes; it may return a Future of its own.
+        """
+        if window_seconds <= 0:
+            raise ValueError("window_seconds must be > 0")
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("DelayCoalescer is closed")
+            self._ensure_started()
+
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry.body = self.merge(entry.body, body)
+                if headers:
+                    entry.headers = {**(entry.headers or {}), **headers}
+                entry.enqueue = enqueue
+                entry.kwargs = kwargs
+                entry.triggers += 1
+                return entry.future
+
+            entry = self._pending[key] = _PendingDelay(enqueue, body, headers, kwargs)
+            self._counter += 1
+            heapq.heappush(self._deadlines, (time.monotonic() + window_seconds, self._counter, key))
+            self._cond.notify()
+            return entry.future
+
+    def flush(self):
+        """
+        Enqueues every pending task now, without waiting for their windows to close.
+        """
+        with self._cond:
+            for key in list(self._pending):
+                self._dispatch(key)
+            self._deadlines.clear()
+
+    def close(self):
+        """
+        Flushes pending tasks and waits for them to be enqueued. Safe to call more than once.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+        self._senders.shutdown(wait=True)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="delay-coalescer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, _, key = heapq.heappop(self._deadlines)
+                    self._dispatch(key)
+
+                self._cond.wait(self._deadlines[0][0] - now if self._deadlines else None)
+
+    def _dispatch(self, key: Hashable):
+        # Caller must hold self._cond
+        entry = self._pending.pop(key, None)
+        if entry is not None:
+            self._senders.submit(self._send, entry)
+
+    def _send(self, entry: _PendingDelay):
+        if entry.triggers > 1:
+            logger.debug("Coalesced %s delays into one task", entry.triggers)
+
+        try:
+            result = entry.enqueue(body=entry.body, headers=entry.headers, **entry.kwargs)
+        except Exception as exc:
+            logger.error("Failed to enqueue coalesced task: %s", exc)
+            entry.future.set_exception(exc)
+            return
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda done: _copy_outcome(done, entry.future))
+        else:
+            entry.future.set_result(result)
+
+
+def _copy_outcome(source: Future, target: Future):
+    exc = source.exception()
+    if exc is not None:
+        target.set_exception(exc)
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Tuple
+
+CONTENT_ENCODING_HEADER = "Content-Encoding"
+PAYLOAD_REFERENCE_HEADER = "X-Cloud-Tasks-Payload-Ref"
+
+
+class BlobStore:
+    """
+    Holds task bodies too large for the queue. The task only carries the reference
+    returned by put(), and the receiving route fetches the body with get(). Every
+    process that enqueues or receives tasks must be configured with the same store.
+
+    Blobs are not deleted when a task is received, since a retried task needs its body
+    again. Expire them with the store's own lifecycle rules.
+    """
+
+    def put(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    def get(self, reference: str) -> bytes:
+        raise NotImplementedError
+
+
+class LocalFileBlobStore(BlobStore):
+    """
+    Keeps blobs as files in `directory`, named by their SHA-256 so identical bodies
+    are only stored once. Meant for tests and single-host deployments.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        reference = hashlib.sha256(data).hexdigest()
+        path = self.directory / reference
+        if path.exists():
+            return reference
+
+        # Write then rename, so a concurrent reader never sees a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return reference
+
+    def get(self, reference: str) -> bytes:
+        # References are hex digests, anything else could escape the directory
+        if len(reference) != 64 or not all(char in "0123456789abcdef" for char in reference):
+            raise ValueError(f"Invalid blob reference: {reference!r}")
+        return (self.directory / reference).read_bytes()
+
+
+class PayloadCodec:
+    """
+    Opt-in compression and claim-check offload for task bodies.
+
+    Bodies of at least `compress_threshold_bytes` are compressed with `compression`
+    ("gzip" or "zstd") and sent with a Content-Encoding header. A body still larger than
+    what the queue accepts is put in `blob_store` and the task only carries a reference
+    header. The receiving route reverses both steps before FastAPI sees the request.
+    """
+
+    def __init__(
+        self,
+        *,
+        compression: str = "gzip",
+        compress_threshold_bytes: int = 1024,
+        compression_level: int | None = None,
+        blob_store: BlobStore | None = None,
+        max_decoded_bytes: int = 64 * 1024 * 1024,
+    ):
+        if compression == "gzip":
+            self._compress = lambda data: gzip.compress(data, compresslevel=compression_level or 6, mtime=0)
+            self._decompress = self._gunzip
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError as exc:
+                raise ImportError("zstd compression requires the zstandard package: pip install zstandard") from exc
+            compressor = zstandard.ZstdCompressor(level=compression_level or 3)
+            decompressor = zstandard.ZstdDecompressor()
+            self._compress = compressor.compress
+            self._decompress = lambda data: decompressor.decompress(data, max_output_size=self.max_decoded_bytes)
+        else:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+        self.compression = compression
+        self.compress_threshold_bytes = compress_threshold_bytes
+        self.blob_store = blob_store
+        self.max_decoded_bytes = max_decoded_bytes
+
+    def encode(self, body: bytes, headers: dict, *, max_body_bytes: int) -> Tuple[bytes, dict]:
+        """
+        Returns the body and headers to enqueue. Raises ValueError when the body does not
+        fit in `max_body_bytes` even compressed and no blob store is configured.
+        """
+        if len(body) < self.compress_threshold_bytes:
+            return body, headers
+
+        compressed = self._compress(body)
+        if len(compressed) < len(body):
+            body = compressed
+            headers = {**headers, CONTENT_ENCODING_HEADER: self.compression}
+
+        if len(body) <= max_body_bytes:
+            return body, headers
+
+        if self.blob_store is None:
+            raise ValueError(
+                f"Task body is {len(body)} bytes after compression, over the {max_body_bytes} byte limit; "
+                "configure a blob_store on the PayloadCodec to offload it"
+            )
+
+        reference = self.blob_store.put(body)
+        return b"", {**headers, PAYLOAD_REFERENCE_HEADER: reference}
+
+    def decode(self, body: bytes, *, content_encoding: str | None, reference: str | None) -> bytes:
+        if reference:
+            if self.blob_store is None:
+                raise ValueError("Received a task body reference but the PayloadCodec has no blob_store")
+            body = self.blob_store.get(reference)
+
+        if content_encoding:
+            if content_encoding != self.compression:
+                raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+            body = self._decompress(body)
+
+        return body
+
+    def _gunzip(self, data: bytes) -> bytes:
+        # Bounded, so a small compressed body cannot expand into gigabytes in memory
+        decompressor = zlib.decompressobj(wbits=31)
+        body = decompressor.decompress(data, self.max_decoded_bytes)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Decompressed task body exceeds {self.max_decoded_bytes} bytes")
+        return body
+
+
+def check_body_size(body: bytes | None, codec: PayloadCodec | None, *, max_body_bytes: int):
+    """
+    Raises ValueError when `body` cannot be enqueued within `max_body_bytes`, even after
+    `codec` compressed or offloaded it. Nothing is written to the blob store.
+    """
+    if body is None or len(body) <= max_body_bytes:
+        return
+    if codec is None:
+        raise ValueError(f"Task body is {len(body)} bytes, over the {max_body_bytes} byte limit")
+    if codec.blob_store is None:
+        # Only compresses, raises when that is not enough
+        codec.encode(body, {}, max_body_bytes=max_body_bytes)
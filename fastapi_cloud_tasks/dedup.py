@@ -0,0 +1,126 @@
+import asyncio
+import threading
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from cachetools import TTLCache
+from fastapi import Request, Response
+
+# Set by Cloud Tasks (and the local scheduler) on every attempt of a task
+CLOUD_TASKS_TASK_NAME_HEADER = "x-cloudtasks-taskname"
+CLOUD_TASKS_QUEUE_NAME_HEADER = "x-cloudtasks-queuename"
+# Forwarded by the delay_handler Lambda, stable across redeliveries of an SQS message
+SQS_MESSAGE_ID_HEADER = "x-sqs-message-id"
+
+DUPLICATE_DELIVERY_HEADER = "X-Duplicate-Delivery"
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class DeliveryStore:
+    """
+    Remembers the responses of delivered tasks so redeliveries can be answered without
+    running the route again. Subclass it to share the record between instances, e.g.
+    in Redis; `get` and `set` are awaited on the request path.
+    """
+
+    async def get(self, key: str) -> CachedResponse | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, response: CachedResponse):
+        raise NotImplementedError
+
+
+class MemoryDeliveryStore(DeliveryStore):
+    """
+    Per-process store: the last `maxsize` responses, each for `ttl_seconds`. Cloud Tasks
+    and SQS redeliver on the same instance often enough for this to absorb most of a
+    retry storm; use a shared store when duplicates must be caught across instances.
+    """
+
+    def __init__(self, *, maxsize: int = 10_000, ttl_seconds: float = 3600.0):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            return self._cache.get(key)
+
+    async def set(self, key: str, response: CachedResponse):
+        with self._lock:
+            self._cache[key] = response
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+def delivery_key(request: Request, route_path: str) -> str | None:
+    """
+    Identifies one task across its deliveries, or None for requests that are not task deliveries.
+    """
+    headers = request.headers
+    task_name = headers.get(CLOUD_TASKS_TASK_NAME_HEADER)
+    if task_name:
+        return f"gcp:{headers.get(CLOUD_TASKS_QUEUE_NAME_HEADER, '')}:{task_name}:{route_path}"
+    message_id = headers.get(SQS_MESSAGE_ID_HEADER)
+    if message_id:
+        return f"sqs:{message_id}:{route_path}"
+    return None
+
+
+def dedup_handler(handler: Callable, store: DeliveryStore, *, route_path: str) -> Callable:
+    """
+    Wraps a task route handler so that a task whose delivery already succeeded gets the
+    stored response back, marked with X-Duplicate-Delivery, without running the route.
+    Only 2xx responses are stored: a failed attempt must run again when it is retried.
+    A duplicate arriving while the first delivery is still running in this process waits
+    for it instead of running alongside it.
+    """
+    in_flight: Dict[str, asyncio.Future] = {}
+
+    async def dedup_route_handler(request: Request) -> Response:
+        key = delivery_key(request, route_path)
+        if key is None:
+            return await handler(request)
+
+        while (running := in_flight.get(key)) is not None:
+            cached = await asyncio.shield(running)
+            if cached is not None:
+                return _replay(cached)
+
+        # Claimed before the store is awaited, so concurrent duplicates wait on this delivery
+        done = in_flight[key] = asyncio.get_running_loop().create_future()
+        cached = None
+        try:
+            cached = await store.get(key)
+            if cached is not None:
+                return _replay(cached)
+
+            response = await handler(request)
+            cached = _capture(response)
+            if cached is not None:
+                await store.set(key, cached)
+            return response
+        finally:
+            del in_flight[key]
+            done.set_result(cached)
+
+    return dedup_route_handler
+
+
+def _capture(response: Response) -> CachedResponse | None:
+    # Streaming responses have no body to keep and are not deduplicated
+    body = getattr(response, "body", None)
+    if not 200 <= response.status_code < 300 or not isinstance(body, bytes):
+        return None
+    return CachedResponse(response.status_code, list(response.raw_headers), body)
+
+
+def _replay(cached: CachedResponse) -> Response:
+    response = Response(content=cached.body, status_code=cached.status_code)
+    response.raw_headers = [*cached.headers, (DUPLICATE_DELIVERY_HEADER.lower().encode(), b"true")]
+    return response
@@ -1,16 +1,41 @@
-from typing import Callable, Type
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterable, Awaitable, Callable, Iterable, Type
 
-from fastapi import Request, Response
 from fastapi.routing import APIRoute
-from google.cloud import tasks_v2
 
-from fastapi_cloud_tasks.providers.gcp.utils import validate_queue
-from fastapi_cloud_tasks.providers.gcp.delayer import gcp_create_delay_task
+from fastapi_cloud_tasks.coalescing import DEFAULT_WINDOW_SECONDS, DelayCoalescer
+from fastapi_cloud_tasks.codec import PayloadCodec
+from fastapi_cloud_tasks.fanout import (
+    DEFAULT_CONCURRENCY,
+    DelayManySummary,
+    arun_fanout,
+    completed_future,
+    run_fanout,
+)
+from fastapi_cloud_tasks.metrics import MetricLabels, MetricsSink, track_enqueue
+from fastapi_cloud_tasks.resilience import EnqueuePolicy
+from fastapi_cloud_tasks.route_handler import build_route_handler
+from fastapi_cloud_tasks.serializers import DEFAULT_SERIALIZER, Serializer, encode_task_body
+from fastapi_cloud_tasks.tracing import RequestTracer
 
-import boto3
-from fastapi_cloud_tasks.providers.aws.delayer import aws_create_delay_task
+# Provider SDKs are heavy to import, so they are only loaded when their builder is called
+if TYPE_CHECKING:
+    from google.cloud import tasks_v2
 
-from fastapi_cloud_tasks.providers.aws.utils import create_aws_cloud_tasks_role, deploy_lambda, link_lambda_sqs, create_sqs_queue
+    from fastapi_cloud_tasks.dedup import DeliveryStore
+    from fastapi_cloud_tasks.dispatcher import BackgroundDispatcher
+    from fastapi_cloud_tasks.idempotency import IdempotencyCache
+    from fastapi_cloud_tasks.outbox import OutboxTask, TaskOutbox
+    from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry
+    from fastapi_cloud_tasks.providers.aws.utils import AWSInfrastructure
+    from fastapi_cloud_tasks.providers.gcp.auth import OIDCTokenVerifier
+    from fastapi_cloud_tasks.providers.gcp.hooks import DelayedTaskHook
+    from fastapi_cloud_tasks.providers.gcp.queue_spec import QueueSpec
+    from fastapi_cloud_tasks.shedding import ConcurrencyLimiter
 
 import logging
 
@@ -21,13 +46,68 @@ def GCPDelayedRouteBuilder(
     base_url: str,
     queue_path: str,
     client: tasks_v2.CloudTasksClient | None = None,
+    async_client: tasks_v2.CloudTasksAsyncClient | None = None,
     auto_create_queue: bool = True,
+    queue_spec: QueueSpec | None = None,
+    metrics: MetricsSink | None = None,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    pre_create_hook: DelayedTaskHook | None = None,
+    idempotency_cache: IdempotencyCache | None = None,
+    coalesce_merge: Callable[[Any, Any], Any] | None = None,
+    resilience: EnqueuePolicy | None = None,
+    outbox: TaskOutbox | None = None,
+    dispatcher: BackgroundDispatcher | None = None,
+    token_verifier: OIDCTokenVerifier | None = None,
+    dedup_store: DeliveryStore | None = None,
+    limiter: ConcurrencyLimiter | None = None,
 ) -> Type[APIRoute]:
-    
+    """
+    With a `limiter`, requests over its in-flight limit are answered with 503 and
+    Retry-After at once, so Cloud Tasks backs off instead of queueing them here.
+
+    With a `dedup_store`, a task delivered again after a successful attempt gets the
+    stored response back without running the route; see dedup.dedup_handler.
+
+    With a `token_verifier`, requests to the routes must carry a valid OIDC token, as
+    added by oidc_delayed_hook; the claims are in request.state.token_claims.
+
+    With an `outbox`, delay() and adelay() only store the task locally and return; the
+    outbox drainers create the Cloud Tasks in the background, so requests do not wait on
+    Cloud Tasks and an outage only delays the tasks.
+
+    With a `dispatcher`, delay() and adelay() queue the call in memory and return right
+    away; its worker threads call Cloud Tasks (or the outbox).
+    """
+    from google.cloud import tasks_v2
+
+    from fastapi_cloud_tasks.idempotency import IdempotencyCache, idempotent_task_key
+    from fastapi_cloud_tasks.providers.gcp.utils import validate_queue
+    from fastapi_cloud_tasks.providers.gcp.delayer import (
+        build_delay_task_template,
+        check_delay_task,
+        gcp_create_delay_task_from_template,
+        gcp_create_delay_task_from_template_async,
+    )
+
     client = client or tasks_v2.CloudTasksClient()
+    serializer = serializer or DEFAULT_SERIALIZER
+    idempotency_cache = idempotency_cache or IdempotencyCache()
+    # Merges delay(coalesce_key=...) calls; call DelayedRoute.coalescer.close() on shutdown to send what is pending
+    coalescer = DelayCoalescer(merge=coalesce_merge)
+
+    def get_async_client() -> tasks_v2.CloudTasksAsyncClient:
+        # The async client binds to the running event loop, so it is only created on first adelay()
+        nonlocal async_client
+        if async_client is None:
+            async_client = tasks_v2.CloudTasksAsyncClient()
+        return async_client
     
-    if auto_create_queue:
-        validate_queue(client=client, queue_path=queue_path)
+    # A spec is applied at startup: the queue's rate and retry settings are diffed and updated,
+    # but the queue is only created when auto_create_queue allows it
+    if auto_create_queue or queue_spec is not None:
+        validate_queue(client=client, queue_path=queue_path, spec=queue_spec, create=auto_create_queue)
     
     class DelayedRoute(APIRoute):
         def __init__(self, *args, **kwargs):
@@ -36,47 +116,390 @@ def GCPDelayedRouteBuilder(
             self.queue_path = queue_path
             self.client = client
             self.url_endpoint = f"{self.base_url}{self.path}"
+            self.metric_labels = MetricLabels(route=self.path, provider="gcp", queue=queue_path, operation="delay")
+            # Everything that does not change between tasks is built once, hooks included
+            self.task_template = build_delay_task_template(
+                queue_path=queue_path,
+                endpoint_url=self.url_endpoint,
+                http_method=list(self.methods)[0] if self.methods else "POST",
+                serializer=serializer,
+                pre_create_hook=pre_create_hook,
+            )
+            if outbox is not None:
+                outbox.register(self.unique_id, self._forward)
 
         def get_route_handler(self) -> Callable:
             original_route_handler = super().get_route_handler()
             self.endpoint.delay = self.delay
+            self.endpoint.adelay = self.adelay
+            self.endpoint.delay_many = self.delay_many
+            self.endpoint.adelay_many = self.adelay_many
 
-            async def custom_route_handler(request: Request) -> Response:
-                endpoint_url = str(request.url)
-                print(f"Endpoint url: {endpoint_url}")
-                response: Response = await original_route_handler(request)
-                return response
-
-            return custom_route_handler
+            return build_route_handler(
+                original_route_handler,
+                route_path=self.path,
+                tracer=tracer,
+                serializer=serializer,
+                codec=codec,
+                token_verifier=token_verifier,
+                audience=f"{base_url}{self.path}",
+                dedup_store=dedup_store,
+                limiter=limiter,
+            )
 
         
-        def delay(self, delay_seconds: int = 0, timeout_seconds: float = 10.0, body: dict | None = None, headers: dict | None = None):
+        def delay(
+            self,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            """
+            With an `idempotency_key` the task gets a name derived from it, so enqueueing the
+            same key twice creates one task; repeats seen recently do not call Cloud Tasks at all.
+
+            With a `coalesce_key`, calls sharing it within `window_seconds` become one task
+            whose body is merged with `coalesce_merge`, and a Future of that task is returned.
+            """
+            if dispatcher is not None and coalesce_key is None:
+                # Outside the try: with on_full="raise" a full queue is the caller's to handle
+                dispatcher.submit(
+                    self._submit,
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+                return
+
             try:
-                http_method = list(self.methods)[0] if self.methods else "POST"
+                if coalesce_key is not None:
+                    return coalescer.submit(
+                        (self.unique_id, coalesce_key),
+                        window_seconds=window_seconds,
+                        enqueue=self._submit,
+                        delay_seconds=delay_seconds,
+                        timeout_seconds=timeout_seconds,
+                        body=body,
+                        headers=headers,
+                        idempotency_key=idempotency_key,
+                    )
+                self._submit(
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+            except Exception as exc:
+                logger.exception("Failed to enqueue Cloud Task: %s", exc)
+
+        async def adelay(
+            self,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            if coalesce_key is not None:
+                # Only buffers the call, the coalesced task is sent from the coalescer's threads
+                return self.delay(
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                    coalesce_key=coalesce_key,
+                    window_seconds=window_seconds,
+                )
 
-                gcp_create_delay_task(
-                    client=self.client,
-                    queue_path=self.queue_path,
-                    endpoint_url=f"{self.base_url}{self.path}",
-                    body=body or {},
+            if dispatcher is not None:
+                await dispatcher.asubmit(
+                    self._submit,
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+                return
+
+            try:
+                if outbox is not None:
+                    await asyncio.wrap_future(
+                        self._store(
+                            delay_seconds=delay_seconds,
+                            timeout_seconds=timeout_seconds,
+                            body=body,
+                            headers=headers,
+                            idempotency_key=idempotency_key,
+                        )
+                    )
+                    return
+                await self._aenqueue(
                     delay_seconds=delay_seconds,
-                    timeout=timeout_seconds,
-                    http_method=http_method,
-                    headers=headers or {}
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
                 )
             except Exception as exc:
                 logger.exception("Failed to enqueue Cloud Task: %s", exc)
 
+        def delay_many(
+            self,
+            bodies: Iterable[Any],
+            *,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            """
+            Enqueues one task per body, streaming from `bodies` with at most `concurrency` create_task calls in flight.
+            """
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="delay-many") as pool:
+                return run_fanout(
+                    bodies,
+                    lambda body: pool.submit(
+                        self._enqueue,
+                        delay_seconds=delay_seconds,
+                        timeout_seconds=timeout_seconds,
+                        body=body,
+                        headers=headers,
+                    ),
+                    max_in_flight=concurrency * 2,
+                    task_id=_task_name,
+                )
+
+        async def adelay_many(
+            self,
+            bodies: Iterable[Any] | AsyncIterable[Any],
+            *,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            return await arun_fanout(
+                bodies,
+                lambda body: self._aenqueue(
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                ),
+                concurrency=concurrency,
+                task_id=_task_name,
+            )
+
+        def _submit(self, **kwargs):
+            if outbox is None:
+                return self._enqueue(**kwargs)
+            # Waits for the local commit only, Cloud Tasks is called later by the outbox drainers
+            return self._store(**kwargs).result()
+
+        def _store(
+            self,
+            *,
+            delay_seconds: int,
+            timeout_seconds: float,
+            body: Any,
+            headers: dict | None,
+            idempotency_key: str | None = None,
+        ) -> Future:
+            encoded_body = encode_task_body(body, serializer)
+            # A task Cloud Tasks can never accept is refused here, not committed and retried forever
+            check_delay_task(body=encoded_body, delay_seconds=delay_seconds, timeout=timeout_seconds, codec=codec)
+            return outbox.append(
+                self.unique_id,
+                body=encoded_body,
+                headers=headers,
+                delay_seconds=delay_seconds,
+                timeout_seconds=timeout_seconds,
+                idempotency_key=idempotency_key,
+            )
+
+        def _forward(self, task: OutboxTask):
+            # Errors go back to the outbox, which retries, instead of to the resilience fallback
+            return self._enqueue(
+                delay_seconds=task.remaining_delay_seconds,
+                body=task.body,
+                headers=task.headers,
+                use_fallback=False,
+                **task.options,
+            )
+
+        def _enqueue(
+            self,
+            *,
+            delay_seconds: int,
+            timeout_seconds: float,
+            body: Any,
+            headers: dict | None,
+            idempotency_key: str | None = None,
+            use_fallback: bool = True,
+        ):
+            task_key = idempotency_key and idempotent_task_key(self.url_endpoint, idempotency_key)
+            if task_key and (cached := idempotency_cache.get(task_key)) is not None:
+                return tasks_v2.Task(name=cached)
+
+            encoded_body = encode_task_body(body, serializer)
+            send = functools.partial(
+                gcp_create_delay_task_from_template,
+                client=self.client,
+                template=self.task_template,
+                body=encoded_body,
+                delay_seconds=delay_seconds,
+                timeout=timeout_seconds,
+                headers=headers,
+                serializer=serializer,
+                codec=codec,
+                task_id=task_key,
+            )
+            with track_enqueue(metrics, self.metric_labels, encoded_body):
+                task = _call_provider(
+                    resilience,
+                    send,
+                    use_fallback=use_fallback,
+                    route=self.path,
+                    body=encoded_body,
+                    headers=headers,
+                    delay_seconds=delay_seconds,
+                )
+
+            # Whatever a resilience fallback returned is not a created task
+            if task_key and isinstance(task, tasks_v2.Task):
+                idempotency_cache.add(task_key, task.name)
+            return task
+
+        async def _aenqueue(
+            self,
+            *,
+            delay_seconds: int,
+            timeout_seconds: float,
+            body: Any,
+            headers: dict | None,
+            idempotency_key: str | None = None,
+        ):
+            task_key = idempotency_key and idempotent_task_key(self.url_endpoint, idempotency_key)
+            if task_key and (cached := idempotency_cache.get(task_key)) is not None:
+                return tasks_v2.Task(name=cached)
+
+            encoded_body = encode_task_body(body, serializer)
+            send = functools.partial(
+                gcp_create_delay_task_from_template_async,
+                client=get_async_client(),
+                template=self.task_template,
+                body=encoded_body,
+                delay_seconds=delay_seconds,
+                timeout=timeout_seconds,
+                headers=headers,
+                serializer=serializer,
+                codec=codec,
+                task_id=task_key,
+            )
+            with track_enqueue(metrics, self.metric_labels, encoded_body):
+                task = await _acall_provider(
+                    resilience, send, route=self.path, body=encoded_body, headers=headers, delay_seconds=delay_seconds
+                )
+
+            if task_key and isinstance(task, tasks_v2.Task):
+                idempotency_cache.add(task_key, task.name)
+            return task
+
+    DelayedRoute.idempotency_cache = idempotency_cache
+    DelayedRoute.coalescer = coalescer
+    DelayedRoute.resilience = resilience
+    DelayedRoute.outbox = outbox
+    DelayedRoute.dispatcher = dispatcher
+
     return DelayedRoute
 
 def AWSDelayedRouteBuilder(
     *,
     base_url: str,
+    sqs_client=None,
     lambda_client=None,
+    clients: AWSClientRegistry | None = None,
+    executor: Executor | None = None,
+    batch_messages: bool = False,
+    batch_linger_seconds: float = 0.05,
+    metrics: MetricsSink | None = None,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    queue_name: str = "Delay-Queue",
+    idempotency_cache: IdempotencyCache | None = None,
+    coalesce_merge: Callable[[Any, Any], Any] | None = None,
+    resilience: EnqueuePolicy | None = None,
+    outbox: TaskOutbox | None = None,
+    dispatcher: BackgroundDispatcher | None = None,
+    dedup_store: DeliveryStore | None = None,
+    limiter: ConcurrencyLimiter | None = None,
 ) -> Type[APIRoute]:
-    
-    sqs_client = boto3.client("sqs")
-    lambda_client = boto3.client("lambda")
+    """
+    A `queue_name` ending in .fifo provisions a FIFO queue, on which idempotency keys also
+    become SQS deduplication ids; on a standard queue only the in-process cache dedupes.
+    FIFO queues do not support per-message delays.
+
+    With `resilience`, sends are retried and guarded by its circuit breaker; buffered
+    sends (batch_messages=True) are only guarded, the batcher reports each failure.
+
+    With an `outbox`, delay() and adelay() only store the message locally and return;
+    the outbox drainers send stored messages with send_message_batch in the background.
+
+    With a `dispatcher`, delay() and adelay() queue the call in memory and return right
+    away; its worker threads call SQS (or the outbox).
+
+    With a `dedup_store`, a message the Lambda delivers again after a successful attempt
+    gets the stored response back without running the route.
+
+    With a `limiter`, requests over its in-flight limit are answered with 503 and
+    Retry-After at once; the Lambda then keeps the message hidden for that long.
+    """
+    from fastapi_cloud_tasks.idempotency import IdempotencyCache, idempotent_task_key
+    from fastapi_cloud_tasks.providers.aws.batcher import MAX_SQS_BATCH_SIZE, SQSBatchEnqueuer
+    from fastapi_cloud_tasks.providers.aws.delayer import (
+        aws_create_delay_task,
+        aws_create_delay_task_async,
+        check_delay_task,
+    )
+    from fastapi_cloud_tasks.providers.aws.clients import get_default_registry
+    from fastapi_cloud_tasks.providers.aws.utils import provision_aws_infrastructure
+
+    clients = (clients or get_default_registry()).with_clients({"sqs": sqs_client, "lambda": lambda_client})
+    serializer = serializer or DEFAULT_SERIALIZER
+    idempotency_cache = idempotency_cache or IdempotencyCache()
+    # Merges delay(coalesce_key=...) calls; call DelayedRoute.coalescer.close() on shutdown to send what is pending
+    coalescer = DelayCoalescer(merge=coalesce_merge)
+    sqs_client = clients.client("sqs")
+    lambda_client = clients.client("lambda")
+
+    # Opt-in: buffer messages and send them with send_message_batch.
+    # Call DelayedRoute.batcher.close() on app shutdown to flush what is buffered.
+    batcher = SQSBatchEnqueuer(sqs_client, linger_seconds=batch_linger_seconds) if batch_messages else None
+    # Outbox drainers always send in batches, with the builder's batcher when there is one
+    forward_batcher = batcher
+    if outbox is not None and forward_batcher is None:
+        forward_batcher = SQSBatchEnqueuer(sqs_client, linger_seconds=batch_linger_seconds)
+
+    infrastructure = None
+
+    def get_infrastructure() -> AWSInfrastructure:
+        # Provisioned when the first route is built and shared by every route after it
+        nonlocal infrastructure
+        if infrastructure is None:
+            infrastructure = provision_aws_infrastructure(queue_name=queue_name, clients=clients)
+        return infrastructure
 
     class DelayedRoute(APIRoute):
         def __init__(self, *args, **kwargs):
@@ -85,42 +508,540 @@ def AWSDelayedRouteBuilder(
             self.sqs_client = sqs_client
             self.lambda_client = lambda_client
             self.url_endpoint = f"{self.base_url}{self.path}"
-            self.role_arn = create_aws_cloud_tasks_role()
-            self.lambda_arn = deploy_lambda(function_name="DelayerLambda", role_arn=self.role_arn)
-            self.queue_url = create_sqs_queue(queue_name="Delay-Queue")
-
-            link_lambda_sqs(lambda_arn=self.lambda_arn, queue_url=self.queue_url)
+            self.http_method = list(self.methods)[0] if self.methods else "POST"
+            self.role_arn, self.lambda_arn, self.queue_url = get_infrastructure()
+            self.metric_labels = MetricLabels(route=self.path, provider="aws", queue=self.queue_url, operation="delay")
+            if outbox is not None:
+                outbox.register(self.unique_id, self._forward)
         
         def get_route_handler(self) -> Callable:
             original_route_handler = super().get_route_handler()
             self.endpoint.delay = self.delay
+            self.endpoint.adelay = self.adelay
+            self.endpoint.delay_many = self.delay_many
+            self.endpoint.adelay_many = self.adelay_many
 
-            async def custom_route_handler(request: Request) -> Response:
-                endpoint_url = str(request.url)
-                print(f"Endpoint url: {endpoint_url}")
-                response: Response = await original_route_handler(request)
-                return response
-
-            return custom_route_handler
+            return build_route_handler(
+                original_route_handler,
+                route_path=self.path,
+                tracer=tracer,
+                serializer=serializer,
+                codec=codec,
+                dedup_store=dedup_store,
+                limiter=limiter,
+            )
 
         
-        def delay(self, delay_seconds: int = 0, body: dict | None = None, headers: dict | None = None):
+        def delay(
+            self,
+            delay_seconds: int = 0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            """
+            With a `coalesce_key`, calls sharing it within `window_seconds` become one message
+            whose body is merged with `coalesce_merge`, and a Future of that message is returned.
+            """
+            if dispatcher is not None and coalesce_key is None:
+                # Outside the try: with on_full="raise" a full queue is the caller's to handle
+                dispatcher.submit(
+                    self._submit,
+                    delay_seconds=delay_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+                return
+
             try:
-                http_method = list(self.methods)[0] if self.methods else "POST"
+                if coalesce_key is not None:
+                    return coalescer.submit(
+                        (self.unique_id, coalesce_key),
+                        window_seconds=window_seconds,
+                        enqueue=self._submit,
+                        delay_seconds=delay_seconds,
+                        body=body,
+                        headers=headers,
+                        idempotency_key=idempotency_key,
+                    )
+                if outbox is not None:
+                    self._store(delay_seconds=delay_seconds, body=body, headers=headers, idempotency_key=idempotency_key).result()
+                    return
+                result = self._enqueue(
+                    delay_seconds=delay_seconds,
+                    body=body,
+                    headers=headers,
+                    batcher=batcher,
+                    idempotency_key=idempotency_key,
+                )
+                if batcher is not None:
+                    # The Future is handed back so callers can check for a partial batch failure
+                    result.add_done_callback(_log_batch_failure)
+                    return result
+            except Exception as exc:
+                logger.exception("Failed to enqueue Cloud Task: %s", exc)
+
+        async def adelay(
+            self,
+            delay_seconds: int = 0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            if coalesce_key is not None:
+                return self.delay(
+                    delay_seconds=delay_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                    coalesce_key=coalesce_key,
+                    window_seconds=window_seconds,
+                )
 
-                aws_create_delay_task(
-                    sqs_client=sqs_client,
-                    lambda_client=lambda_client,
-                    endpoint_url=self.url_endpoint,
-                    body=body or {},
+            if dispatcher is not None:
+                await dispatcher.asubmit(
+                    self._submit,
                     delay_seconds=delay_seconds,
-                    http_method=http_method,
-                    headers=headers or {},
-                    role_arn=self.role_arn,
-                    lambda_arn=self.lambda_arn,
-                    queue_url=self.queue_url
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+                return
+
+            try:
+                if outbox is not None:
+                    await asyncio.wrap_future(
+                        self._store(delay_seconds=delay_seconds, body=body, headers=headers, idempotency_key=idempotency_key)
+                    )
+                    return
+                await self._aenqueue(
+                    delay_seconds=delay_seconds, body=body, headers=headers, idempotency_key=idempotency_key
                 )
             except Exception as exc:
                 logger.exception("Failed to enqueue Cloud Task: %s", exc)
 
-    return DelayedRoute
\ No newline at end of file
+        def delay_many(
+            self,
+            bodies: Iterable[Any],
+            *,
+            delay_seconds: int = 0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            """
+            Enqueues one message per body through send_message_batch, streaming from `bodies`
+            with at most `concurrency` batch calls in flight. With batch_messages=True the
+            builder's batcher and its own worker count are used instead.
+            """
+            fanout_batcher = batcher or SQSBatchEnqueuer(
+                sqs_client, linger_seconds=batch_linger_seconds, max_workers=concurrency
+            )
+            try:
+                return run_fanout(
+                    bodies,
+                    lambda body: self._enqueue(
+                        delay_seconds=delay_seconds, body=body, headers=headers, batcher=fanout_batcher
+                    ),
+                    max_in_flight=concurrency * MAX_SQS_BATCH_SIZE,
+                    task_id=_message_id,
+                )
+            finally:
+                if fanout_batcher is not batcher:
+                    fanout_batcher.close()
+
+        async def adelay_many(
+            self,
+            bodies: Iterable[Any] | AsyncIterable[Any],
+            *,
+            delay_seconds: int = 0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            fanout_batcher = batcher or SQSBatchEnqueuer(
+                sqs_client, linger_seconds=batch_linger_seconds, max_workers=concurrency
+            )
+            try:
+                # Buffering a message does not block, so enough of them are kept pending to fill every batch
+                return await arun_fanout(
+                    bodies,
+                    lambda body: asyncio.wrap_future(
+                        self._enqueue(delay_seconds=delay_seconds, body=body, headers=headers, batcher=fanout_batcher)
+                    ),
+                    concurrency=concurrency * MAX_SQS_BATCH_SIZE,
+                    task_id=_message_id,
+                )
+            finally:
+                if fanout_batcher is not batcher:
+                    await asyncio.to_thread(fanout_batcher.close)
+
+        def _submit(self, **kwargs):
+            if outbox is None:
+                result = self._enqueue(batcher=batcher, **kwargs)
+                if isinstance(result, Future):
+                    result.add_done_callback(_log_batch_failure)
+                return result
+            # Waits for the local commit only, SQS is called later by the outbox drainers
+            return self._store(**kwargs).result()
+
+        def _store(
+            self, *, delay_seconds: int, body: Any, headers: dict | None, idempotency_key: str | None = None
+        ) -> Future:
+            encoded_body = encode_task_body(body, serializer)
+            # A message SQS can never accept is refused here, not committed and retried forever
+            check_delay_task(
+                queue_url=self.queue_url,
+                endpoint_url=self.url_endpoint,
+                body=encoded_body,
+                delay_seconds=delay_seconds,
+                http_method=self.http_method,
+                headers=headers,
+                serializer=serializer,
+                codec=codec,
+            )
+            return outbox.append(
+                self.unique_id,
+                body=encoded_body,
+                headers=headers,
+                delay_seconds=delay_seconds,
+                idempotency_key=idempotency_key,
+            )
+
+        def _forward(self, task: OutboxTask) -> Future:
+            # Errors go back to the outbox, which retries, instead of to the resilience fallback
+            return self._enqueue(
+                delay_seconds=task.remaining_delay_seconds,
+                body=task.body,
+                headers=task.headers,
+                batcher=forward_batcher,
+                use_fallback=False,
+                **task.options,
+            )
+
+        def _enqueue(
+            self,
+            *,
+            delay_seconds: int,
+            body: Any,
+            headers: dict | None,
+            batcher: SQSBatchEnqueuer | None,
+            idempotency_key: str | None = None,
+            use_fallback: bool = True,
+        ):
+            task_key = idempotency_key and idempotent_task_key(self.url_endpoint, idempotency_key)
+            if task_key and (cached := idempotency_cache.get(task_key)) is not None:
+                response = {"MessageId": cached}
+                return completed_future(lambda: response) if batcher is not None else response
+
+            encoded_body = encode_task_body(body, serializer)
+            send = functools.partial(
+                aws_create_delay_task,
+                sqs_client=sqs_client,
+                lambda_client=lambda_client,
+                endpoint_url=self.url_endpoint,
+                body=encoded_body,
+                delay_seconds=delay_seconds,
+                http_method=self.http_method,
+                headers=headers or {},
+                role_arn=self.role_arn,
+                lambda_arn=self.lambda_arn,
+                queue_url=self.queue_url,
+                batcher=batcher,
+                serializer=serializer,
+                codec=codec,
+                deduplication_id=task_key,
+            )
+            # A batched send only buffers the message, the tracker waits for its Future
+            with track_enqueue(metrics, self.metric_labels, encoded_body) as tracker:
+                task = dict(route=self.path, body=encoded_body, headers=headers, delay_seconds=delay_seconds)
+                if resilience is not None and batcher is not None:
+                    result = resilience.submit(send, task=task, use_fallback=use_fallback)
+                else:
+                    result = _call_provider(resilience, send, use_fallback=use_fallback, **task)
+                tracker.follow(result)
+
+            if task_key and isinstance(result, Future):
+                result.add_done_callback(lambda future: _remember_message(idempotency_cache, task_key, future))
+            elif task_key and isinstance(result, dict):
+                idempotency_cache.add(task_key, _message_id(result))
+            return result
+
+        async def _aenqueue(
+            self, *, delay_seconds: int, body: Any, headers: dict | None, idempotency_key: str | None = None
+        ):
+            task_key = idempotency_key and idempotent_task_key(self.url_endpoint, idempotency_key)
+            if task_key and (cached := idempotency_cache.get(task_key)) is not None:
+                return {"MessageId": cached}
+
+            encoded_body = encode_task_body(body, serializer)
+            send = functools.partial(
+                aws_create_delay_task_async,
+                sqs_client=sqs_client,
+                lambda_client=lambda_client,
+                endpoint_url=self.url_endpoint,
+                body=encoded_body,
+                delay_seconds=delay_seconds,
+                http_method=self.http_method,
+                headers=headers or {},
+                role_arn=self.role_arn,
+                lambda_arn=self.lambda_arn,
+                queue_url=self.queue_url,
+                executor=executor,
+                batcher=batcher,
+                serializer=serializer,
+                codec=codec,
+                deduplication_id=task_key,
+            )
+            with track_enqueue(metrics, self.metric_labels, encoded_body):
+                response = await _acall_provider(
+                    resilience, send, route=self.path, body=encoded_body, headers=headers, delay_seconds=delay_seconds
+                )
+
+            if task_key and isinstance(response, dict):
+                idempotency_cache.add(task_key, _message_id(response))
+            return response
+
+    DelayedRoute.batcher = batcher
+    DelayedRoute.idempotency_cache = idempotency_cache
+    DelayedRoute.coalescer = coalescer
+    DelayedRoute.resilience = resilience
+    DelayedRoute.outbox = outbox
+    DelayedRoute.dispatcher = dispatcher
+
+    return DelayedRoute
+
+
+def LocalDelayedRouteBuilder(
+    *,
+    app: Callable | None = None,
+    max_concurrency: int = 100,
+    max_retries: int = 3,
+    retry_backoff_seconds: float = 1.0,
+    metrics: MetricsSink | None = None,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    idempotency_cache: IdempotencyCache | None = None,
+    coalesce_merge: Callable[[Any, Any], Any] | None = None,
+    dedup_store: DeliveryStore | None = None,
+    limiter: ConcurrencyLimiter | None = None,
+) -> Type[APIRoute]:
+    """
+    In-process stand-in for GCPDelayedRouteBuilder: delayed tasks wait in an asyncio
+    timer heap and are dispatched straight to `app` over ASGI, without a network hop.
+    Meant for development, CI and single-node deployments; pending tasks do not survive
+    a restart. Pass the app here or call DelayedRoute.scheduler.bind(app) later.
+    A `dedup_store` answers repeated deliveries of a task like on Cloud Tasks.
+    """
+    from fastapi_cloud_tasks.idempotency import IdempotencyCache, idempotent_task_key
+    from fastapi_cloud_tasks.providers.local.delayer import LocalTask, LocalTaskScheduler
+
+    serializer = serializer or DEFAULT_SERIALIZER
+    idempotency_cache = idempotency_cache or IdempotencyCache()
+    # Merges delay(coalesce_key=...) calls; call DelayedRoute.coalescer.close() on shutdown to send what is pending
+    coalescer = DelayCoalescer(merge=coalesce_merge)
+    content_type = serializer.content_type.encode()
+
+    scheduler = LocalTaskScheduler(
+        app,
+        max_concurrency=max_concurrency,
+        max_retries=max_retries,
+        retry_backoff_seconds=retry_backoff_seconds,
+    )
+
+    class DelayedRoute(APIRoute):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.http_method = list(self.methods)[0] if self.methods else "POST"
+            self.metric_labels = MetricLabels(route=self.path, provider="local", queue="local", operation="delay")
+
+        def get_route_handler(self) -> Callable:
+            original_route_handler = super().get_route_handler()
+            self.endpoint.delay = self.delay
+            self.endpoint.adelay = self.adelay
+            self.endpoint.delay_many = self.delay_many
+            self.endpoint.adelay_many = self.adelay_many
+            return build_route_handler(
+                original_route_handler,
+                route_path=self.path,
+                tracer=tracer,
+                serializer=serializer,
+                dedup_store=dedup_store,
+                limiter=limiter,
+            )
+
+        def delay(
+            self,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            try:
+                if coalesce_key is not None:
+                    # The merged task is scheduled from the coalescer's thread, which needs the loop
+                    scheduler.attach_loop()
+                    return coalescer.submit(
+                        (self.unique_id, coalesce_key),
+                        window_seconds=window_seconds,
+                        enqueue=self._enqueue,
+                        delay_seconds=delay_seconds,
+                        timeout_seconds=timeout_seconds,
+                        body=body,
+                        headers=headers,
+                        idempotency_key=idempotency_key,
+                    )
+                self._enqueue(
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                    idempotency_key=idempotency_key,
+                )
+            except Exception as exc:
+                logger.exception("Failed to enqueue local task: %s", exc)
+
+        async def adelay(
+            self,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            body: Any = None,
+            headers: dict | None = None,
+            idempotency_key: str | None = None,
+            coalesce_key: str | None = None,
+            window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        ):
+            return self.delay(
+                delay_seconds=delay_seconds,
+                timeout_seconds=timeout_seconds,
+                body=body,
+                headers=headers,
+                idempotency_key=idempotency_key,
+                coalesce_key=coalesce_key,
+                window_seconds=window_seconds,
+            )
+
+        def delay_many(
+            self,
+            bodies: Iterable[Any],
+            *,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            # Scheduling is an in-memory heap push, each future is already done when it is returned
+            return run_fanout(
+                bodies,
+                lambda body: completed_future(
+                    self._enqueue,
+                    delay_seconds=delay_seconds,
+                    timeout_seconds=timeout_seconds,
+                    body=body,
+                    headers=headers,
+                ),
+                max_in_flight=concurrency,
+                task_id=_task_name,
+            )
+
+        async def adelay_many(
+            self,
+            bodies: Iterable[Any] | AsyncIterable[Any],
+            *,
+            delay_seconds: int = 0,
+            timeout_seconds: float = 10.0,
+            headers: dict | None = None,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> DelayManySummary:
+            async def enqueue(body):
+                return self._enqueue(
+                    delay_seconds=delay_seconds, timeout_seconds=timeout_seconds, body=body, headers=headers
+                )
+
+            return await arun_fanout(bodies, enqueue, concurrency=concurrency, task_id=_task_name)
+
+        def _enqueue(
+            self,
+            *,
+            delay_seconds: int,
+            timeout_seconds: float,
+            body: Any,
+            headers: dict | None,
+            idempotency_key: str | None = None,
+        ) -> LocalTask | None:
+            # A repeated idempotency key schedules nothing and returns None
+            task_key = idempotency_key and idempotent_task_key(self.path, idempotency_key)
+            if task_key and idempotency_cache.get(task_key) is not None:
+                return None
+
+            encoded_body = encode_task_body(body, serializer)
+            with track_enqueue(metrics, self.metric_labels, encoded_body):
+                if delay_seconds < 0:
+                    raise ValueError("delay_seconds must be >= 0")
+                if timeout_seconds <= 0:
+                    raise ValueError("timeout must be > 0")
+
+                task_headers = [(b"content-type", content_type)]
+                task_headers += [(key.lower().encode(), str(value).encode()) for key, value in (headers or {}).items()]
+
+                task = LocalTask(
+                    method=self.http_method,
+                    path=self.path,
+                    body=encoded_body or b"",
+                    headers=task_headers,
+                    timeout_seconds=timeout_seconds,
+                )
+                if task_key:
+                    task.name = task_key
+                scheduler.schedule(task, delay_seconds=delay_seconds)
+
+            if task_key:
+                idempotency_cache.add(task_key, task.name)
+            return task
+
+    DelayedRoute.scheduler = scheduler
+    DelayedRoute.idempotency_cache = idempotency_cache
+    DelayedRoute.coalescer = coalescer
+
+    return DelayedRoute
+
+
+def _call_provider(
+    resilience: EnqueuePolicy | None, send: Callable[[], Any], *, use_fallback: bool = True, **task
+) -> Any:
+    if resilience is None:
+        return send()
+    return resilience.call(send, task=task, use_fallback=use_fallback)
+
+
+async def _acall_provider(resilience: EnqueuePolicy | None, send: Callable[[], Awaitable[Any]], **task) -> Any:
+    if resilience is None:
+        return await send()
+    return await resilience.acall(send, task=task)
+
+
+def _task_name(result) -> str | None:
+    # Cloud Tasks responses and local tasks both carry the task name, a resilience fallback's result may not
+    return getattr(result, "name", None)
+
+
+def _message_id(result: dict) -> str | None:
+    # Both send_message responses and send_message_batch entries carry it, a resilience fallback's result may not
+    return result.get("MessageId") if isinstance(result, dict) else None
+
+
+def _remember_message(idempotency_cache: IdempotencyCache, task_key: str, future):
+    if future.exception() is None:
+        idempotency_cache.add(task_key, _message_id(future.result()))
+
+
+def _log_batch_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Failed to enqueue batched SQS message: %s", exc)
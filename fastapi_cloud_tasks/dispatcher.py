@@ -0,0 +1,203 @@
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+ON_FULL_POLICIES = ("block", "drop", "raise")
+
+_STOP = object()
+
+
+class DispatcherFullError(RuntimeError):
+    """
+    Raised by submit() when the queue is full and the policy is "raise".
+    """
+
+
+class BackgroundDispatcher:
+    """
+    Takes enqueue calls off the request path: delay() on a route built with this
+    dispatcher only queues the call and returns, and `workers` threads make the
+    provider calls. Share one dispatcher between the builders of an app.
+
+    The queue holds at most `maxsize` calls. When it is full, `on_full` decides:
+    "block" waits for room (up to `block_timeout_seconds`, then drops), "drop" logs
+    and discards the call, "raise" raises DispatcherFullError to the caller.
+
+    Calls still queued at shutdown are sent until `drain_timeout_seconds` runs out;
+    use `lifespan` as the app's lifespan, or call aclose() from your own.
+    """
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = 10_000,
+        workers: int = 8,
+        on_full: str = "block",
+        block_timeout_seconds: float | None = None,
+        drain_timeout_seconds: float = 10.0,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+
+        self.workers = workers
+        self.on_full = _policy(on_full)
+        self.block_timeout_seconds = block_timeout_seconds
+        self.drain_timeout_seconds = drain_timeout_seconds
+
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        self._counts = {"submitted": 0, "sent": 0, "failed": 0, "dropped": 0}
+
+    @property
+    def pending(self) -> int:
+        # Queued calls plus the ones a worker is sending
+        return self._queue.unfinished_tasks
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counts, "pending": self.pending}
+
+    def submit(self, function: Callable[..., Any], /, *, on_full: str | None = None, **kwargs) -> bool:
+        """
+        Queues function(**kwargs). Returns False when the call was dropped because the
+        queue was full, or because the dispatcher is closed (e.g. a request still running
+        after shutdown). `on_full` overrides the dispatcher's policy for this call.
+        """
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._ensure_started()
+        if closed:
+            self._count("dropped")
+            logger.warning("Dispatcher is closed, dropped a delay call")
+            return False
+
+        policy = _policy(on_full) if on_full is not None else self.on_full
+        item = (function, kwargs)
+        try:
+            if policy == "block":
+                self._queue.put(item, timeout=self.block_timeout_seconds)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if policy == "raise":
+                raise DispatcherFullError(f"Dispatch queue is full ({self._queue.maxsize} calls)") from None
+            self._count("dropped")
+            logger.warning("Dispatch queue is full, dropped a delay call")
+            return False
+
+        self._count("submitted")
+        return True
+
+    async def asubmit(self, function: Callable[..., Any], /, *, on_full: str | None = None, **kwargs) -> bool:
+        """
+        submit() for the event loop: a full queue with the "block" policy is waited on
+        in a thread instead of blocking the loop.
+        """
+        policy = _policy(on_full) if on_full is not None else self.on_full
+        if policy != "block":
+            return self.submit(function, on_full=policy, **kwargs)
+
+        try:
+            return self.submit(function, on_full="raise", **kwargs)
+        except DispatcherFullError:
+            return await asyncio.to_thread(self.submit, function, on_full="block", **kwargs)
+
+    def close(self, timeout: float | None = None) -> int:
+        """
+        Stops taking calls and sends what is queued, for at most `timeout` seconds.
+        Returns the number of calls that were still queued and are discarded. Safe to
+        call more than once.
+        """
+        with self._lock:
+            if self._closed:
+                return 0
+            self._closed = True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+
+        discarded = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            discarded += 1
+        if discarded:
+            self._count("dropped", discarded)
+            logger.error("Dispatcher drain timed out, discarded %s delay calls", discarded)
+
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            # Workers are daemons, one stuck in a slow provider call does not hold up shutdown past the deadline
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0.1))
+        if self._threads:
+            atexit.unregister(self.close)
+        return discarded
+
+    async def aclose(self, timeout: float | None = None) -> int:
+        return await asyncio.to_thread(self.close, timeout)
+
+    @asynccontextmanager
+    async def lifespan(self, app) -> AsyncIterator[None]:
+        """
+        FastAPI(lifespan=dispatcher.lifespan), drains the queue on shutdown.
+        """
+        yield
+        await self.aclose(self.drain_timeout_seconds)
+
+    def _ensure_started(self):
+        # Caller must hold self._lock
+        if self._threads:
+            return
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"delay-dispatcher-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.close, self.drain_timeout_seconds)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                function, kwargs = item
+                function(**kwargs)
+            except Exception as exc:
+                self._count("failed")
+                logger.error("Background delay call failed: %s", exc)
+            else:
+                self._count("sent")
+            finally:
+                self._queue.task_done()
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counts[name] += value
+
+
+def _policy(on_full: str) -> str:
+    if on_full not in ON_FULL_POLICIES:
+        raise ValueError(f"on_full must be one of {ON_FULL_POLICIES}, got {on_full!r}")
+    return on_full
@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, NamedTuple
+
+DEFAULT_CONCURRENCY = 32
+
+
+class DelayResult(NamedTuple):
+    index: int
+    task_id: str | None = None
+    error: BaseException | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class DelayManySummary:
+    """
+    Outcome of delay_many()/adelay_many(): one DelayResult per body, in input order.
+    `task_id` is the Cloud Task name, the SQS message id or the local task name, and
+    None for a body a resilience fallback took over.
+    """
+
+    results: List[DelayResult]
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for result in self.results if result.error is None)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def failures(self) -> List[DelayResult]:
+        return [result for result in self.results if result.error is not None]
+
+
+def run_fanout(
+    bodies: Iterable[Any],
+    submit: Callable[[Any], Future],
+    *,
+    max_in_flight: int,
+    task_id: Callable[[Any], str | None],
+) -> DelayManySummary:
+    """
+    Pulls bodies from `bodies` lazily and hands each to `submit`, keeping at most
+    `max_in_flight` of the returned futures pending, so a generator of any length
+    is never materialized in memory.
+    """
+    results: List[DelayResult] = []
+    in_flight: Dict[Future, int] = {}
+
+    def collect(return_when: str):
+        done, _ = wait(in_flight, return_when=return_when)
+        for future in done:
+            index = in_flight.pop(future)
+            error = future.exception()
+            results.append(DelayResult(index, None if error else task_id(future.result()), error))
+
+    for index, body in enumerate(bodies):
+        try:
+            in_flight[submit(body)] = index
+        except Exception as exc:
+            results.append(DelayResult(index, None, exc))
+            continue
+
+        if len(in_flight) >= max_in_flight:
+            collect(FIRST_COMPLETED)
+
+    if in_flight:
+        collect(ALL_COMPLETED)
+
+    results.sort(key=lambda result: result.index)
+    return DelayManySummary(results)
+
+
+async def arun_fanout(
+    bodies: Iterable[Any] | AsyncIterable[Any],
+    enqueue: Callable[[Any], Awaitable[Any]],
+    *,
+    concurrency: int,
+    task_id: Callable[[Any], str | None],
+) -> DelayManySummary:
+    """
+    Async counterpart of run_fanout: `concurrency` workers share one iterator over
+    `bodies`, which may also be an async generator.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    results: List[DelayResult] = []
+    counter = itertools.count()
+    exhausted = False
+
+    if hasattr(bodies, "__aiter__"):
+        iterator = bodies.__aiter__()
+        # An async generator cannot be advanced by two workers at once
+        lock = asyncio.Lock()
+
+        async def next_body():
+            async with lock:
+                return next(counter), await iterator.__anext__()
+    else:
+        iterator = iter(bodies)
+
+        async def next_body():
+            try:
+                return next(counter), next(iterator)
+            except StopIteration:
+                raise StopAsyncIteration from None
+
+    async def worker():
+        nonlocal exhausted
+        while not exhausted:
+            try:
+                index, body = await next_body()
+            except StopAsyncIteration:
+                exhausted = True
+                return
+
+            try:
+                result = await enqueue(body)
+            except Exception as exc:
+                results.append(DelayResult(index, None, exc))
+            else:
+                results.append(DelayResult(index, task_id(result), None))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    results.sort(key=lambda result: result.index)
+    return DelayManySummary(results)
+
+
+def completed_future(function: Callable, *args, **kwargs) -> Future:
+    """
+    Runs `function` right away and returns its outcome as a finished Future.
+    """
+    future: Future = Future()
+    try:
+        future.set_result(function(*args, **kwargs))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
@@ -9,16 +9,10 @@ class HelloRoute(APIRoute):
         original_route_handler = super().get_route_handler()
 
         async def custom_route_handler(request: Request) -> Response:
-            before = time.time()
+            before = time.perf_counter()
             response: Response = await original_route_handler(request)
-            duration = time.time() - before
+            duration = time.perf_counter() - before
             response.headers["X-Response-Time"] = str(duration)
-            print(f"route duration: {duration}")
-            print(f"route response: {response}")
-            print(f"route response headers: {response.headers}")
-            print("Hello!")
             return response
 
         return custom_route_handler
-    
-      
\ No newline at end of file
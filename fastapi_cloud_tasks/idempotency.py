@@ -0,0 +1,39 @@
+import hashlib
+import threading
+
+from cachetools import TTLCache
+
+
+class IdempotencyCache:
+    """
+    Bounded LRU record of the idempotency keys a process enqueued recently, with the id
+    of the task each one created. A repeated key within `ttl_seconds` is answered from
+    here without calling the queue at all. It only covers this process; across processes
+    the deterministic task name (Cloud Tasks) or deduplication id (SQS FIFO) still
+    prevents duplicates.
+    """
+
+    def __init__(self, *, maxsize: int = 10_000, ttl_seconds: float = 3600.0):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, task_key: str) -> str | None:
+        with self._lock:
+            return self._cache.get(task_key)
+
+    def add(self, task_key: str, task_id: str | None):
+        with self._lock:
+            self._cache[task_key] = task_id or task_key
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+def idempotent_task_key(scope: str, idempotency_key: str) -> str:
+    """
+    Derives the task id for `idempotency_key` on the route identified by `scope`. Hashed,
+    so any key gives a valid Cloud Tasks id / SQS deduplication id and names do not share
+    prefixes, which Cloud Tasks recommends against.
+    """
+    return hashlib.sha256(f"{scope}\0{idempotency_key}".encode()).hexdigest()
@@ -0,0 +1,232 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import CancelledError, Future
+from typing import Any, Dict, NamedTuple, Sequence, Tuple
+
+from fastapi import APIRouter, Response
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricLabels(NamedTuple):
+    route: str
+    provider: str
+    queue: str
+    operation: str
+
+
+class MetricsSink:
+    """
+    Receives one call per enqueue attempt from the delayed and scheduled routes.
+    Subclass it to forward to StatsD, OpenTelemetry, etc. Routes built without a
+    sink skip instrumentation entirely.
+    """
+
+    def record_enqueue(
+        self,
+        labels: MetricLabels,
+        *,
+        latency_seconds: float,
+        payload_bytes: int | None,
+        exception: BaseException | None,
+    ):
+        pass
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class PrometheusMetricsSink(MetricsSink):
+    """
+    Keeps counters and histograms in memory and renders them in the Prometheus text format.
+    Serve them with metrics_router(sink).
+    """
+
+    def __init__(
+        self,
+        *,
+        namespace: str = "fastapi_cloud_tasks",
+        latency_buckets: Sequence[float] = LATENCY_BUCKETS,
+        payload_buckets: Sequence[float] = PAYLOAD_BUCKETS,
+    ):
+        self.namespace = namespace
+        self.latency_buckets = latency_buckets
+        self.payload_buckets = payload_buckets
+        self._latency: Dict[MetricLabels, _Histogram] = {}
+        self._payload: Dict[MetricLabels, _Histogram] = {}
+        self._successes: Dict[MetricLabels, int] = {}
+        self._failures: Dict[Tuple[MetricLabels, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record_enqueue(
+        self,
+        labels: MetricLabels,
+        *,
+        latency_seconds: float,
+        payload_bytes: int | None,
+        exception: BaseException | None,
+    ):
+        with self._lock:
+            latency = self._latency.get(labels)
+            if latency is None:
+                latency = self._latency[labels] = _Histogram(self.latency_buckets)
+            latency.observe(latency_seconds)
+
+            if payload_bytes is not None:
+                payload = self._payload.get(labels)
+                if payload is None:
+                    payload = self._payload[labels] = _Histogram(self.payload_buckets)
+                payload.observe(payload_bytes)
+
+            if exception is None:
+                self._successes[labels] = self._successes.get(labels, 0) + 1
+            else:
+                # Provider helpers wrap SDK errors in RuntimeError, the cause is the useful label
+                key = (labels, type(exception.__cause__ or exception).__name__)
+                self._failures[key] = self._failures.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            self._render_histograms(lines, "enqueue_latency_seconds", "Time spent enqueueing a task.", self._latency)
+            self._render_histograms(lines, "enqueue_payload_bytes", "Size of enqueued task bodies.", self._payload)
+
+            name = f"{self.namespace}_enqueue_success_total"
+            lines.append(f"# HELP {name} Tasks enqueued successfully.")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in self._successes.items():
+                lines.append(f"{name}{{{_format_labels(labels)}}} {value}")
+
+            name = f"{self.namespace}_enqueue_failure_total"
+            lines.append(f"# HELP {name} Tasks that failed to enqueue, by exception type.")
+            lines.append(f"# TYPE {name} counter")
+            for (labels, exception), value in self._failures.items():
+                lines.append(f'{name}{{{_format_labels(labels)},exception="{_escape(exception)}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def _render_histograms(self, lines: list, suffix: str, help_text: str, histograms: Dict[MetricLabels, _Histogram]):
+        name = f"{self.namespace}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in histograms.items():
+            label_text = _format_labels(labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_text},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_sum{{{label_text}}} {histogram.total}")
+            lines.append(f"{name}_count{{{label_text}}} {histogram.count}")
+
+
+def metrics_router(sink: PrometheusMetricsSink, *, path: str = "/metrics") -> APIRouter:
+    """
+    Returns a router exposing the sink in the Prometheus text format, e.g. app.include_router(metrics_router(sink)).
+    """
+    router = APIRouter()
+
+    @router.get(path, include_in_schema=False)
+    def metrics() -> Response:
+        return Response(content=sink.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    return router
+
+
+class _EnqueueTracker:
+    __slots__ = ("sink", "labels", "body", "started", "deferred")
+
+    def __init__(self, sink: MetricsSink, labels: MetricLabels, body: Any):
+        self.sink = sink
+        self.labels = labels
+        self.body = body
+        self.deferred = False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if not self.deferred or exc is not None:
+            self._record(exc)
+        return False
+
+    def follow(self, result: Any) -> Any:
+        """
+        A Future result (a message buffered for a batch send) is recorded when it
+        resolves, with its outcome and the time until then, instead of on exit.
+        """
+        if isinstance(result, Future):
+            self.deferred = True
+            result.add_done_callback(self._on_done)
+        return result
+
+    def _on_done(self, future: Future):
+        self._record(CancelledError() if future.cancelled() else future.exception())
+
+    def _record(self, exception: BaseException | None):
+        self.sink.record_enqueue(
+            self.labels,
+            latency_seconds=time.perf_counter() - self.started,
+            payload_bytes=_payload_size(self.body),
+            exception=exception,
+        )
+
+
+class _DisabledTracker:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def follow(self, result: Any) -> Any:
+        return result
+
+
+_DISABLED = _DisabledTracker()
+
+
+def track_enqueue(sink: MetricsSink | None, labels: MetricLabels, body: Any = None):
+    """
+    Context manager timing one enqueue. Without a sink it is a shared no-op, so routes pay nothing for metrics they do not collect.
+    """
+    if sink is None:
+        return _DISABLED
+    return _EnqueueTracker(sink, labels, body)
+
+
+def _payload_size(body: Any) -> int | None:
+    if body is None:
+        return None
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    try:
+        return len(json.dumps(body).encode())
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_labels(labels: MetricLabels) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels._asdict().items())
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,360 @@
+import atexit
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple
+import logging
+
+from fastapi_cloud_tasks.resilience import CircuitOpenError, is_retryable
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    route TEXT NOT NULL,
+    body BLOB,
+    headers TEXT,
+    options TEXT NOT NULL,
+    eta REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_lease ON outbox (leased_until, id);
+"""
+
+
+class OutboxTask(NamedTuple):
+    id: int
+    route: str
+    body: bytes | None
+    headers: dict | None
+    options: Dict[str, Any]
+    eta: float
+    attempts: int
+
+    @property
+    def remaining_delay_seconds(self) -> int:
+        # The delay counts from the original delay() call, not from when the task is forwarded
+        return max(math.ceil(self.eta - time.time()), 0)
+
+
+class TaskOutbox:
+    """
+    Durable local queue in front of the provider. delay() only appends the task to a
+    SQLite database at `path` and returns once it is committed; drainer threads then
+    forward stored tasks to Cloud Tasks or SQS and delete them when the provider
+    accepted them. Tasks survive provider outages and restarts and are delivered at
+    least once: a crash between sending and deleting sends the task again, so pair it
+    with idempotency keys where duplicates matter.
+
+    Appends that arrive while a commit is running share the next one, so concurrent
+    requests pay for one fsync per batch instead of one each. A forwarded batch is
+    leased for `lease_seconds`, which lets several processes drain the same file. A task
+    that failed with a transient error (`retryable`, by default is_retryable or an open
+    circuit breaker) is retried with exponential backoff and dropped after
+    `max_attempts`; one the provider will never accept is dropped right away.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        drainers: int = 2,
+        batch_size: int = 100,
+        max_in_flight: int = 32,
+        lease_seconds: float = 60.0,
+        retry_backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 300.0,
+        max_attempts: int | None = 20,
+        poll_seconds: float = 1.0,
+        compact_interval_seconds: float = 300.0,
+        retryable: Callable[[BaseException], bool] | None = None,
+    ):
+        if drainers < 1:
+            raise ValueError("drainers must be >= 1")
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+
+        self.path = path
+        self.drainers = drainers
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.compact_interval_seconds = compact_interval_seconds
+        self.retryable = retryable or _is_transient
+
+        self._db = _connect(path)
+        self._db_lock = threading.Lock()
+        self._routes: Dict[str, Callable[[OutboxTask], Any]] = {}
+
+        self._appends: List[Tuple[tuple, Future]] = []
+        self._cond = threading.Condition()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        self._senders = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="outbox-sender")
+        self._last_compaction = time.monotonic()
+
+    def register(self, route: str, forward: Callable[[OutboxTask], Any]):
+        """
+        Drains tasks stored for `route` with `forward`, which sends one task to the
+        provider and raises if it was not accepted. It may return a Future instead.
+        """
+        self._routes[route] = forward
+        self._wakeup.set()
+        with self._cond:
+            self._ensure_started()
+
+    def append(
+        self,
+        route: str,
+        *,
+        body: bytes | None,
+        headers: dict | None = None,
+        delay_seconds: float = 0,
+        **options,
+    ) -> Future:
+        """
+        Stores one task. The Future resolves with the task id once it is committed to disk.
+        `options` are handed back to the route's forward function in OutboxTask.options.
+        """
+        row = (
+            route,
+            body,
+            json.dumps(headers) if headers else None,
+            json.dumps(options),
+            time.time() + delay_seconds,
+        )
+        future: Future = Future()
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("TaskOutbox is closed")
+            self._ensure_started()
+            self._appends.append((row, future))
+            self._cond.notify()
+
+        return future
+
+    @property
+    def pending(self) -> int:
+        """
+        Tasks stored and not yet acknowledged by the provider, for every route.
+        """
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Waits until every stored task was forwarded. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float | None = None):
+        """
+        Commits buffered appends and stops the drainers after their current batch. Tasks
+        not forwarded yet stay on disk for the next start. Safe to call more than once.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._wakeup.set()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if self._threads:
+            atexit.unregister(self.close)
+
+        running = [thread.name for thread in self._threads if thread.is_alive()]
+        if running:
+            # A drainer stuck in a slow send would fail mid lease or ack on a closed connection
+            logger.warning("Outbox threads still running after %ss, leaving the database open: %s", timeout, running)
+            self._senders.shutdown(wait=False)
+            return
+
+        self._senders.shutdown(wait=True)
+        with self._db_lock:
+            self._db.close()
+
+    def _ensure_started(self):
+        # Caller must hold self._cond
+        if self._threads:
+            return
+
+        self._threads.append(threading.Thread(target=self._run_writer, name="outbox-writer", daemon=True))
+        for index in range(self.drainers):
+            self._threads.append(threading.Thread(target=self._run_drainer, name=f"outbox-drainer-{index}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                while not self._appends and not self._closed:
+                    self._cond.wait()
+                if not self._appends:
+                    return
+                appends, self._appends = self._appends, []
+
+            # One transaction, and so one fsync, for everything appended since the last commit
+            try:
+                with self._db_lock, _transaction(self._db):
+                    ids = [self._db.execute(_INSERT, row).lastrowid for row, _ in appends]
+            except Exception as exc:
+                logger.exception("Failed to store %s tasks in the outbox", len(appends))
+                for _, future in appends:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future), task_id in zip(appends, ids):
+                future.set_result(task_id)
+            self._wakeup.set()
+
+    def _run_drainer(self):
+        while not self._closed:
+            try:
+                tasks = self._lease()
+            except sqlite3.Error:
+                logger.exception("Failed to lease tasks from the outbox")
+                tasks = []
+
+            if not tasks:
+                self._maybe_compact()
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+
+            self._forward(tasks)
+
+    def _lease(self) -> List[OutboxTask]:
+        routes = list(self._routes)
+        if not routes:
+            return []
+
+        now = time.time()
+        placeholders = ",".join("?" * len(routes))
+        with self._db_lock, _transaction(self._db):
+            rows = self._db.execute(
+                f"SELECT id, route, body, headers, options, eta, attempts FROM outbox "
+                f"WHERE leased_until <= ? AND route IN ({placeholders}) ORDER BY id LIMIT ?",
+                (now, *routes, self.batch_size),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE outbox SET leased_until = ? WHERE id = ?",
+                [(now + self.lease_seconds, row[0]) for row in rows],
+            )
+
+        return [
+            OutboxTask(
+                id=task_id,
+                route=route,
+                body=body,
+                headers=json.loads(headers) if headers else None,
+                options=json.loads(options),
+                eta=eta,
+                attempts=attempts,
+            )
+            for task_id, route, body, headers, options, eta, attempts in rows
+        ]
+
+    def _forward(self, tasks: List[OutboxTask]):
+        sent = {self._senders.submit(self._send, task): task for task in tasks}
+        wait(sent)
+
+        acked, failed, dropped = [], [], []
+        now = time.time()
+        for future, task in sent.items():
+            exc = future.exception()
+            if exc is None:
+                acked.append((task.id,))
+                continue
+
+            attempts = task.attempts + 1
+            if not self.retryable(exc):
+                logger.error("Dropping outbox task %s, the provider rejected it: %s", task.id, exc)
+                dropped.append((task.id,))
+                continue
+            if self.max_attempts is not None and attempts >= self.max_attempts:
+                logger.error("Dropping outbox task %s after %s attempts: %s", task.id, attempts, exc)
+                dropped.append((task.id,))
+                continue
+
+            logger.warning("Failed to forward outbox task %s (attempt %s): %s", task.id, attempts, exc)
+            backoff = min(self.retry_backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+            failed.append((attempts, now + backoff, task.id))
+
+        with self._db_lock, _transaction(self._db):
+            # Acknowledged tasks are deleted right away, compaction only returns their pages to the OS
+            self._db.executemany("DELETE FROM outbox WHERE id = ?", acked + dropped)
+            self._db.executemany("UPDATE outbox SET attempts = ?, leased_until = ? WHERE id = ?", failed)
+
+        logger.debug("Forwarded outbox batch: sent=%s, failed=%s", len(acked), len(failed))
+
+    def _send(self, task: OutboxTask):
+        result = self._routes[task.route](task)
+        if isinstance(result, Future):
+            result = result.result()
+        return result
+
+    def _maybe_compact(self):
+        if time.monotonic() - self._last_compaction < self.compact_interval_seconds:
+            return
+        self._last_compaction = time.monotonic()
+
+        try:
+            with self._db_lock:
+                self._db.execute("PRAGMA incremental_vacuum")
+                self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error:
+            logger.exception("Failed to compact the outbox")
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # The breaker opens on provider failures, the task itself may well be fine
+    return isinstance(exc, CircuitOpenError) or is_retryable(exc)
+
+
+_INSERT = "INSERT INTO outbox (route, body, headers, options, eta) VALUES (?, ?, ?, ?, ?)"
+
+
+@contextmanager
+def _transaction(db: sqlite3.Connection) -> Iterator[None]:
+    # IMMEDIATE takes the write lock up front, so two processes never lease the same rows
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # Autocommit mode: transactions are opened explicitly. Every thread shares the
+    # connection behind TaskOutbox._db_lock.
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30.0)
+    # Only takes effect on a new database, freed pages can then be released with incremental_vacuum
+    db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db.execute("PRAGMA journal_mode = WAL")
+    # WAL with FULL syncs the log on every commit, so a committed append survives power loss
+    db.execute("PRAGMA synchronous = FULL")
+    db.executescript(_SCHEMA)
+    return db
@@ -0,0 +1,219 @@
+import atexit
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple
+import logging
+
+from fastapi_cloud_tasks.providers.aws.exceptions import BatchEntryFailedException
+
+logger = logging.getLogger(__name__)
+
+# send_message_batch limits: 10 entries and 256 KB of message bodies per call
+MAX_SQS_BATCH_SIZE = 10
+MAX_SQS_BATCH_BYTES = 256 * 1024
+
+
+class _PendingEntry(NamedTuple):
+    message_body: str
+    delay_seconds: int | None
+    size: int
+    future: Future
+    fifo_attributes: Dict[str, str]
+
+
+class SQSBatchEnqueuer:
+    """
+    Buffers SQS messages per queue and sends them with send_message_batch.
+
+    A batch is flushed as soon as it holds `max_batch_size` entries or
+    `max_batch_bytes` of bodies, or once its oldest entry has waited
+    `linger_seconds`. Every submitted message gets its own Future, which
+    resolves with the SQS result entry or fails with BatchEntryFailedException
+    when SQS rejects that message only.
+    """
+
+    def __init__(
+        self,
+        sqs_client,
+        *,
+        max_batch_size: int = MAX_SQS_BATCH_SIZE,
+        max_batch_bytes: int = MAX_SQS_BATCH_BYTES,
+        linger_seconds: float = 0.05,
+        max_workers: int = 4,
+    ):
+        if not 1 <= max_batch_size <= MAX_SQS_BATCH_SIZE:
+            raise ValueError(f"max_batch_size must be between 1 and {MAX_SQS_BATCH_SIZE}")
+        if not 0 < max_batch_bytes <= MAX_SQS_BATCH_BYTES:
+            raise ValueError(f"max_batch_bytes must be between 1 and {MAX_SQS_BATCH_BYTES}")
+        if linger_seconds < 0:
+            raise ValueError("linger_seconds must be >= 0")
+
+        self.sqs_client = sqs_client
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.linger_seconds = linger_seconds
+
+        self._pending: Dict[str, List[_PendingEntry]] = {}
+        self._pending_bytes: Dict[str, int] = {}
+        self._oldest: Dict[str, float] = {}
+        self._in_flight: set[Future] = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._senders = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqs-batch-sender")
+
+        atexit.register(self.close)
+
+    def submit(
+        self,
+        *,
+        queue_url: str,
+        message_body: str,
+        delay_seconds: int | None = 0,
+        message_group_id: str | None = None,
+        deduplication_id: str | None = None,
+    ) -> Future:
+        """
+        Buffers one message. For FIFO queues `delay_seconds` must be None and `message_group_id` set.
+        """
+        future: Future = Future()
+        size = len(message_body.encode("utf-8"))
+
+        if size > self.max_batch_bytes:
+            future.set_exception(ValueError(f"Message of {size} bytes exceeds the SQS limit of {self.max_batch_bytes} bytes"))
+            return future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SQSBatchEnqueuer is closed")
+            self._ensure_started()
+
+            if self._pending.get(queue_url) and self._pending_bytes[queue_url] + size > self.max_batch_bytes:
+                self._dispatch(queue_url)
+
+            entries = self._pending.setdefault(queue_url, [])
+            if not entries:
+                self._oldest[queue_url] = time.monotonic()
+                self._pending_bytes[queue_url] = 0
+
+            fifo_attributes = {}
+            if message_group_id is not None:
+                fifo_attributes["MessageGroupId"] = message_group_id
+            if deduplication_id is not None:
+                fifo_attributes["MessageDeduplicationId"] = deduplication_id
+            entries.append(_PendingEntry(message_body, delay_seconds, size, future, fifo_attributes))
+            self._pending_bytes[queue_url] += size
+
+            if len(entries) >= self.max_batch_size:
+                self._dispatch(queue_url)
+            else:
+                self._cond.notify()
+
+        return future
+
+    def flush(self, timeout: float | None = None):
+        """
+        Sends every buffered message now and waits for the in-flight batches to finish.
+        """
+        with self._cond:
+            for queue_url in list(self._pending):
+                self._dispatch(queue_url)
+            in_flight = list(self._in_flight)
+
+        wait(in_flight, timeout=timeout)
+
+    def close(self, timeout: float | None = None):
+        """
+        Flushes buffered messages and stops the background threads. Safe to call more than once,
+        e.g. from an app shutdown handler and again at interpreter exit.
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush(timeout)
+        self._senders.shutdown(wait=True)
+        atexit.unregister(self.close)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sqs-batch-linger", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                next_deadline = None
+
+                for queue_url, started in list(self._oldest.items()):
+                    deadline = started + self.linger_seconds
+                    if self._closed or deadline <= now:
+                        self._dispatch(queue_url)
+                    elif next_deadline is None or deadline < next_deadline:
+                        next_deadline = deadline
+
+                if self._closed:
+                    return
+
+                self._cond.wait(None if next_deadline is None else next_deadline - now)
+
+    def _dispatch(self, queue_url: str):
+        # Caller must hold self._cond
+        entries = self._pending.pop(queue_url, None)
+        self._pending_bytes.pop(queue_url, None)
+        self._oldest.pop(queue_url, None)
+        if not entries:
+            return
+
+        sent = self._senders.submit(self._send_batch, queue_url, entries)
+        self._in_flight.add(sent)
+        sent.add_done_callback(self._forget)
+
+    def _forget(self, sent: Future):
+        with self._cond:
+            self._in_flight.discard(sent)
+
+    def _send_batch(self, queue_url: str, entries: List[_PendingEntry]):
+        try:
+            response = self.sqs_client.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[_batch_entry(index, entry) for index, entry in enumerate(entries)],
+            )
+        except Exception as exc:
+            logger.exception("send_message_batch failed for %s messages on %s", len(entries), queue_url)
+            for entry in entries:
+                entry.future.set_exception(exc)
+            return
+
+        by_id = {str(index): entry for index, entry in enumerate(entries)}
+
+        for result in response.get("Successful", []):
+            by_id.pop(result["Id"]).future.set_result(result)
+
+        for result in response.get("Failed", []):
+            by_id.pop(result["Id"]).future.set_exception(
+                BatchEntryFailedException(
+                    code=result.get("Code", ""),
+                    message=result.get("Message", ""),
+                    sender_fault=result.get("SenderFault", False),
+                )
+            )
+
+        for entry in by_id.values():
+            entry.future.set_exception(RuntimeError("SQS did not report a result for the batch entry"))
+
+        logger.debug("Sent SQS batch: queue=%s, size=%s", queue_url, len(entries))
+
+
+def _batch_entry(index: int, entry: _PendingEntry) -> dict:
+    batch_entry = {"Id": str(index), "MessageBody": entry.message_body, **entry.fifo_attributes}
+    # FIFO queues reject DelaySeconds, even when it is 0
+    if entry.delay_seconds is not None:
+        batch_entry["DelaySeconds"] = entry.delay_seconds
+    return batch_entry
@@ -0,0 +1,92 @@
+import threading
+from typing import Any, Dict, Hashable
+
+import boto3
+from botocore.config import Config
+
+
+class AWSClientRegistry:
+    """
+    Builds each boto3 service client once per session/region and hands the same
+    instance to every caller. boto3 clients are thread-safe once created, but
+    creating them from a shared session is not, so creation is serialized.
+    """
+
+    def __init__(
+        self,
+        *,
+        session: boto3.session.Session | None = None,
+        region_name: str | None = None,
+        max_pool_connections: int = 50,
+        tcp_keepalive: bool = True,
+        config: Config | None = None,
+        clients: Dict[str, Any] | None = None,
+    ):
+        self.session = session or boto3.session.Session(region_name=region_name)
+        self.config = config or Config(
+            max_pool_connections=max_pool_connections,
+            tcp_keepalive=tcp_keepalive,
+        )
+        self._clients: Dict[str, Any] = dict(clients or {})
+        # Injected clients may talk to another account or region than the session
+        self._injected = tuple(sorted(self._clients.items(), key=lambda item: item[0]))
+        # Set on registries made by with_clients(), which get every other client from it
+        self._parent: AWSClientRegistry | None = None
+        self._lock = threading.Lock()
+
+    def client(self, service_name: str):
+        client = self._clients.get(service_name)
+        if client is not None:
+            return client
+        if self._parent is not None:
+            return self._parent.client(service_name)
+
+        with self._lock:
+            client = self._clients.get(service_name)
+            if client is None:
+                client = self.session.client(service_name, config=self.config)
+                self._clients[service_name] = client
+            return client
+
+    def with_clients(self, clients: Dict[str, Any]) -> "AWSClientRegistry":
+        """
+        Returns a registry with some service clients replaced. Every other client comes
+        from this registry, whenever it is created, so builders keep sharing them.
+        """
+        overrides = {name: client for name, client in clients.items() if client is not None}
+        if not overrides:
+            return self
+
+        registry = AWSClientRegistry(session=self.session, config=self.config, clients=overrides)
+        registry._parent = self
+        return registry
+
+    @property
+    def scope(self) -> Hashable:
+        # Resources are per account and region, the credentials stand in for the account
+        # so no extra STS round-trip is needed. Injected clients are part of the scope by
+        # identity, so nothing provisioned through one is handed out for another.
+        if self._parent is not None:
+            return (self._parent.scope, self._injected)
+        credentials = self.session.get_credentials()
+        access_key = credentials.access_key if credentials else None
+        return (self.session.region_name, access_key, self._injected)
+
+
+_default_registry: AWSClientRegistry | None = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry() -> AWSClientRegistry:
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = AWSClientRegistry()
+    return _default_registry
+
+
+def set_default_registry(registry: AWSClientRegistry):
+    global _default_registry
+    with _default_registry_lock:
+        _default_registry = registry
@@ -1,17 +1,31 @@
-import boto3
+import asyncio
+import base64
+import functools
 import uuid
-from datetime import datetime, timedelta, timezone
-from fastapi.routing import APIRoute
-from fastapi import Request, Response
-from typing import Callable, Type, Optional, Dict, Any
+from concurrent.futures import Executor
+from typing import Optional, Dict, Any
 import logging
 import json
-import boto3
+from urllib.parse import urlparse
 
-from fastapi_cloud_tasks.providers.aws.utils import deploy_lambda
+from fastapi_cloud_tasks.codec import PayloadCodec, check_body_size
+from fastapi_cloud_tasks.providers.aws.batcher import SQSBatchEnqueuer
+from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry, get_default_registry
+from fastapi_cloud_tasks.serializers import DEFAULT_SERIALIZER, Serializer, encode_task_body, with_content_type
 
 logger = logging.getLogger(__name__)
 
+# SQS rejects per-message delays above 15 minutes
+MAX_SQS_DELAY_SECONDS = 900
+
+# SQS messages are capped at 256 KB. Compressed bodies travel base64 encoded inside the
+# JSON envelope, which leaves about three quarters of it (minus headroom for the envelope)
+MAX_SQS_MESSAGE_BYTES = 256 * 1024
+MAX_SQS_BODY_BYTES = (MAX_SQS_MESSAGE_BYTES - 8 * 1024) * 3 // 4
+
+# FIFO messages sent without an idempotency key all share this group
+DEFAULT_MESSAGE_GROUP_ID = "fastapi-cloud-tasks"
+
 def aws_create_delay_task(
     sqs_client,
     lambda_client,
@@ -19,30 +33,243 @@ def aws_create_delay_task(
     lambda_arn,
     queue_url,
     endpoint_url: str,
-    body: Dict[str, Any],
+    body: Any,
     delay_seconds: int,
     http_method: str = "POST",
-    headers: Optional[Dict[str, str]] = None
+    headers: Optional[Dict[str, str]] = None,
+    batcher: Optional[SQSBatchEnqueuer] = None,
+    serializer: Optional[Serializer] = None,
+    codec: Optional[PayloadCodec] = None,
+    deduplication_id: Optional[str] = None,
+    message_group_id: Optional[str] = None,
 ):
-    # create queue
-    
-    
+    """
+    Pushes the http request onto SQS. With a `batcher` the message is buffered
+    for send_message_batch and a Future holding its result is returned instead
+    of the send_message response.
+
+    On a FIFO queue (URL ending in .fifo) `deduplication_id` makes SQS drop repeats
+    for five minutes, and `message_group_id` defaults to it so unrelated messages are
+    not serialized behind each other. FIFO queues do not support per-message delays.
+    On standard queues both are ignored.
+    """
+    _validate_delay_task_args(
+        queue_url=queue_url,
+        endpoint_url=endpoint_url,
+        delay_seconds=delay_seconds,
+    )
+
+    fifo = queue_url.endswith(".fifo")
+    if fifo and delay_seconds:
+        raise ValueError("FIFO queues do not support per-message delay_seconds")
+
     # create message with http request info
-    message_payload = {
+    message_body = json.dumps(
+        build_message_payload(
+            endpoint_url=endpoint_url,
+            http_method=http_method,
+            headers=headers,
+            body=body,
+            serializer=serializer,
+            codec=codec,
+        )
+    )
+
+    if fifo:
+        message_group_id = message_group_id or deduplication_id or DEFAULT_MESSAGE_GROUP_ID
+    else:
+        message_group_id = deduplication_id = None
+
+    if batcher is not None:
+        return batcher.submit(
+            queue_url=queue_url,
+            message_body=message_body,
+            delay_seconds=None if fifo else delay_seconds,
+            message_group_id=message_group_id,
+            deduplication_id=deduplication_id,
+        )
+
+    if fifo:
+        fifo_attributes = {"MessageGroupId": message_group_id}
+        if deduplication_id:
+            fifo_attributes["MessageDeduplicationId"] = deduplication_id
+        response = sqs_client.send_message(QueueUrl=queue_url, MessageBody=message_body, **fifo_attributes)
+    else:
+        # send message with per-message delay
+        response = sqs_client.send_message(
+            QueueUrl=queue_url,
+            MessageBody=message_body,
+            DelaySeconds=delay_seconds
+        )
+
+    logger.debug(
+        "Pushed SQS message: queue=%s, url=%s, delay=%ss, method=%s",
+        queue_url,
+        endpoint_url,
+        delay_seconds,
+        http_method,
+    )
+
+    return response
+
+
+async def aws_create_delay_task_async(
+    sqs_client,
+    lambda_client,
+    role_arn,
+    lambda_arn,
+    queue_url,
+    endpoint_url: str,
+    body: Any,
+    delay_seconds: int,
+    http_method: str = "POST",
+    headers: Optional[Dict[str, str]] = None,
+    executor: Optional[Executor] = None,
+    batcher: Optional[SQSBatchEnqueuer] = None,
+    serializer: Optional[Serializer] = None,
+    codec: Optional[PayloadCodec] = None,
+    deduplication_id: Optional[str] = None,
+    message_group_id: Optional[str] = None,
+):
+    """
+    Awaitable counterpart of aws_create_delay_task. boto3 has no native asyncio
+    support, so the blocking send_message call runs on `executor` (the loop's
+    default executor when omitted) and the event loop stays free.
+    """
+    _validate_delay_task_args(
+        queue_url=queue_url,
+        endpoint_url=endpoint_url,
+        delay_seconds=delay_seconds,
+    )
+
+    if batcher is not None:
+        # Buffering is non-blocking; only the batch send itself runs on a thread
+        return await asyncio.wrap_future(
+            aws_create_delay_task(
+                sqs_client=sqs_client,
+                lambda_client=lambda_client,
+                role_arn=role_arn,
+                lambda_arn=lambda_arn,
+                queue_url=queue_url,
+                endpoint_url=endpoint_url,
+                body=body,
+                delay_seconds=delay_seconds,
+                http_method=http_method,
+                headers=headers,
+                batcher=batcher,
+                serializer=serializer,
+                codec=codec,
+                deduplication_id=deduplication_id,
+                message_group_id=message_group_id,
+            )
+        )
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        functools.partial(
+            aws_create_delay_task,
+            sqs_client=sqs_client,
+            lambda_client=lambda_client,
+            role_arn=role_arn,
+            lambda_arn=lambda_arn,
+            queue_url=queue_url,
+            endpoint_url=endpoint_url,
+            body=body,
+            delay_seconds=delay_seconds,
+            http_method=http_method,
+            headers=headers,
+            serializer=serializer,
+            codec=codec,
+            deduplication_id=deduplication_id,
+            message_group_id=message_group_id,
+        ),
+    )
+
+
+def check_delay_task(
+    *,
+    queue_url: str,
+    endpoint_url: str,
+    body: bytes | None,
+    delay_seconds: int,
+    http_method: str = "POST",
+    headers: Optional[Dict[str, str]] = None,
+    serializer: Optional[Serializer] = None,
+    codec: Optional[PayloadCodec] = None,
+):
+    """
+    Raises ValueError for a message SQS would reject whenever it is sent, so it is
+    refused before being stored for later, e.g. in an outbox.
+    """
+    _validate_delay_task_args(queue_url=queue_url, endpoint_url=endpoint_url, delay_seconds=delay_seconds)
+    if queue_url.endswith(".fifo") and delay_seconds:
+        raise ValueError("FIFO queues do not support per-message delay_seconds")
+
+    if codec is not None:
+        check_body_size(body, codec, max_body_bytes=MAX_SQS_BODY_BYTES)
+        return
+    message = build_message_payload(
+        endpoint_url=endpoint_url, http_method=http_method, headers=headers, body=body, serializer=serializer
+    )
+    size = len(json.dumps(message).encode())
+    if size > MAX_SQS_MESSAGE_BYTES:
+        raise ValueError(f"SQS message is {size} bytes, over the {MAX_SQS_MESSAGE_BYTES} byte limit")
+
+
+def _validate_delay_task_args(*, queue_url: str, endpoint_url: str, delay_seconds: int):
+    if not queue_url:
+        raise ValueError("queue_url must not be empty")
+    if not endpoint_url or not urlparse(endpoint_url).scheme:
+        raise ValueError(f"Invalid endpoint_url: {endpoint_url}")
+    if delay_seconds < 0:
+        raise ValueError("delay_seconds must be >= 0")
+    if delay_seconds > MAX_SQS_DELAY_SECONDS:
+        raise ValueError(f"delay_seconds must be <= {MAX_SQS_DELAY_SECONDS}")
+
+
+def build_message_payload(
+    *,
+    endpoint_url: str,
+    http_method: str,
+    headers: Optional[Dict[str, str]],
+    body: Any,
+    serializer: Optional[Serializer] = None,
+    codec: Optional[PayloadCodec] = None,
+) -> Dict[str, Any]:
+    """
+    The message the delay handler Lambda replays. The body is carried already encoded
+    so the Lambda forwards the exact bytes without decoding them: text serializers
+    embed it as a string, binary ones (msgpack, compressed bodies) as base64.
+    """
+    serializer = serializer or DEFAULT_SERIALIZER
+    encoded_body = encode_task_body(body, serializer)
+
+    payload = {
         "endpoint_url": endpoint_url,
         "http_method": http_method,
         "headers": headers or {},
-        "body": body
     }
+    if encoded_body is None:
+        return payload
 
-    # send message with per-message delay
-    sqs_client.send_message(
-        QueueUrl=queue_url,
-        MessageBody=json.dumps(message_payload),
-        DelaySeconds=delay_seconds
-    )
+    payload["headers"] = with_content_type(headers, serializer.content_type)
+    if codec is not None:
+        encoded_body, payload["headers"] = codec.encode(
+            encoded_body, payload["headers"], max_body_bytes=MAX_SQS_BODY_BYTES
+        )
+    if serializer.is_text:
+        try:
+            payload["body"] = encoded_body.decode("utf-8")
+            payload["body_encoding"] = "utf-8"
+            return payload
+        except UnicodeDecodeError:
+            # Raw bytes passed by the caller that are not text
+            pass
 
-    print(f"Message pushed with {delay_seconds}s delay")
+    payload["body"] = base64.b64encode(encoded_body).decode("ascii")
+    payload["body_encoding"] = "base64"
+    return payload
 
 
 def create_eventbridge_schedule(role_arn: str, delay_seconds):
@@ -53,9 +280,10 @@ def create_api_destination(
         api_destination_name: str | None = None,
         endpoint_url: str, 
         http_method: str,
+        clients: AWSClientRegistry | None = None,
     ):
 
-    client = boto3.client('events')
+    client = (clients or get_default_registry()).client("events")
 
     unique_id = uuid.uuid4().hex[:8]
     api_destination_name = api_destination_name or f"DelayTask-{unique_id}"
@@ -78,16 +306,3 @@ def create_api_destination(
     )
     api_destination_arn = response["ApiDestinationArn"]
     return api_destination_arn
-
-
-
-
-
-
-
-    
-
-    
-
-
-    
@@ -0,0 +1,10 @@
+class BatchEntryFailedException(Exception):
+    """
+    Raised for a single message that SQS rejected inside an otherwise successful send_message_batch call.
+    """
+
+    def __init__(self, code: str, message: str, sender_fault: bool):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.sender_fault = sender_fault
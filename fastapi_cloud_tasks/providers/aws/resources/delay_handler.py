@@ -1,33 +1,173 @@
+import base64
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
 import urllib3
 
-http = urllib3.PoolManager()
+# SQS hands the function at most 10 records per batch, so one slot per record
+MAX_CONCURRENCY = int(os.environ.get("DELAY_HANDLER_MAX_CONCURRENCY", "10"))
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("DELAY_HANDLER_TIMEOUT_SECONDS", "10"))
+
+# Stop starting requests this long before the invocation times out, so the partial
+# batch response still gets returned
+TIMEOUT_MARGIN_SECONDS = 1.0
+
+# SQS caps the visibility timeout at 12 hours
+MAX_VISIBILITY_TIMEOUT_SECONDS = 43200
+
+http = urllib3.PoolManager(maxsize=MAX_CONCURRENCY)
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY)
+sqs = None
+# Queue ARN -> URL, looked up once per queue
+queue_urls = {}
+
 
 def lambda_handler(event, context):
+    deadline = _deadline(context)
+
+    # EventBridge schedules invoke the function with the message itself rather than SQS records
+    if "Records" not in event:
+        status, _ = _dispatch(event, deadline=deadline)
+        if not 200 <= status < 300:
+            raise RuntimeError(f"Scheduled request failed with status {status}")
+        return {"status": "success"}
+
+    records = event["Records"]
+    failed = set()
+    for group_failures in executor.map(lambda group: _dispatch_group(group, deadline), _message_groups(records)):
+        failed.update(group_failures)
+
+    failures = [{"itemIdentifier": record["messageId"]} for record in records if record["messageId"] in failed]
+
+    # Only the failed messages become visible again on the queue
+    return {"batchItemFailures": failures}
+
+
+def _message_groups(records):
+    # Records of a FIFO message group are sent one after the other, in order; every
+    # other record is a group of its own and runs concurrently
+    groups = {}
+    for index, record in enumerate(records):
+        group_id = record.get("attributes", {}).get("MessageGroupId")
+        groups.setdefault(group_id if group_id is not None else index, []).append(record)
+    return list(groups.values())
+
+
+def _dispatch_group(records, deadline):
+    for index, record in enumerate(records):
+        if not _dispatch_record(record, deadline):
+            # A FIFO group must not run past a failed message: it and everything after
+            # it in the group are reported, so SQS redelivers them in order
+            return [failed["messageId"] for failed in records[index:]]
+    return []
+
+
+def _dispatch_record(record, deadline) -> bool:
+    if deadline is not None and deadline - time.monotonic() <= 0:
+        print(f"No time left to dispatch message {record.get('messageId')}")
+        return False
+
     try:
-        for record in event['Records']:
-            message = json.loads(record['body'])
+        # The message id stays the same when SQS redelivers, which lets the route skip duplicates
+        status, retry_after = _dispatch(
+            json.loads(record["body"]), message_id=record.get("messageId"), deadline=deadline
+        )
+    except Exception as e:
+        print(f"Error dispatching message {record.get('messageId')}: {e}")
+        return False
 
-            endpoint_url = message.get("endpoint_url")
-            http_method = message.get("http_method", "POST").upper()
-            headers = message.get("headers", {})
-            body = message.get("body", {})
+    if not 200 <= status < 300:
+        print(f"Message {record.get('messageId')} failed with status {status}")
+        if status in (429, 503) and retry_after:
+            _postpone(record, retry_after)
+        return False
+    return True
 
-            print(f"Hitting {endpoint_url} with {http_method}")
 
-            encoded_body = json.dumps(body).encode("utf-8") if body else None
-            response = http.request(
-                http_method,
-                endpoint_url,
-                body=encoded_body,
-                headers=headers
-            )
+def _deadline(context):
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - TIMEOUT_MARGIN_SECONDS
 
-            print(f"Response status: {response.status}")
-            print(f"Response data: {response.data.decode('utf-8')}")
 
-        return {"status": "success"}
+def _postpone(record, retry_after):
+    # The app shed the request: keep the message hidden for as long as it asked, instead of
+    # the queue's visibility timeout, so SQS backs off with it
+    global sqs
+    try:
+        seconds = min(_retry_after_seconds(retry_after), MAX_VISIBILITY_TIMEOUT_SECONDS)
+        if sqs is None:
+            import boto3
 
+            sqs = boto3.client("sqs")
+        sqs.change_message_visibility(
+            QueueUrl=_queue_url(record["eventSourceARN"]),
+            ReceiptHandle=record["receiptHandle"],
+            VisibilityTimeout=seconds,
+        )
     except Exception as e:
-        print(f"Error: {str(e)}")
-        raise
+        print(f"Could not postpone message {record.get('messageId')}: {e}")
+
+
+def _retry_after_seconds(retry_after):
+    # Retry-After is either a number of seconds or an HTTP date
+    retry_after = retry_after.strip()
+    if retry_after.isdigit():
+        return int(retry_after)
+    return max(int(parsedate_to_datetime(retry_after).timestamp() - time.time()), 0)
+
+
+def _queue_url(queue_arn):
+    # The URL's domain depends on the partition (aws-cn, aws-us-gov), so ask SQS for it
+    queue_url = queue_urls.get(queue_arn)
+    if queue_url is None:
+        _, _, _, _, account, queue_name = queue_arn.split(":")
+        queue_url = sqs.get_queue_url(QueueName=queue_name, QueueOwnerAWSAccountId=account)["QueueUrl"]
+        queue_urls[queue_arn] = queue_url
+    return queue_url
+
+
+def _dispatch(message, message_id=None, deadline=None):
+    endpoint_url = message.get("endpoint_url")
+    http_method = message.get("http_method", "POST").upper()
+    headers = message.get("headers", {})
+    if message_id:
+        headers = {**headers, "X-SQS-Message-Id": message_id}
+
+    timeout = REQUEST_TIMEOUT_SECONDS
+    if deadline is not None:
+        timeout = max(min(timeout, deadline - time.monotonic()), 0.1)
+
+    response = http.request(
+        http_method,
+        endpoint_url,
+        body=_encoded_body(message),
+        headers=headers,
+        timeout=urllib3.Timeout(total=timeout),
+        retries=False,
+        preload_content=False,
+    )
+
+    # The response body is not needed, discard it unbuffered so the connection can go back to the pool
+    response.drain_conn()
+    response.release_conn()
+    return response.status, response.headers.get("Retry-After")
+
+
+def _encoded_body(message):
+    body = message.get("body")
+    encoding = message.get("body_encoding")
+
+    # The body was encoded by the serializer of the route, and possibly compressed or swapped
+    # for a blob reference by its PayloadCodec. Forward it byte for byte with its headers and
+    # let the receiving route decode it, so it also stays compressed on the way to the app
+    if encoding == "base64":
+        return base64.b64decode(body)
+    if encoding == "utf-8":
+        return body.encode("utf-8")
+
+    # Messages enqueued before body_encoding existed carry the body as a JSON object
+    return json.dumps(body).encode("utf-8") if body else None
@@ -1,6 +1,23 @@
-import uuid
-import boto3
 import json
+from typing import Any
+
+from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry, get_default_registry
+from fastapi_cloud_tasks.providers.aws.delayer import build_message_payload
+from fastapi_cloud_tasks.serializers import Serializer
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Schedules live either as EventBridge rules on the default bus or in EventBridge Scheduler,
+# which has no per-bus rule quota and is the better fit for large numbers of schedules
+SCHEDULE_BACKENDS = ("rules", "scheduler")
+
+# Every rule has exactly one target with this id, so re-scheduling replaces it instead of adding one
+SCHEDULE_TARGET_ID = "fastapi-cloud-tasks"
+
+# Targets added by earlier versions, one per schedule() call
+_LEGACY_TARGET_PREFIX = "LambdaTarget-"
 
 def aws_schedule_job(
         *,
@@ -8,40 +25,270 @@ def aws_schedule_job(
         endpoint_url: str,
         schedule: str,
         headers: dict | None = None,
-        body: dict | None = None, 
+        body: Any = None,
         http_method: str,
-        lambda_arn: str
+        lambda_arn: str,
+        clients: AWSClientRegistry | None = None,
+        serializer: Serializer | None = None,
+        backend: str = "rules",
+        scheduler_role_arn: str | None = None,
+        schedule_group: str = "default",
     ):
-    
-    eventbridge_client = boto3.client("events")
+    """
+    Creates or updates the schedule `name` so that it invokes the delay Lambda with the
+    HTTP request. Idempotent: calling it again with the same arguments changes nothing,
+    and the target is only rewritten when its input differs.
+
+    The "scheduler" backend needs `scheduler_role_arn`, a role EventBridge Scheduler can
+    assume to invoke the Lambda.
+    """
+    target_input = _target_input(
+        endpoint_url=endpoint_url,
+        http_method=http_method,
+        headers=headers,
+        body=body,
+        serializer=serializer,
+    )
+    clients = clients or get_default_registry()
+
+    if _backend(backend) == "scheduler":
+        _put_schedule(
+            clients=clients,
+            name=name,
+            schedule=schedule,
+            target_input=target_input,
+            lambda_arn=lambda_arn,
+            scheduler_role_arn=scheduler_role_arn,
+            schedule_group=schedule_group,
+        )
+        return
+
+    eventbridge_client = clients.client("events")
+    rule_arn = eventbridge_client.put_rule(
+        Name=name,
+        ScheduleExpression=schedule,
+        State="ENABLED",
+        Description="FastAPI Cloud Tasks Scheduler",
+    )["RuleArn"]
+
+    _put_rule_target(clients=clients, name=name, rule_arn=rule_arn, lambda_arn=lambda_arn, target_input=target_input)
+    logger.info("Scheduled EventBridge rule %s (%s)", name, schedule)
+
+
+def aws_update_schedule_job(
+        *,
+        name: str,
+        schedule: str,
+        lambda_arn: str,
+        endpoint_url: str | None = None,
+        http_method: str | None = None,
+        headers: dict | None = None,
+        body: Any = None,
+        clients: AWSClientRegistry | None = None,
+        serializer: Serializer | None = None,
+        backend: str = "rules",
+        schedule_group: str = "default",
+    ):
+    """
+    Changes the expression of an existing schedule. The target input, i.e. the request
+    sent to the endpoint, is only rebuilt when `headers` or `body` are given.
+    """
+    clients = clients or get_default_registry()
+    target_input = None
+    if headers is not None or body is not None:
+        target_input = _target_input(
+            endpoint_url=endpoint_url,
+            http_method=http_method,
+            headers=headers,
+            body=body,
+            serializer=serializer,
+        )
+
+    if _backend(backend) == "scheduler":
+        scheduler_client = clients.client("scheduler")
+        current = scheduler_client.get_schedule(Name=name, GroupName=schedule_group)
+        target = {"Input": target_input} if target_input is not None else {}
+        scheduler_client.update_schedule(
+            **_merged_schedule(current, name=name, schedule_group=schedule_group, target=target, ScheduleExpression=schedule)
+        )
+        logger.info("Updated EventBridge schedule %s (%s)", name, schedule)
+        return
+
+    eventbridge_client = clients.client("events")
+    # put_rule would silently create a rule without a target, so make sure it exists first
+    current = eventbridge_client.describe_rule(Name=name)
+    rule_arn = eventbridge_client.put_rule(
+        Name=name,
+        ScheduleExpression=schedule,
+        State=current.get("State", "ENABLED"),
+        Description=current.get("Description", "FastAPI Cloud Tasks Scheduler"),
+    )["RuleArn"]
+
+    if target_input is not None:
+        _put_rule_target(clients=clients, name=name, rule_arn=rule_arn, lambda_arn=lambda_arn, target_input=target_input)
+    logger.info("Updated EventBridge rule %s (%s)", name, schedule)
+
+
+def aws_delete_schedule_job(
+        *,
+        name: str,
+        lambda_arn: str | None = None,
+        clients: AWSClientRegistry | None = None,
+        backend: str = "rules",
+        schedule_group: str = "default",
+    ):
+    """
+    Deletes the schedule, and for rules their targets and the Lambda permission they used.
+    """
+    clients = clients or get_default_registry()
+
+    if _backend(backend) == "scheduler":
+        clients.client("scheduler").delete_schedule(Name=name, GroupName=schedule_group)
+        logger.info("Deleted EventBridge schedule %s", name)
+        return
+
+    eventbridge_client = clients.client("events")
+    # A rule cannot be deleted while it still has targets
+    target_ids = [target["Id"] for target in eventbridge_client.list_targets_by_rule(Rule=name)["Targets"]]
+    if target_ids:
+        eventbridge_client.remove_targets(Rule=name, Ids=target_ids)
+    eventbridge_client.delete_rule(Name=name)
+
+    if lambda_arn:
+        lambda_client = clients.client("lambda")
+        try:
+            lambda_client.remove_permission(FunctionName=lambda_arn, StatementId=_permission_id(name))
+        except lambda_client.exceptions.ResourceNotFoundException:
+            pass
+    logger.info("Deleted EventBridge rule %s", name)
+
+
+def _backend(backend: str) -> str:
+    if backend not in SCHEDULE_BACKENDS:
+        raise ValueError(f"backend must be one of {SCHEDULE_BACKENDS}, got {backend!r}")
+    return backend
+
+
+def _target_input(*, endpoint_url, http_method, headers, body, serializer) -> str:
+    payload = build_message_payload(
+        endpoint_url=endpoint_url,
+        http_method=http_method,
+        headers=headers,
+        body=body,
+        serializer=serializer,
+    )
+    # Sorted keys keep the input byte-identical between calls, so unchanged targets are detected
+    return json.dumps(payload, sort_keys=True)
+
+
+def _put_rule_target(*, clients: AWSClientRegistry, name: str, rule_arn: str, lambda_arn: str, target_input: str):
+    eventbridge_client = clients.client("events")
+    targets = eventbridge_client.list_targets_by_rule(Rule=name)["Targets"]
+
+    stale = [target["Id"] for target in targets if target["Id"].startswith(_LEGACY_TARGET_PREFIX)]
+    if stale:
+        eventbridge_client.remove_targets(Rule=name, Ids=stale)
+        logger.info("Removed %s duplicate targets from EventBridge rule %s", len(stale), name)
+
+    current = next((target for target in targets if target["Id"] == SCHEDULE_TARGET_ID), None)
+    if current is not None and current.get("Arn") == lambda_arn and current.get("Input") == target_input:
+        return
+
+    if current is None:
+        _allow_rule_to_invoke(clients=clients, name=name, rule_arn=rule_arn, lambda_arn=lambda_arn)
+
+    eventbridge_client.put_targets(
+        Rule=name,
+        Targets=[{"Id": SCHEDULE_TARGET_ID, "Arn": lambda_arn, "Input": target_input}],
+    )
+
+
+def _allow_rule_to_invoke(*, clients: AWSClientRegistry, name: str, rule_arn: str, lambda_arn: str):
+    lambda_client = clients.client("lambda")
     try:
-        # Create the scheduled rule
-        response = eventbridge_client.put_rule(
-            Name= name,
-            ScheduleExpression=schedule,  # Every day at 8 AM UTC
-            State="ENABLED",
-            Description="FastAPI Cloud Tasks Scheduler"
+        lambda_client.add_permission(
+            FunctionName=lambda_arn,
+            StatementId=_permission_id(name),
+            Action="lambda:InvokeFunction",
+            Principal="events.amazonaws.com",
+            SourceArn=rule_arn,
         )
+    except lambda_client.exceptions.ResourceConflictException:
+        pass
 
-        rule_arn = response["RuleArn"]
-
-        # Define the payload to send to Lambda
-        payload = {
-            "http_method": http_method,
-            "endpoint_url": endpoint_url,
-            "body": body or {},
-            "headers": headers or {}
-        }
-
-        # Attach Lambda as target with input payload
-        eventbridge_client.put_targets(
-            Rule=name,
-            Targets=[{
-                "Id": f"LambdaTarget-{uuid.uuid4()}",
-                "Arn": lambda_arn,
-                "Input": json.dumps(payload)
-            }]
+
+def _permission_id(name: str) -> str:
+    return f"fastapi-cloud-tasks-rule-{name}"
+
+
+def _put_schedule(
+    *,
+    clients: AWSClientRegistry,
+    name: str,
+    schedule: str,
+    target_input: str,
+    lambda_arn: str,
+    scheduler_role_arn: str | None,
+    schedule_group: str,
+):
+    if not scheduler_role_arn:
+        raise ValueError("The scheduler backend needs scheduler_role_arn")
+
+    scheduler_client = clients.client("scheduler")
+    target = {"Arn": lambda_arn, "RoleArn": scheduler_role_arn, "Input": target_input}
+    definition = {
+        "Name": name,
+        "GroupName": schedule_group,
+        "ScheduleExpression": schedule,
+        "FlexibleTimeWindow": {"Mode": "OFF"},
+        "State": "ENABLED",
+        "Target": target,
+    }
+
+    try:
+        current = scheduler_client.get_schedule(Name=name, GroupName=schedule_group)
+    except scheduler_client.exceptions.ResourceNotFoundException:
+        scheduler_client.create_schedule(**definition)
+        logger.info("Created EventBridge schedule %s (%s)", name, schedule)
+        return
+
+    current_target = current.get("Target", {})
+    if (
+        current.get("ScheduleExpression") == schedule
+        and current.get("State") == "ENABLED"
+        and all(current_target.get(key) == value for key, value in target.items())
+    ):
+        return
+
+    scheduler_client.update_schedule(
+        **_merged_schedule(
+            current, name=name, schedule_group=schedule_group, target=target, ScheduleExpression=schedule, State="ENABLED"
         )
-    except eventbridge_client.exceptions.ClientError as e:
-        print("Error creating EventBridge rule:", e)
-        raise
+    )
+    logger.info("Updated EventBridge schedule %s (%s)", name, schedule)
+
+
+# update_schedule replaces the whole schedule, these are the fields it takes besides Name and GroupName
+_SCHEDULE_FIELDS = (
+    "ScheduleExpression",
+    "ScheduleExpressionTimezone",
+    "StartDate",
+    "EndDate",
+    "Description",
+    "State",
+    "KmsKeyArn",
+    "FlexibleTimeWindow",
+    "ActionAfterCompletion",
+    "Target",
+)
+
+
+def _merged_schedule(current: dict, *, name: str, schedule_group: str, target: dict, **changes) -> dict:
+    """
+    The update_schedule arguments for `current` with `changes` applied. Fields this
+    package does not manage, like the description or the target's retry policy and
+    dead-letter queue, are carried over instead of being reset.
+    """
+    definition = {key: current[key] for key in _SCHEDULE_FIELDS if current.get(key) is not None}
+    definition.update(Name=name, GroupName=schedule_group, Target={**current.get("Target", {}), **target}, **changes)
+    return definition
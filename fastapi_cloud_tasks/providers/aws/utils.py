@@ -1,11 +1,105 @@
-import boto3
+import base64
+import hashlib
 import json
+import threading
 
-import io, zipfile, boto3
-from pathlib import Path
+import io, zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 import importlib.resources as pkg_resources
-from typing import Dict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+import logging
+
+from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry, get_default_registry
+
+logger = logging.getLogger(__name__)
+
+# Results of the provisioning steps, keyed by (scope, step, resource name)
+_provisioned: Dict[Hashable, object] = {}
+_provision_locks: Dict[Hashable, threading.Lock] = {}
+_provision_guard = threading.Lock()
+
+# Well above the delay handler's 10s per request, so an invocation returns its partial
+# batch response instead of timing out. Lambda refuses an SQS trigger whose queue has a
+# shorter visibility timeout than the function, and 30s is the SQS default.
+DELAY_LAMBDA_TIMEOUT_SECONDS = 30
+DELAY_LAMBDA_MEMORY_MB = 256
+
+
+class AWSInfrastructure(NamedTuple):
+    role_arn: str
+    lambda_arn: str
+    queue_url: Optional[str]
+
+
+def provision_aws_infrastructure(
+    *,
+    role_name: str = "FastAPICloudTasksRole",
+    function_name: str = "DelayerLambda",
+    queue_name: Optional[str] = "Delay-Queue",
+    clients: AWSClientRegistry | None = None,
+) -> AWSInfrastructure:
+    """
+    Creates (or looks up) the IAM role, delay Lambda and, when `queue_name` is given,
+    the SQS queue linked to it. Every step is memoized per account/region, so repeated
+    calls from many routes or builders cost nothing after the first one. The role and
+    the queue do not depend on each other and are created concurrently.
+    """
+    clients = clients or get_default_registry()
+    scope = clients.scope
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        role_future = pool.submit(
+            _memoized, (scope, "role", role_name), lambda: create_aws_cloud_tasks_role(role_name, clients=clients)
+        )
+        queue_future = None
+        if queue_name:
+            queue_future = pool.submit(
+                _memoized, (scope, "queue", queue_name), lambda: create_sqs_queue(queue_name, clients=clients)
+            )
+
+        role_arn = role_future.result()
+        lambda_arn = _memoized(
+            (scope, "lambda", function_name),
+            lambda: deploy_lambda(function_name=function_name, role_arn=role_arn, clients=clients),
+        )
+        queue_url = queue_future.result() if queue_future else None
+
+    if queue_url:
+        _memoized(
+            (scope, "link", lambda_arn, queue_url),
+            lambda: link_lambda_sqs(lambda_arn=lambda_arn, queue_url=queue_url, clients=clients),
+        )
+
+    return AWSInfrastructure(role_arn=role_arn, lambda_arn=lambda_arn, queue_url=queue_url)
+
+
+def provision_scheduler_role(
+    *,
+    role_name: str = "EventBridgeSchedulerRole",
+    clients: AWSClientRegistry | None = None,
+) -> str:
+    """
+    Creates (or looks up) the role EventBridge Scheduler invokes the delay Lambda with, once per account/region.
+    """
+    clients = clients or get_default_registry()
+    return _memoized(
+        (clients.scope, "scheduler-role", role_name),
+        lambda: create_scheduler_role(role_name, clients=clients),
+    )
+
+
+def _memoized(key: Hashable, create: Callable[[], object]):
+    with _provision_guard:
+        if key in _provisioned:
+            return _provisioned[key]
+        lock = _provision_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        if key not in _provisioned:
+            _provisioned[key] = create()
+        return _provisioned[key]
+
 
 def package_lambda_code() -> bytes:
     """
@@ -15,16 +109,23 @@ def package_lambda_code() -> bytes:
     with zipfile.ZipFile(buffer, "w") as z:
         # Read the lambda handler from the package
         with pkg_resources.open_binary("fastapi_cloud_tasks.providers.aws.resources", "delay_handler.py") as f:
-            z.writestr("delay_handler.py", f.read())
+            # A fixed timestamp keeps the archive, and so its CodeSha256, stable between builds
+            info = zipfile.ZipInfo("delay_handler.py", date_time=(1980, 1, 1, 0, 0, 0))
+            z.writestr(info, f.read())
     buffer.seek(0)
     return buffer.read()
 
-def deploy_lambda(*, function_name: str = "DelayerLambda", role_arn: str, extra_env: Dict = None):
+def deploy_lambda(
+    *,
+    function_name: str = "DelayerLambda",
+    role_arn: str,
+    extra_env: Dict = None,
+    clients: AWSClientRegistry | None = None,
+):
     """
     Deploys the packaged lambda to AWS.
     """
-    lambda_client = boto3.client("lambda")
-    iam = boto3.client("iam")
+    lambda_client = (clients or get_default_registry()).client("lambda")
     code_bytes = package_lambda_code()
 
     try:
@@ -35,48 +136,90 @@ def deploy_lambda(*, function_name: str = "DelayerLambda", role_arn: str, extra_
             Handler="delay_handler.lambda_handler",
             Code={"ZipFile": code_bytes},
             Environment={"Variables": extra_env or {}},
+            Timeout=DELAY_LAMBDA_TIMEOUT_SECONDS,
+            MemorySize=DELAY_LAMBDA_MEMORY_MB,
         )
         lambda_arn = response['Configuration']['FunctionArn']
-        print(lambda_arn)
+        logger.debug("Created delay Lambda %s", lambda_arn)
         return lambda_arn
 
     except lambda_client.exceptions.ResourceConflictException:
-        lambda_arn = lambda_client.get_function(FunctionName=function_name)['Configuration']['FunctionArn']
-        print(lambda_arn)
+        configuration = lambda_client.get_function(FunctionName=function_name)['Configuration']
+        lambda_arn = configuration['FunctionArn']
+
+        # Functions deployed by an older version of the package ran with Lambda's 3s default
+        if (configuration.get('Timeout'), configuration.get('MemorySize')) != (
+            DELAY_LAMBDA_TIMEOUT_SECONDS,
+            DELAY_LAMBDA_MEMORY_MB,
+        ):
+            lambda_client.update_function_configuration(
+                FunctionName=function_name,
+                Timeout=DELAY_LAMBDA_TIMEOUT_SECONDS,
+                MemorySize=DELAY_LAMBDA_MEMORY_MB,
+            )
+            # A second update is rejected while this one is in progress
+            lambda_client.get_waiter("function_updated").wait(FunctionName=function_name)
+
+        # Ship handler changes to functions deployed by an older version of the package
+        code_sha256 = base64.b64encode(hashlib.sha256(code_bytes).digest()).decode()
+        if configuration.get('CodeSha256') != code_sha256:
+            lambda_client.update_function_code(FunctionName=function_name, ZipFile=code_bytes)
+
+        logger.debug("Delay Lambda %s already exists", lambda_arn)
         return lambda_arn
 
-def link_lambda_sqs(lambda_arn: str, queue_url: str):
-    lambda_client = boto3.client("lambda")
-    sqs_client = boto3.client("sqs")
+def link_lambda_sqs(lambda_arn: str, queue_url: str, clients: AWSClientRegistry | None = None):
+    clients = clients or get_default_registry()
+    lambda_client = clients.client("lambda")
+    sqs_client = clients.client("sqs")
 
     queue_arn = sqs_client.get_queue_attributes(
         QueueUrl=queue_url,
         AttributeNames=["QueueArn"]
     )["Attributes"]["QueueArn"]
 
+    # The delay handler reports per-message failures so only those are redelivered
     try:
         lambda_client.create_event_source_mapping(
             EventSourceArn=queue_arn,
             FunctionName=lambda_arn,
             Enabled=True,
-            BatchSize=10
+            BatchSize=10,
+            FunctionResponseTypes=["ReportBatchItemFailures"],
         )
     except lambda_client.exceptions.ResourceConflictException:
-        print("EventSource connection exists.")
+        logger.debug("Event source mapping from %s to %s already exists", queue_arn, lambda_arn)
+        mappings = lambda_client.list_event_source_mappings(
+            EventSourceArn=queue_arn,
+            FunctionName=lambda_arn,
+        )["EventSourceMappings"]
+
+        for mapping in mappings:
+            if "ReportBatchItemFailures" not in mapping.get("FunctionResponseTypes", []):
+                lambda_client.update_event_source_mapping(
+                    UUID=mapping["UUID"],
+                    FunctionResponseTypes=["ReportBatchItemFailures"],
+                )
+
+def create_sqs_queue(queue_name: str, clients: AWSClientRegistry | None = None):
+    sqs_client = (clients or get_default_registry()).client("sqs")
 
-def create_sqs_queue(queue_name: str):
-    sqs_client = boto3.client("sqs")
+    attributes = {}
+    if queue_name.endswith(".fifo"):
+        # Content-based deduplication covers messages sent without an idempotency key
+        attributes = {"FifoQueue": "true", "ContentBasedDeduplication": "true"}
 
     sqs_response = sqs_client.create_queue(
         QueueName=queue_name,
+        Attributes=attributes,
     )
 
     queue_url = sqs_response['QueueUrl']
-    print("Queue URL", queue_url)
+    logger.debug("Using SQS queue %s", queue_url)
     return queue_url
 
-def create_aws_cloud_tasks_role(role_name="FastAPICloudTasksRole"):
-    iam = boto3.client("iam")
+def create_aws_cloud_tasks_role(role_name="FastAPICloudTasksRole", clients: AWSClientRegistry | None = None):
+    iam = (clients or get_default_registry()).client("iam")
 
     assume_policy = {
         "Version": "2012-10-17",
@@ -111,6 +254,9 @@ def create_aws_cloud_tasks_role(role_name="FastAPICloudTasksRole"):
                     "sqs:ReceiveMessage",
                     "sqs:DeleteMessage",
                     "sqs:GetQueueAttributes",
+                    # The delay Lambda honours Retry-After by keeping a message hidden longer
+                    "sqs:ChangeMessageVisibility",
+                    "sqs:GetQueueUrl",
 
                     # Lambda
                     "lambda:CreateFunction",
@@ -138,8 +284,8 @@ def create_aws_cloud_tasks_role(role_name="FastAPICloudTasksRole"):
 
     return role_arn
 
-def create_scheduler_role(role_name="EventBridgeSchedulerRole"):
-    iam = boto3.client("iam")
+def create_scheduler_role(role_name="EventBridgeSchedulerRole", clients: AWSClientRegistry | None = None):
+    iam = (clients or get_default_registry()).client("iam")
 
     assume_policy = {
         "Version": "2012-10-17",
@@ -157,7 +303,27 @@ def create_scheduler_role(role_name="EventBridgeSchedulerRole"):
             RoleName=role_name,
             AssumeRolePolicyDocument=json.dumps(assume_policy)
         )
-        return response["Role"]["Arn"]
+        role_arn = response["Role"]["Arn"]
     except iam.exceptions.EntityAlreadyExistsException:
         response = iam.get_role(RoleName=role_name)
-        return response["Role"]["Arn"]
+        role_arn = response["Role"]["Arn"]
+
+    # EventBridge Scheduler assumes this role to invoke the delay Lambda
+    policy = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {
+                "Effect": "Allow",
+                "Action": ["lambda:InvokeFunction"],
+                "Resource": "*"
+            }
+        ]
+    }
+
+    iam.put_role_policy(
+        RoleName=role_name,
+        PolicyName="SchedulerInvokeLambdaPolicy",
+        PolicyDocument=json.dumps(policy)
+    )
+
+    return role_arn
@@ -0,0 +1,250 @@
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Iterable, Tuple
+
+import rsa
+from cachetools import TTLCache
+from google.auth import crypt
+
+from fastapi_cloud_tasks.providers.gcp.exceptions import InvalidTokenError
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Google's OIDC signing keys, as a JSON Web Key Set
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class KeySet:
+    """
+    Public keys that token signatures are checked against, by key id.
+
+    Keys fetched from `url` are parsed once and kept for the response's Cache-Control
+    max-age, or `ttl_seconds` when given. A token signed with a key id the set does not
+    know triggers an early refresh, at most once per `min_refresh_interval_seconds`,
+    which picks up Google's key rotation without refetching for every forged kid. When
+    a refresh fails the previous keys stay in use.
+
+    KeySet.from_keys() builds a fixed set from local keys, e.g. for tests.
+    """
+
+    def __init__(
+        self,
+        url: str | None = GOOGLE_JWKS_URL,
+        *,
+        ttl_seconds: float | None = None,
+        min_refresh_interval_seconds: float = 30.0,
+        timeout_seconds: float = 5.0,
+    ):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_interval_seconds = min_refresh_interval_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self._verifiers: Dict[str, crypt.Verifier] = {}
+        self._expires_at = 0.0
+        self._fetched_at: float | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_keys(cls, keys: Dict[str, Any] | Iterable[Dict[str, Any]]) -> "KeySet":
+        """
+        A set that never refreshes. `keys` maps key ids to PEM public keys or certificates,
+        or is a list of RSA JWKs with their "kid".
+        """
+        key_set = cls(url=None)
+        key_set._verifiers = _parse_keys(keys if isinstance(keys, dict) else {"keys": list(keys)})
+        key_set._expires_at = float("inf")
+        return key_set
+
+    def get(self, kid: str) -> crypt.Verifier | None:
+        now = time.monotonic()
+        verifier = self._verifiers.get(kid)
+        if verifier is not None and now < self._expires_at:
+            return verifier
+
+        with self._lock:
+            if self.url is not None and (now >= self._expires_at or self._may_refresh(now)):
+                self._refresh(now)
+            return self._verifiers.get(kid)
+
+    def _may_refresh(self, now: float) -> bool:
+        return self._fetched_at is None or now - self._fetched_at >= self.min_refresh_interval_seconds
+
+    def _refresh(self, now: float):
+        # Caller must hold self._lock
+        self._fetched_at = now
+        try:
+            document, max_age = self._fetch()
+            self._verifiers = _parse_keys(document)
+        except Exception:
+            logger.exception("Failed to fetch token signing keys from %s", self.url)
+            # Keep what we have and try again once the refresh interval has passed
+            self._expires_at = now + self.min_refresh_interval_seconds
+            return
+
+        ttl = self.ttl_seconds if self.ttl_seconds is not None else max_age if max_age is not None else 3600.0
+        self._expires_at = now + ttl
+        logger.debug("Loaded %s token signing keys, valid for %ss", len(self._verifiers), ttl)
+
+    def _fetch(self) -> Tuple[Dict[str, Any], float | None]:
+        with urllib.request.urlopen(self.url, timeout=self.timeout_seconds) as response:
+            document = json.load(response)
+            max_age = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        return document, float(max_age.group(1)) if max_age else None
+
+
+class OIDCTokenVerifier:
+    """
+    Verifies the OIDC tokens Cloud Tasks and Cloud Scheduler attach to their requests
+    (oidc_delayed_hook / oidc_scheduled_hook): RS256 signature, issuer, audience,
+    expiry and, when `service_account_email` is set, the caller's service account.
+
+    The audience defaults to the URL of the receiving route, which is what Google uses
+    when the OidcToken has none; set `audience` when the hook sets a custom one.
+
+    Verified tokens are remembered by hash for up to `cache_ttl_seconds` (never past
+    their expiry), so a repeated token costs a dict lookup; signing keys come from
+    `key_set`, which in the steady state is also served from memory.
+    """
+
+    def __init__(
+        self,
+        *,
+        audience: str | Iterable[str] | None = None,
+        service_account_email: str | Iterable[str] | None = None,
+        issuers: Iterable[str] = GOOGLE_ISSUERS,
+        key_set: KeySet | None = None,
+        clock_skew_seconds: float = 30.0,
+        cache_ttl_seconds: float = 300.0,
+        cache_size: int = 4096,
+    ):
+        self.audience = _as_set(audience)
+        self.service_account_email = _as_set(service_account_email)
+        self.issuers = frozenset(issuers)
+        self.key_set = key_set or KeySet()
+        self.clock_skew_seconds = clock_skew_seconds
+
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl_seconds)
+        self._cache_lock = threading.Lock()
+
+    def cached(self, token: str, *, audience: str | None = None) -> Dict[str, Any] | None:
+        """
+        The claims of a token verified recently for this audience, or None.
+        """
+        key = (_token_hash(token), audience)
+        with self._cache_lock:
+            claims = self._cache.get(key)
+        if claims is not None and claims["exp"] + self.clock_skew_seconds > time.time():
+            return claims
+        return None
+
+    def verify(self, token: str, *, audience: str | None = None) -> Dict[str, Any]:
+        """
+        Returns the token's claims, or raises InvalidTokenError. `audience` is the URL of
+        the receiving route, used when the verifier has no audience of its own. Can block
+        on fetching keys, so call it off the event loop.
+        """
+        claims = self.cached(token, audience=audience)
+        if claims is not None:
+            return claims
+
+        header, claims, signed, signature = _split_token(token)
+        if header.get("alg") != "RS256":
+            raise InvalidTokenError(f"Unsupported signing algorithm {header.get('alg')!r}")
+
+        kid = header.get("kid", "")
+        if not isinstance(kid, str):
+            raise InvalidTokenError("Malformed token")
+        verifier = self.key_set.get(kid)
+        if verifier is None:
+            raise InvalidTokenError(f"Unknown signing key {kid!r}")
+        if not verifier.verify(signed, signature):
+            raise InvalidTokenError("Invalid signature")
+
+        self._check_claims(claims, audience)
+
+        # cache_size=0 turns the cache off
+        if self._cache.maxsize:
+            with self._cache_lock:
+                self._cache[(_token_hash(token), audience)] = claims
+        return claims
+
+    def _check_claims(self, claims: Dict[str, Any], audience: str | None):
+        now = time.time()
+        skew = self.clock_skew_seconds
+
+        if claims.get("iss") not in self.issuers:
+            raise InvalidTokenError(f"Unexpected issuer {claims.get('iss')!r}")
+
+        expected = self.audience or ({audience} if audience else None)
+        if not expected:
+            raise InvalidTokenError("No audience to check the token against")
+        token_audience = claims.get("aud")
+        token_audiences = set(token_audience) if isinstance(token_audience, list) else {token_audience}
+        if not expected & token_audiences:
+            raise InvalidTokenError(f"Unexpected audience {token_audience!r}")
+
+        if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] + skew <= now:
+            raise InvalidTokenError("Token expired")
+        if isinstance(claims.get("iat"), (int, float)) and claims["iat"] - skew > now:
+            raise InvalidTokenError("Token used before it was issued")
+
+        if self.service_account_email:
+            if claims.get("email") not in self.service_account_email or not claims.get("email_verified"):
+                raise InvalidTokenError(f"Unexpected caller {claims.get('email')!r}")
+
+
+def _split_token(token: str) -> Tuple[Dict[str, Any], Dict[str, Any], bytes, bytes]:
+    try:
+        encoded_header, encoded_claims, encoded_signature = token.split(".")
+        header = json.loads(_b64decode(encoded_header))
+        claims = json.loads(_b64decode(encoded_claims))
+        signature = _b64decode(encoded_signature)
+    except ValueError as exc:
+        raise InvalidTokenError("Malformed token") from exc
+
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise InvalidTokenError("Malformed token")
+    return header, claims, f"{encoded_header}.{encoded_claims}".encode(), signature
+
+
+def _parse_keys(document: Dict[str, Any]) -> Dict[str, crypt.Verifier]:
+    # A JWKS ({"keys": [...]}, oauth2/v3/certs) or a kid -> PEM mapping (oauth2/v1/certs)
+    if "keys" not in document:
+        return {kid: crypt.RSAVerifier.from_string(pem) for kid, pem in document.items()}
+
+    verifiers = {}
+    for jwk in document["keys"]:
+        if jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+            continue
+        public_key = rsa.PublicKey(_b64int(jwk["n"]), _b64int(jwk["e"]))
+        verifiers[jwk["kid"]] = crypt.RSAVerifier.from_string(public_key.save_pkcs1())
+    return verifiers
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64int(value: str) -> int:
+    return int.from_bytes(_b64decode(value), "big")
+
+
+def _token_hash(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _as_set(value: str | Iterable[str] | None) -> frozenset | None:
+    if value is None:
+        return None
+    return frozenset([value] if isinstance(value, str) else value)
@@ -1,70 +1,226 @@
 from urllib.parse import urlparse
-from google.cloud import tasks_v2
-from google.protobuf import timestamp_pb2
+from typing import Any, Callable
+import time
 
-import json
-from datetime import datetime, timezone, timedelta
+from google.cloud import tasks_v2
 
+from fastapi_cloud_tasks.codec import PayloadCodec, check_body_size
 from fastapi_cloud_tasks.providers.gcp.exceptions import BadMethodException
-from google.api_core.exceptions import GoogleAPICallError
+from fastapi_cloud_tasks.providers.gcp.utils import merge_headers
+from fastapi_cloud_tasks.serializers import DEFAULT_SERIALIZER, Serializer, encode_task_body, with_content_type
+from google.api_core.exceptions import AlreadyExists, GoogleAPICallError
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cloud Tasks rejects tasks with larger HTTP bodies
+MAX_CLOUD_TASKS_BODY_BYTES = 100 * 1024
+
+# Cloud Tasks rejects schedule times further ahead
+MAX_CLOUD_TASKS_DELAY_SECONDS = 30 * 24 * 3600
+
+_HTTP_METHODS = {
+    "POST": tasks_v2.HttpMethod.POST,
+    "GET": tasks_v2.HttpMethod.GET,
+    "HEAD": tasks_v2.HttpMethod.HEAD,
+    "PUT": tasks_v2.HttpMethod.PUT,
+    "DELETE": tasks_v2.HttpMethod.DELETE,
+    "PATCH": tasks_v2.HttpMethod.PATCH,
+    "OPTIONS": tasks_v2.HttpMethod.OPTIONS,
+}
+
 def gcp_create_delay_task(
     client: tasks_v2.CloudTasksClient,
     queue_path: str,
     endpoint_url: str,
     http_method: str,
-    body: dict | None = None,
+    body: Any = None,
+    delay_seconds: int = 0,
+    timeout: float = 10.0,
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    task_id: str | None = None,
+):
+    template = build_delay_task_template(
+        queue_path=queue_path,
+        endpoint_url=endpoint_url,
+        http_method=http_method,
+        serializer=serializer,
+    )
+
+    return gcp_create_delay_task_from_template(
+        client=client,
+        template=template,
+        body=body,
+        delay_seconds=delay_seconds,
+        timeout=timeout,
+        headers=headers,
+        serializer=serializer,
+        codec=codec,
+        task_id=task_id,
+    )
+
+
+async def gcp_create_delay_task_async(
+    client: tasks_v2.CloudTasksAsyncClient,
+    queue_path: str,
+    endpoint_url: str,
+    http_method: str,
+    body: Any = None,
     delay_seconds: int = 0,
     timeout: float = 10.0,
-    headers: dict | None = None
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    task_id: str | None = None,
 ):
-    # --- Validate inputs ---
+    """
+    Awaitable counterpart of gcp_create_delay_task built on CloudTasksAsyncClient,
+    so enqueueing does not block the event loop.
+    """
+    template = build_delay_task_template(
+        queue_path=queue_path,
+        endpoint_url=endpoint_url,
+        http_method=http_method,
+        serializer=serializer,
+    )
+
+    return await gcp_create_delay_task_from_template_async(
+        client=client,
+        template=template,
+        body=body,
+        delay_seconds=delay_seconds,
+        timeout=timeout,
+        headers=headers,
+        serializer=serializer,
+        codec=codec,
+        task_id=task_id,
+    )
+
+
+def build_delay_task_template(
+    *,
+    queue_path: str,
+    endpoint_url: str,
+    http_method: str,
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    pre_create_hook: Callable[[tasks_v2.CreateTaskRequest], tasks_v2.CreateTaskRequest] | None = None,
+) -> tasks_v2.CreateTaskRequest:
+    """
+    Builds the part of a CreateTaskRequest that is the same for every task of a route:
+    queue, URL, method, static headers and whatever `pre_create_hook` adds. Delayed routes
+    build it once; each task is a copy with only the body and schedule time filled in.
+    The hook runs here and not per task, so it must not depend on either of them.
+    """
     if not queue_path:
         raise ValueError("queue_path must not be empty")
     if not endpoint_url or not urlparse(endpoint_url).scheme:
         raise ValueError(f"Invalid endpoint_url: {endpoint_url}")
-    if delay_seconds < 0:
-        raise ValueError("delay_seconds must be >= 0")
-    if timeout <= 0:
-        raise ValueError("timeout must be > 0")
-    
+
+    request = tasks_v2.CreateTaskRequest(
+        parent=queue_path,
+        task=tasks_v2.Task(
+            http_request=tasks_v2.HttpRequest(
+                url=endpoint_url,
+                http_method=_convert_http_method_type(http_method),
+                headers=with_content_type(headers, (serializer or DEFAULT_SERIALIZER).content_type),
+            )
+        ),
+    )
+
+    if pre_create_hook is not None:
+        request = pre_create_hook(request)
+
+    return request
+
+
+def gcp_create_delay_task_from_template(
+    *,
+    client: tasks_v2.CloudTasksClient,
+    template: tasks_v2.CreateTaskRequest,
+    body: Any = None,
+    delay_seconds: int = 0,
+    timeout: float = 10.0,
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    task_id: str | None = None,
+):
+    _validate_delay_task_args(delay_seconds=delay_seconds, timeout=timeout)
+
     try:
-        http_request = tasks_v2.HttpRequest(
-            url = endpoint_url,
-            http_method = _convert_http_method_type(http_method),
-            headers = headers
+        request = _request_from_template(
+            template,
+            body=body,
+            delay_seconds=delay_seconds,
+            headers=headers,
+            serializer=serializer,
+            codec=codec,
+            task_id=task_id,
         )
 
-        if body:
-            http_request.body = json.dumps(body).encode()
+        response = client.create_task(request=request, timeout=timeout)
 
-        scheduled_date = _get_scheduled_delay_date(delay_seconds=delay_seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_created_task(request, delay_seconds)
 
-        delay_task = tasks_v2.Task(
-            http_request=http_request,
-            schedule_time=scheduled_date
-        )
+        return response
 
-        response = client.create_task(
-            task=delay_task,
-            parent=queue_path,
-            timeout=timeout
-        )
+    except AlreadyExists:
+        if not task_id:
+            raise
+        # Enqueued before under the same idempotency key, which is what the caller wanted
+        logger.debug("Cloud Task %s already exists", request.task.name)
+        return tasks_v2.Task(name=request.task.name)
+    except GoogleAPICallError as exc:
+        logger.exception("Google API call failed while creating Cloud Task")
+        raise RuntimeError(f"Failed to create Cloud Task: {exc}") from exc
+    except Exception as exc:
+        logger.exception("Unexpected error while creating Cloud Task")
+        raise RuntimeError(f"Unexpected error while creating Cloud Task: {exc}") from exc
+
+
+async def gcp_create_delay_task_from_template_async(
+    *,
+    client: tasks_v2.CloudTasksAsyncClient,
+    template: tasks_v2.CreateTaskRequest,
+    body: Any = None,
+    delay_seconds: int = 0,
+    timeout: float = 10.0,
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    task_id: str | None = None,
+):
+    _validate_delay_task_args(delay_seconds=delay_seconds, timeout=timeout)
 
-        logger.debug(
-            "Created Cloud Task: queue=%s, url=%s, delay=%ss, method=%s",
-            queue_path,
-            endpoint_url,
-            delay_seconds,
-            http_method,
+    try:
+        request = _request_from_template(
+            template,
+            body=body,
+            delay_seconds=delay_seconds,
+            headers=headers,
+            serializer=serializer,
+            codec=codec,
+            task_id=task_id,
         )
 
+        response = await client.create_task(request=request, timeout=timeout)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_created_task(request, delay_seconds)
+
         return response
 
+    except AlreadyExists:
+        if not task_id:
+            raise
+        # Enqueued before under the same idempotency key, which is what the caller wanted
+        logger.debug("Cloud Task %s already exists", request.task.name)
+        return tasks_v2.Task(name=request.task.name)
     except GoogleAPICallError as exc:
         logger.exception("Google API call failed while creating Cloud Task")
         raise RuntimeError(f"Failed to create Cloud Task: {exc}") from exc
@@ -73,32 +229,69 @@ def gcp_create_delay_task(
         raise RuntimeError(f"Unexpected error while creating Cloud Task: {exc}") from exc
 
 
-def _get_scheduled_delay_date(delay_seconds: int):
-    timestamp = timestamp_pb2.Timestamp()
-    current_date = datetime.now(timezone.utc)
+def check_delay_task(*, body: bytes | None, delay_seconds: int, timeout: float, codec: PayloadCodec | None = None):
+    """
+    Raises ValueError for a task Cloud Tasks would reject whenever it is sent, so it is
+    refused before being stored for later, e.g. in an outbox.
+    """
+    _validate_delay_task_args(delay_seconds=delay_seconds, timeout=timeout)
+    check_body_size(body, codec, max_body_bytes=MAX_CLOUD_TASKS_BODY_BYTES)
+
+
+def _validate_delay_task_args(*, delay_seconds: int, timeout: float):
+    if delay_seconds < 0:
+        raise ValueError("delay_seconds must be >= 0")
+    if delay_seconds > MAX_CLOUD_TASKS_DELAY_SECONDS:
+        raise ValueError(f"delay_seconds must be <= {MAX_CLOUD_TASKS_DELAY_SECONDS}")
+    if timeout <= 0:
+        raise ValueError("timeout must be > 0")
+
+
+def _request_from_template(
+    template: tasks_v2.CreateTaskRequest,
+    *,
+    body: Any,
+    delay_seconds: int,
+    headers: dict | None,
+    serializer: Serializer | None,
+    codec: PayloadCodec | None,
+    task_id: str | None = None,
+) -> tasks_v2.CreateTaskRequest:
+    body = encode_task_body(body, serializer)
+    if body is not None and codec is not None:
+        body, headers = codec.encode(body, headers or {}, max_body_bytes=MAX_CLOUD_TASKS_BODY_BYTES)
+
+    # Copy at the protobuf level, proto-plus would marshal every field of the template again
+    template_pb = tasks_v2.CreateTaskRequest.pb(template)
+    request = type(template_pb)()
+    request.CopyFrom(template_pb)
+
+    http_request = request.task.http_request
+    if headers:
+        merge_headers(http_request.headers, headers)
+    if body is not None:
+        http_request.body = body
+
+    if task_id:
+        request.task.name = f"{request.parent}/tasks/{task_id}"
+    request.task.schedule_time.FromNanoseconds(time.time_ns() + int(delay_seconds * 1_000_000_000))
+
+    return tasks_v2.CreateTaskRequest.wrap(request)
+
 
-    if delay_seconds <= 0:
-        timestamp.FromDatetime(current_date)
-        return timestamp
-    
-    scheduled_delay_date = current_date + timedelta(seconds=delay_seconds)
-    timestamp.FromDatetime(scheduled_delay_date)  # Mutates timestamp in place
-    return timestamp
+def _log_created_task(request, delay_seconds: int):
+    logger.debug(
+        "Created Cloud Task: queue=%s, url=%s, delay=%ss, method=%s",
+        request.parent,
+        request.task.http_request.url,
+        delay_seconds,
+        tasks_v2.HttpMethod(request.task.http_request.http_method).name,
+    )
 
 
 def _convert_http_method_type(http_method):
-    methodMap = {
-        "POST": tasks_v2.HttpMethod.POST,
-        "GET": tasks_v2.HttpMethod.GET,
-        "HEAD": tasks_v2.HttpMethod.HEAD,
-        "PUT": tasks_v2.HttpMethod.PUT,
-        "DELETE": tasks_v2.HttpMethod.DELETE,
-        "PATCH": tasks_v2.HttpMethod.PATCH,
-        "OPTIONS": tasks_v2.HttpMethod.OPTIONS,
-    }
-
-    method = methodMap.get(http_method, None)
+    method = _HTTP_METHODS.get(http_method, None)
 
     if method is None:
         raise BadMethodException(f"Unknown method {http_method}")
-    return method
\ No newline at end of file
+    return method
@@ -1,14 +1,30 @@
-from pydantic.v1.errors import MissingError
-from pydantic.v1.errors import PydanticValueError
+class BadMethodException(Exception):
+    pass
 
 
-class MissingParamError(MissingError):
-    msg_template = "field required: {param}"
+class InvalidTokenError(ValueError):
+    """
+    Raised when the bearer token of an incoming Cloud Tasks or Cloud Scheduler request does not verify.
+    """
 
 
-class WrongTypeError(PydanticValueError):
-    msg_template = "Expected {field} to be of type {type}"
+def __getattr__(name: str):
+    # The pydantic.v1 based errors are built on first access so importing this module stays cheap
+    if name in ("MissingParamError", "WrongTypeError"):
+        return _build_pydantic_errors()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-class BadMethodException(Exception):
-    pass
\ No newline at end of file
+def _build_pydantic_errors() -> dict:
+    global MissingParamError, WrongTypeError
+
+    from pydantic.v1.errors import MissingError
+    from pydantic.v1.errors import PydanticValueError
+
+    class MissingParamError(MissingError):
+        msg_template = "field required: {param}"
+
+    class WrongTypeError(PydanticValueError):
+        msg_template = "Expected {field} to be of type {type}"
+
+    return {"MissingParamError": MissingParamError, "WrongTypeError": WrongTypeError}
@@ -0,0 +1,90 @@
+import math
+from dataclasses import dataclass, fields
+from datetime import timedelta
+from typing import Any, Iterator, Tuple
+
+from google.cloud import tasks_v2
+
+# QueueSpec field -> update_mask path of the Queue field it manages
+_QUEUE_FIELDS = {
+    "max_dispatches_per_second": "rate_limits.max_dispatches_per_second",
+    "max_concurrent_dispatches": "rate_limits.max_concurrent_dispatches",
+    "max_attempts": "retry_config.max_attempts",
+    "max_retry_duration_seconds": "retry_config.max_retry_duration",
+    "min_backoff_seconds": "retry_config.min_backoff",
+    "max_backoff_seconds": "retry_config.max_backoff",
+    "max_doublings": "retry_config.max_doublings",
+}
+
+
+@dataclass(frozen=True)
+class QueueSpec:
+    """
+    Throughput and retry settings a Cloud Tasks queue should have. Fields left as None
+    are not managed and keep whatever the live queue has.
+
+    There is no burst size: Cloud Tasks derives max_burst_size from
+    max_dispatches_per_second and rejects updates that set it.
+
+    https://cloud.google.com/tasks/docs/reference/rpc/google.cloud.tasks.v2#ratelimits
+    """
+
+    max_dispatches_per_second: float | None = None
+    max_concurrent_dispatches: int | None = None
+    max_attempts: int | None = None
+    max_retry_duration_seconds: float | None = None
+    min_backoff_seconds: float | None = None
+    max_backoff_seconds: float | None = None
+    max_doublings: int | None = None
+
+    def to_queue(self, name: str) -> tasks_v2.Queue:
+        """
+        Builds a new queue with every managed field set.
+        """
+        queue = tasks_v2.Queue.pb(tasks_v2.Queue(name=name))
+        for path, value in self._managed():
+            _set_field(queue, path, value)
+        return tasks_v2.Queue.wrap(queue)
+
+    def diff(self, queue: tasks_v2.Queue) -> tasks_v2.UpdateQueueRequest | None:
+        """
+        Compares the spec with a live queue. Returns None when they match, otherwise an
+        update_queue request carrying only the changed fields in its update_mask.
+        """
+        current = tasks_v2.Queue.pb(queue)
+        update = type(current)(name=current.name)
+        changed = []
+
+        for path, value in self._managed():
+            if not math.isclose(_get_field(current, path), value, rel_tol=1e-9):
+                _set_field(update, path, value)
+                changed.append(path)
+
+        if not changed:
+            return None
+
+        return tasks_v2.UpdateQueueRequest(queue=tasks_v2.Queue.wrap(update), update_mask={"paths": changed})
+
+    def _managed(self) -> Iterator[Tuple[str, Any]]:
+        for spec_field in fields(self):
+            value = getattr(self, spec_field.name)
+            if value is not None:
+                yield _QUEUE_FIELDS[spec_field.name], value
+
+
+def _get_field(queue, path: str) -> float:
+    message, field = path.split(".")
+    value = getattr(getattr(queue, message), field)
+    if hasattr(value, "ToTimedelta"):
+        return value.ToTimedelta().total_seconds()
+    return value
+
+
+def _set_field(queue, path: str, value: Any):
+    message, field = path.split(".")
+    target = getattr(queue, message)
+    if target.DESCRIPTOR.fields_by_name[field].message_type is not None:
+        # Durations are given in seconds
+        getattr(target, field).FromTimedelta(timedelta(seconds=value))
+    else:
+        setattr(target, field, value)
@@ -3,12 +3,21 @@ from google.protobuf import duration_pb2, field_mask_pb2
 from google.api_core.exceptions import AlreadyExists
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 
-from fastapi_cloud_tasks.providers.gcp.utils import map_http_method_to_http_type
+from fastapi_cloud_tasks.providers.gcp.utils import map_http_method_to_http_type, merge_headers
+from fastapi_cloud_tasks.serializers import DEFAULT_SERIALIZER, Serializer, encode_task_body, with_content_type
 
-# TODO: FIX TO INCLUDE BODY AND ABSTRACT HEADERS
 logger = logging.getLogger(__name__)
 
+# Declared jobs carry this description, which is how reconciling tells them apart from jobs made elsewhere
+MANAGED_JOB_DESCRIPTION = "Managed by fastapi-cloud-tasks"
+
+# Job fields a reconcile compares and, when they differ, updates
+_RECONCILED_JOB_FIELDS = ("schedule", "time_zone", "description", "http_target", "retry_config")
+
 def gcp_create_scheduler_job(
     *,
     name: str = "",
@@ -22,46 +31,248 @@ def gcp_create_scheduler_job(
     retry_config: scheduler_v1.RetryConfig = None,
     time_zone: str = "UTC",
     headers: dict | None = None,
-    body: dict | None = None
+    body: Any = None,
+    serializer: Serializer | None = None,
 ):
-    if not name:
-        unique_id = uuid.uuid4()
-        name = f"fastapi-cloud-tasks-job-{unique_id}"
-    
-    if not retry_config:
-        retry_config = _build_default_retry_config()
-    
-    request = _create_request(http_method, endpoint_url, headers, body)
-    job_name = f"{location_path}/jobs/{name}"
-    logger.info(job_name, schedule, base_url, location_path, client, endpoint_url, http_method)
+    template = build_scheduler_job_template(
+        location_path=location_path,
+        endpoint_url=endpoint_url,
+        http_method=http_method,
+        serializer=serializer,
+    )
 
-    scheduled_job = scheduler_v1.Job(
-        name=job_name,
-        http_target=request,
+    return gcp_create_scheduler_job_from_template(
+        client=client,
+        template=template,
+        name=name,
         schedule=schedule,
+        timeout=timeout,
         retry_config=retry_config,
-        time_zone=time_zone
+        time_zone=time_zone,
+        headers=headers,
+        body=body,
+        serializer=serializer,
     )
 
-    job_request = scheduler_v1.CreateJobRequest(
+
+def build_scheduler_job_template(
+    *,
+    location_path: str,
+    endpoint_url: str,
+    http_method: str,
+    headers: dict | None = None,
+    serializer: Serializer | None = None,
+    retry_config: scheduler_v1.RetryConfig | None = None,
+    time_zone: str = "UTC",
+    pre_create_hook: Callable[[scheduler_v1.CreateJobRequest], scheduler_v1.CreateJobRequest] | None = None,
+) -> scheduler_v1.CreateJobRequest:
+    """
+    Builds the part of a CreateJobRequest shared by every job of a route, once. Each
+    schedule() call copies it and only fills in the name, schedule and body, so
+    `pre_create_hook` must not depend on those.
+    """
+    request = scheduler_v1.CreateJobRequest(
         parent=location_path,
-        job=scheduled_job
+        job=scheduler_v1.Job(
+            http_target=_create_request(
+                http_method,
+                endpoint_url,
+                with_content_type(headers, (serializer or DEFAULT_SERIALIZER).content_type),
+            ),
+            retry_config=retry_config or _build_default_retry_config(),
+            time_zone=time_zone,
+        ),
     )
 
+    if pre_create_hook is not None:
+        request = pre_create_hook(request)
+
+    return request
+
+
+def gcp_create_scheduler_job_from_template(
+    *,
+    client: scheduler_v1.CloudSchedulerClient,
+    template: scheduler_v1.CreateJobRequest,
+    name: str = "",
+    schedule: str,
+    timeout: float = 10.0,
+    retry_config: scheduler_v1.RetryConfig | None = None,
+    time_zone: str | None = None,
+    headers: dict | None = None,
+    body: Any = None,
+    serializer: Serializer | None = None,
+):
+    if not name:
+        unique_id = uuid.uuid4()
+        name = f"fastapi-cloud-tasks-job-{unique_id}"
+
+    job = build_scheduler_job_from_template(
+        template,
+        name=name,
+        schedule=schedule,
+        retry_config=retry_config,
+        time_zone=time_zone,
+        headers=headers,
+        body=body,
+        serializer=serializer,
+    )
+    job_request = scheduler_v1.CreateJobRequest(parent=template.parent, job=job)
+    logger.debug("Creating Cloud Scheduler job %s with schedule %r", job.name, schedule)
+
     try:
         response = client.create_job(request=job_request, timeout=timeout)
         logger.info(f"Created Cloud Scheduler job: {response.name}")
         return response
     except AlreadyExists:
-        logger.info(f"Job {job_name} already exists. Updating instead.")
+        logger.info(f"Job {job.name} already exists. Updating instead.")
 
         update_mask = {"paths": ["schedule", "http_target", "retry_config", "time_zone"]}
-        update_request = scheduler_v1.UpdateJobRequest(job=scheduled_job, update_mask=update_mask)
+        update_request = scheduler_v1.UpdateJobRequest(job=job_request.job, update_mask=update_mask)
         response = client.update_job(request=update_request, timeout=timeout)
 
         logger.info(f"Updated Cloud Scheduler job: {response.name}")
         return response
 
+
+def build_scheduler_job_from_template(
+    template: scheduler_v1.CreateJobRequest,
+    *,
+    name: str,
+    schedule: str,
+    retry_config: scheduler_v1.RetryConfig | None = None,
+    time_zone: str | None = None,
+    headers: dict | None = None,
+    body: Any = None,
+    serializer: Serializer | None = None,
+    description: str | None = None,
+) -> scheduler_v1.Job:
+    # Copy at the protobuf level, proto-plus would marshal every field of the template again
+    template_pb = scheduler_v1.CreateJobRequest.pb(template)
+    job = type(template_pb.job)()
+    job.CopyFrom(template_pb.job)
+
+    job.name = f"{template_pb.parent}/jobs/{name}"
+    job.schedule = schedule
+    if retry_config is not None:
+        job.retry_config.CopyFrom(scheduler_v1.RetryConfig.pb(retry_config))
+    if time_zone:
+        job.time_zone = time_zone
+    if description is not None:
+        job.description = description
+    if headers:
+        merge_headers(job.http_target.headers, headers)
+
+    body = encode_task_body(body, serializer)
+    if body is not None:
+        job.http_target.body = body
+
+    return scheduler_v1.Job.wrap(job)
+
+
+@dataclass
+class SchedulePlan:
+    """
+    What reconciling the declared schedules with Cloud Scheduler takes. `errors` is
+    filled in by gcp_apply_schedule_plan, keyed by job name.
+    """
+
+    creates: List[scheduler_v1.Job] = field(default_factory=list)
+    updates: List[Tuple[scheduler_v1.Job, List[str]]] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    errors: Dict[str, BaseException] = field(default_factory=dict)
+
+    @property
+    def changes(self) -> int:
+        return len(self.creates) + len(self.updates) + len(self.deletes)
+
+    def __str__(self) -> str:
+        lines = [f"+ {job.name} ({job.schedule})" for job in self.creates]
+        lines += [f"~ {job.name} ({', '.join(paths)})" for job, paths in self.updates]
+        lines += [f"- {name}" for name in self.deletes]
+        lines.append(
+            f"{len(self.creates)} to create, {len(self.updates)} to update, "
+            f"{len(self.deletes)} to delete, {self.unchanged} unchanged"
+        )
+        return "\n".join(lines)
+
+
+def gcp_plan_scheduler_jobs(
+    *,
+    client: scheduler_v1.CloudSchedulerClient,
+    location_path: str,
+    jobs: Iterable[scheduler_v1.Job],
+    is_managed: Callable[[scheduler_v1.Job], bool] | None = None,
+    timeout: float | None = None,
+) -> SchedulePlan:
+    """
+    Lists the location's jobs once and diffs them against `jobs`. Live jobs missing from
+    `jobs` are only deleted when `is_managed` says they belong to us, by default when
+    their description is MANAGED_JOB_DESCRIPTION, so jobs created elsewhere are left alone.
+    """
+    is_managed = is_managed or _has_managed_description
+    live = {job.name: job for job in client.list_jobs(parent=location_path, timeout=timeout)}
+    plan = SchedulePlan()
+
+    desired_names = set()
+    for job in jobs:
+        desired_names.add(job.name)
+        current = live.get(job.name)
+        if current is None:
+            plan.creates.append(job)
+            continue
+
+        job_pb, current_pb = scheduler_v1.Job.pb(job), scheduler_v1.Job.pb(current)
+        paths = [path for path in _RECONCILED_JOB_FIELDS if not _messages_equal(job_pb, current_pb, path)]
+        if paths:
+            plan.updates.append((job, paths))
+        else:
+            plan.unchanged += 1
+
+    plan.deletes = [name for name, job in live.items() if name not in desired_names and is_managed(job)]
+    return plan
+
+
+def gcp_apply_schedule_plan(
+    *,
+    client: scheduler_v1.CloudSchedulerClient,
+    plan: SchedulePlan,
+    max_workers: int = 8,
+    timeout: float = 10.0,
+) -> SchedulePlan:
+    """
+    Sends the plan's creates, updates and deletes, `max_workers` at a time. A failing
+    call does not stop the others; failures are logged and recorded in `plan.errors`.
+    """
+    calls = [
+        (job.name, lambda job=job: client.create_job(parent=job.name.rsplit("/jobs/", 1)[0], job=job, timeout=timeout))
+        for job in plan.creates
+    ]
+    calls += [
+        (
+            job.name,
+            lambda job=job, paths=paths: client.update_job(job=job, update_mask={"paths": paths}, timeout=timeout),
+        )
+        for job, paths in plan.updates
+    ]
+    calls += [(name, lambda name=name: client.delete_job(name=name, timeout=timeout)) for name in plan.deletes]
+
+    if not calls:
+        return plan
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="schedule-reconcile") as pool:
+        futures = {pool.submit(call): name for name, call in calls}
+        for future, name in futures.items():
+            exc = future.exception()
+            if exc is not None:
+                logger.error("Failed to reconcile Cloud Scheduler job %s: %s", name, exc)
+                plan.errors[name] = exc
+
+    logger.info("Reconciled Cloud Scheduler jobs: %s changes, %s failed", plan.changes, len(plan.errors))
+    return plan
+
+
 def gcp_update_scheduler_job(
     name: str,
     schedule: str,
@@ -112,18 +323,48 @@ def _build_default_retry_config() -> scheduler_v1.RetryConfig:
     return retry_config
     
 
-def _create_request(http_method: str, endpoint_url: str, headers: dict | None = None, body: dict | None = None) -> scheduler_v1.HttpTarget:
-    try:
-        request = scheduler_v1.HttpTarget()
-        request.http_method = map_http_method_to_http_type(http_method)
-        request.uri = endpoint_url
-        
-        if headers:
-            request.headers = headers
-        
-        if body:
-            request.body = body
-        
-        return request
-    except Exception as error:
-        raise error
\ No newline at end of file
+def _has_managed_description(job: scheduler_v1.Job) -> bool:
+    return job.description == MANAGED_JOB_DESCRIPTION
+
+
+def _messages_equal(left, right, field_name: str | None = None) -> bool:
+    """
+    Field by field comparison where an unset sub-message equals an empty one, so a
+    server echoing back defaults is not mistaken for a change.
+    """
+    if field_name is not None:
+        descriptor = left.DESCRIPTOR.fields_by_name[field_name]
+        left, right = getattr(left, field_name), getattr(right, field_name)
+        if descriptor.message_type is None:
+            return left == right
+
+    for descriptor in left.DESCRIPTOR.fields:
+        left_value, right_value = getattr(left, descriptor.name), getattr(right, descriptor.name)
+        if descriptor.message_type is not None and descriptor.message_type.GetOptions().map_entry:
+            if dict(left_value) != dict(right_value):
+                return False
+        elif descriptor.label == descriptor.LABEL_REPEATED:
+            if len(left_value) != len(right_value):
+                return False
+            if descriptor.message_type is None:
+                if list(left_value) != list(right_value):
+                    return False
+            elif not all(_messages_equal(a, b) for a, b in zip(left_value, right_value)):
+                return False
+        elif descriptor.message_type is not None:
+            if not _messages_equal(left_value, right_value):
+                return False
+        elif left_value != right_value:
+            return False
+    return True
+
+
+def _create_request(http_method: str, endpoint_url: str, headers: dict | None = None) -> scheduler_v1.HttpTarget:
+    request = scheduler_v1.HttpTarget()
+    request.http_method = map_http_method_to_http_type(http_method)
+    request.uri = endpoint_url
+
+    if headers:
+        request.headers = headers
+
+    return request
@@ -1,29 +1,64 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import logging
+
 from google.cloud import tasks_v2
 from google.api_core.exceptions import NotFound
-from google.cloud.scheduler_v1.types import HttpMethod
 
-def validate_queue(client: tasks_v2.CloudTasksClient, queue_path: str):
+from fastapi_cloud_tasks.providers.gcp.queue_spec import QueueSpec
+
+# Only the scheduler needs its HttpMethod enum, keep it out of the delayed route's imports
+if TYPE_CHECKING:
+    from google.cloud.scheduler_v1.types import HttpMethod
+
+logger = logging.getLogger(__name__)
+
+def validate_queue(
+    client: tasks_v2.CloudTasksClient,
+    queue_path: str,
+    spec: QueueSpec | None = None,
+    *,
+    create: bool = True,
+):
+    """
+    Makes sure the queue exists, creating it when it does not. With a `spec` the live
+    queue is brought in line with it: a missing queue is created with the spec applied,
+    an existing one gets a single update_queue carrying only the fields that differ.
+    With `create=False` a missing queue is only logged, and left alone.
+    """
     if client == None:
         client = tasks_v2.CloudTasksClient()
     
     try:
         queue = client.get_queue(name=queue_path)
-        print(f"Queue exists: ${queue.name}")
+        logger.debug("Queue exists: %s", queue.name)
     except NotFound:
-        print("Queue not found. Creating queue...")
+        if not create:
+            logger.warning("Queue %s not found and auto_create_queue is off, not creating it", queue_path)
+            return
+        logger.info("Queue %s not found, creating it", queue_path)
 
         queue_path_parts = queue_path.split("/")
         project = queue_path_parts[1]
         location = queue_path_parts[3]
-        queue_id = queue_path_parts[5]
 
         parent = f"projects/{project}/locations/{location}"
-        queue = {"name" : queue_path}
-        
+        queue = spec.to_queue(queue_path) if spec is not None else {"name": queue_path}
+
         created_queue = client.create_queue(parent=parent, queue=queue)
-        print(f"Queue Created: {created_queue.name}")
+        logger.info("Queue created: %s", created_queue.name)
+        return
+
+    update = spec.diff(queue) if spec is not None else None
+    if update is not None:
+        client.update_queue(request=update)
+        logger.info("Updated queue %s: %s", queue_path, ", ".join(update.update_mask.paths))
 
 def map_http_method_to_http_type(http_method: str) -> HttpMethod:
+    from google.cloud.scheduler_v1.types import HttpMethod
+
     method_map = {
         "POST": HttpMethod.POST,
         "GET": HttpMethod.GET,
@@ -38,4 +73,13 @@ def map_http_method_to_http_type(http_method: str) -> HttpMethod:
     return method_map[http_method]
 
 
-
+def merge_headers(target, headers: dict):
+    """
+    Sets `headers` on a protobuf headers map. HTTP headers are case-insensitive, so an
+    existing header is replaced whatever its case.
+    """
+    overridden = {key.lower() for key in headers}
+    for key in [key for key in target if key.lower() in overridden]:
+        del target[key]
+    for key, value in headers.items():
+        target[key] = str(value)
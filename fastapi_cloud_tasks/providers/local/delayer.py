@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Tuple
+
+import anyio.from_thread
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LocalTask:
+    method: str
+    path: str
+    body: bytes
+    headers: List[Tuple[bytes, bytes]]
+    timeout_seconds: float
+    name: str = field(default_factory=lambda: uuid.uuid4().hex)
+    retry_count: int = 0
+
+
+class LocalTaskScheduler:
+    """
+    Keeps delayed tasks in an asyncio timer heap and, once they are due, calls the
+    route through the app's ASGI interface in-process. At most `max_concurrency`
+    tasks run at once; like on Cloud Tasks, a task that raises, times out or answers
+    with anything but a 2xx is retried up to `max_retries` times, after its
+    Retry-After when the response has one and with exponential backoff otherwise.
+    """
+
+    def __init__(
+        self,
+        app: Callable | None = None,
+        *,
+        max_concurrency: int = 100,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 1.0,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._heap: List[Tuple[float, int, LocalTask]] = []
+        self._counter = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._runner: asyncio.Task | None = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    def bind(self, app: Callable):
+        self.app = app
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap) + len(self._in_flight)
+
+    def schedule(self, task: LocalTask, delay_seconds: float = 0):
+        """
+        Adds a task to the heap. Callable from the event loop, from the threads Starlette
+        runs sync endpoints on, or from any thread once the scheduler has started.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None and (self._loop is None or self._loop is loop):
+            self._push(task, delay_seconds)
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._push, task, delay_seconds)
+        else:
+            try:
+                anyio.from_thread.run_sync(self._push, task, delay_seconds)
+            except RuntimeError as exc:
+                raise RuntimeError("LocalTaskScheduler needs a running event loop to schedule tasks") from exc
+
+    async def aclose(self):
+        """
+        Stops the timer and waits for the tasks that are already running. Tasks still in the heap are dropped.
+        """
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._heap.clear()
+        # Let the scheduler bind to a new loop, e.g. when the app is started again in tests
+        self._loop = None
+
+    def attach_loop(self):
+        """
+        Binds the scheduler to the running event loop, so other threads can schedule tasks
+        before the first one is pushed from the loop itself. A no-op outside a loop.
+        """
+        if self._loop is not None:
+            return
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _push(self, task: LocalTask, delay_seconds: float):
+        self.attach_loop()
+
+        heapq.heappush(self._heap, (self._loop.time() + max(delay_seconds, 0), next(self._counter), task))
+        self._wakeup.set()
+
+        if self._runner is None or self._runner.done():
+            self._runner = self._loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due = self._heap[0][0]
+            now = self._loop.time()
+            if due > now:
+                # Sleep until the earliest task is due or an earlier one is pushed
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, task = heapq.heappop(self._heap)
+            await self._semaphore.acquire()
+            running = self._loop.create_task(self._dispatch(task))
+            self._in_flight.add(running)
+            running.add_done_callback(self._on_done)
+
+    def _on_done(self, running: asyncio.Task):
+        self._in_flight.discard(running)
+        self._semaphore.release()
+
+    async def _dispatch(self, task: LocalTask):
+        if self.app is None:
+            logger.error("LocalTaskScheduler has no app bound, dropping task %s", task.name)
+            return
+
+        retry_after = None
+        try:
+            status, retry_after = await asyncio.wait_for(self._call_app(task), task.timeout_seconds)
+        except Exception as exc:
+            logger.warning("Local task %s to %s failed: %r", task.name, task.path, exc)
+            status = None
+
+        if status is not None and 200 <= status < 300:
+            logger.debug("Local task %s to %s finished with status %s", task.name, task.path, status)
+            return
+
+        if task.retry_count >= self.max_retries:
+            logger.error("Local task %s to %s failed after %s retries", task.name, task.path, task.retry_count)
+            return
+
+        # A route shedding load says when to come back
+        backoff = _retry_after_seconds(retry_after)
+        if backoff is None:
+            backoff = self.retry_backoff_seconds * (2 ** task.retry_count)
+        task.retry_count += 1
+        self._push(task, backoff)
+
+    async def _call_app(self, task: LocalTask) -> Tuple[int, str | None]:
+        headers = [
+            *task.headers,
+            (b"content-length", str(len(task.body)).encode()),
+            (b"x-cloudtasks-taskname", task.name.encode()),
+            (b"x-cloudtasks-taskretrycount", str(task.retry_count).encode()),
+        ]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": task.method,
+            "scheme": "http",
+            "path": task.path,
+            "raw_path": task.path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+
+        status = 500
+        retry_after = None
+        request_sent = False
+        response_complete = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": task.body, "more_body": False}
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, retry_after
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for key, value in message.get("headers", []):
+                    if key.lower() == b"retry-after":
+                        retry_after = value.decode("latin-1")
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete.set()
+
+        await self.app(scope, receive, send)
+        return status, retry_after
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    """
+    Seconds to wait from a Retry-After header, given as seconds or as an HTTP date; None when absent or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,433 @@
+import asyncio
+import inspect
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import logging
+
+from fastapi_cloud_tasks.fanout import completed_future
+
+logger = logging.getLogger(__name__)
+
+# google.api_core exceptions worth another attempt, matched by name so the SDK is not imported here
+_RETRYABLE_GOOGLE_ERRORS = {
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "Aborted",
+    "BadGateway",
+    "GatewayTimeout",
+    "RetryError",
+}
+
+# botocore ClientError codes and connection errors worth another attempt
+_RETRYABLE_AWS_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "SlowDown",
+    "ServiceUnavailable",
+    "InternalError",
+    "InternalFailure",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+_RETRYABLE_AWS_ERRORS = {
+    "EndpointConnectionError",
+    "ConnectionClosedError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+}
+
+# Errors that carry an answer from the provider, as opposed to ones raised locally
+# before the request went out, e.g. while validating or serializing the task
+_PROVIDER_RESPONSE_ERRORS = {"GoogleAPICallError", "ClientError", "BatchEntryFailedException"}
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised instead of calling the provider while the circuit breaker is open.
+    """
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    True for transient provider errors: gRPC unavailability, throttling, timeouts and
+    connection failures. Provider helpers wrap SDK errors in RuntimeError, so the
+    __cause__ chain is searched as well.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        name = type(exc).__name__
+
+        if name in _RETRYABLE_GOOGLE_ERRORS or name in _RETRYABLE_AWS_ERRORS:
+            return True
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True
+
+        if name == "BatchEntryFailedException":
+            # SQS rejected one message of a batch: worth another attempt unless the message itself is at fault
+            if getattr(exc, "code", None) in _RETRYABLE_AWS_CODES or not getattr(exc, "sender_fault", True):
+                return True
+
+        response = getattr(exc, "response", None)
+        if name == "ClientError" and isinstance(response, dict):
+            error = response.get("Error", {})
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            if error.get("Code") in _RETRYABLE_AWS_CODES or status >= 500:
+                return True
+
+        exc = exc.__cause__
+    return False
+
+
+def is_provider_response(exc: BaseException) -> bool:
+    """
+    True when the error, or one in its __cause__ chain, is the provider answering the
+    request (a google.api_core or botocore error), rather than a failure before it was sent.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if any(cls.__name__ in _PROVIDER_RESPONSE_ERRORS for cls in type(exc).__mro__):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of the calls made in the last `window_seconds`, plus
+    `min_retries_per_second` so a quiet process can still retry. When a provider
+    is failing everything, retries then add at most `ratio` extra load instead of
+    multiplying it by the number of attempts.
+    """
+
+    def __init__(self, *, ratio: float = 0.1, min_retries_per_second: float = 1.0, window_seconds: int = 10):
+        if ratio < 0:
+            raise ValueError("ratio must be >= 0")
+        if window_seconds < 1:
+            raise ValueError("window_seconds must be >= 1")
+
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window_seconds = window_seconds
+
+        # One [second, calls, retries] bucket per second of the window
+        self._buckets = [[0, 0, 0] for _ in range(window_seconds)]
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._bucket()[1] += 1
+
+    def try_acquire_retry(self) -> bool:
+        with self._lock:
+            bucket = self._bucket()
+            now = bucket[0]
+            calls = retries = 0
+            for second, bucket_calls, bucket_retries in self._buckets:
+                if now - second < self.window_seconds:
+                    calls += bucket_calls
+                    retries += bucket_retries
+
+            allowed = max(self.ratio * calls, self.min_retries_per_second * self.window_seconds)
+            if retries + 1 > allowed:
+                return False
+            bucket[2] += 1
+            return True
+
+    def _bucket(self) -> list:
+        # Caller must hold self._lock
+        second = int(time.monotonic())
+        bucket = self._buckets[second % self.window_seconds]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0]
+        return bucket
+
+
+class CircuitBreaker:
+    """
+    Tracks provider failures over the last `window_seconds`. Once at least
+    `minimum_calls` were made and `failure_rate_threshold` of them failed, the
+    circuit opens and calls fail fast for `open_seconds`. After that a few trial
+    calls are let through (half-open): a success closes the circuit, a failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        *,
+        failure_rate_threshold: float = 0.5,
+        minimum_calls: int = 20,
+        window_seconds: float = 30.0,
+        open_seconds: float = 15.0,
+        half_open_max_calls: int = 1,
+    ):
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be in (0, 1]")
+
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._outcomes: deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            return {
+                "state": self._current_state(now),
+                "calls": len(self._outcomes),
+                "failures": self._failures,
+                "open_for_seconds": max(self._opened_at + self.open_seconds - now, 0.0)
+                if self._state == self.OPEN
+                else 0.0,
+            }
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the provider now. Every allowed call must be followed
+        by record_success(), record_failure() or, when it never reached the provider, release().
+        """
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._close()
+            elif self._state == self.CLOSED:
+                self._record(False)
+
+    def release(self):
+        """
+        Gives back an allowed call that never reached the provider, without changing state.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            if self._state == self.OPEN:
+                # A call that started before the circuit opened
+                return
+            self._record(True)
+
+            calls = len(self._outcomes)
+            if calls >= self.minimum_calls and self._failures / calls >= self.failure_rate_threshold:
+                self._open()
+
+    def _current_state(self, now: float) -> str:
+        # Caller must hold self._lock
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._trials = 0
+            logger.info("Circuit half-open, letting trial calls through")
+        return self._state
+
+    def _record(self, failed: bool):
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        logger.warning("Circuit opened, failing enqueues fast for %ss", self.open_seconds)
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        logger.info("Circuit closed")
+
+
+class EnqueuePolicy:
+    """
+    How delayed routes call their provider: up to `max_attempts` tries with full-jitter
+    exponential backoff for retryable errors, retries limited by `retry_budget`, and a
+    `circuit_breaker` that fails fast once the provider keeps failing.
+
+    When the breaker is open or the retries run out, `fallback(exc, task)` is called
+    if given and its result returned in place of the provider's; `task` holds the
+    route, body, headers and delay of what was being enqueued. Without a fallback the
+    error is raised (CircuitOpenError when the breaker is open).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 3,
+        base_delay_seconds: float = 0.1,
+        max_delay_seconds: float = 2.0,
+        retry_budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        fallback: Callable[[BaseException, Dict[str, Any]], Any] | None = None,
+        retryable: Callable[[BaseException], bool] = is_retryable,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be >= 1")
+
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.retry_budget = retry_budget or RetryBudget()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.fallback = fallback
+        self.retryable = retryable
+
+    @property
+    def state(self) -> str:
+        return self.circuit_breaker.state
+
+    def call(
+        self, function: Callable[[], Any], *, task: Dict[str, Any] | None = None, use_fallback: bool = True
+    ) -> Any:
+        """
+        Calls `function` under the policy. With use_fallback=False errors are raised even
+        when a fallback is set, for callers that retry on their own, like the outbox.
+        """
+        self.retry_budget.record_call()
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow():
+                return self._fail(CircuitOpenError("Circuit breaker is open"), task, use_fallback)
+
+            try:
+                result = function()
+            except Exception as exc:
+                if not self.retryable(exc):
+                    self._record_final(exc)
+                    raise
+
+                self.circuit_breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts or not self.retry_budget.try_acquire_retry():
+                    return self._fail(exc, task, use_fallback)
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self.circuit_breaker.record_success()
+            return result
+
+    async def acall(
+        self, function: Callable[[], Awaitable[Any]], *, task: Dict[str, Any] | None = None, use_fallback: bool = True
+    ) -> Any:
+        self.retry_budget.record_call()
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow():
+                return await self._afail(CircuitOpenError("Circuit breaker is open"), task, use_fallback)
+
+            try:
+                result = await function()
+            except Exception as exc:
+                if not self.retryable(exc):
+                    self._record_final(exc)
+                    raise
+
+                self.circuit_breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts or not self.retry_budget.try_acquire_retry():
+                    return await self._afail(exc, task, use_fallback)
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            self.circuit_breaker.record_success()
+            return result
+
+    def submit(
+        self, function: Callable[[], Future], *, task: Dict[str, Any] | None = None, use_fallback: bool = True
+    ) -> Future:
+        """
+        For calls that hand back a Future, like buffering a message for a batch send. The
+        breaker gates the call and learns from the Future's outcome; there are no retries,
+        the batch sender reports failures per message.
+        """
+        if not self.circuit_breaker.allow():
+            return completed_future(self._fail, CircuitOpenError("Circuit breaker is open"), task, use_fallback)
+
+        try:
+            future = function()
+        except Exception:
+            # Rejected before reaching the provider, e.g. a body over the size limit
+            self.circuit_breaker.release()
+            raise
+        future.add_done_callback(self._observe)
+        return future
+
+    def _observe(self, future: Future):
+        exc = future.exception()
+        if exc is None:
+            self.circuit_breaker.record_success()
+        elif self.retryable(exc):
+            self.circuit_breaker.record_failure()
+        else:
+            self._record_final(exc)
+
+    def _record_final(self, exc: BaseException):
+        # A non-retryable error: when the provider answered, it is up and the call counts
+        # as a success; an error raised locally says nothing about its health either way
+        if is_provider_response(exc):
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.release()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (attempt - 1)))
+
+    def _fail(self, exc: BaseException, task: Dict[str, Any] | None, use_fallback: bool = True) -> Any:
+        if self.fallback is None or not use_fallback:
+            raise exc
+        return self.fallback(exc, task or {})
+
+    async def _afail(self, exc: BaseException, task: Dict[str, Any] | None, use_fallback: bool = True) -> Any:
+        result = self._fail(exc, task, use_fallback)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
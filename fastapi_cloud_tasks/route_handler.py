@@ -0,0 +1,163 @@
+import zlib
+from typing import TYPE_CHECKING, Any, Callable
+
+from fastapi import HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from fastapi_cloud_tasks.codec import CONTENT_ENCODING_HEADER, PAYLOAD_REFERENCE_HEADER, PayloadCodec
+from fastapi_cloud_tasks.serializers import JSONSerializer, Serializer
+from fastapi_cloud_tasks.tracing import RequestTracer
+
+if TYPE_CHECKING:
+    from fastapi_cloud_tasks.dedup import DeliveryStore
+    from fastapi_cloud_tasks.providers.gcp.auth import OIDCTokenVerifier
+    from fastapi_cloud_tasks.shedding import ConcurrencyLimiter
+
+_UNDECODED = object()
+
+
+def build_route_handler(
+    original_route_handler: Callable,
+    *,
+    route_path: str,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    codec: PayloadCodec | None = None,
+    token_verifier: "OIDCTokenVerifier | None" = None,
+    audience: str | None = None,
+    dedup_store: "DeliveryStore | None" = None,
+    limiter: "ConcurrencyLimiter | None" = None,
+) -> Callable:
+    """
+    Wraps the handler of a task-receiving route with the optional layers configured on its builder.
+    With nothing configured the original handler is returned as is, so the route adds no per-request overhead.
+    """
+    handler = original_route_handler
+
+    # FastAPI already parses JSON with the stdlib, only other serializers need a decoding layer
+    if serializer is not None and type(serializer) is not JSONSerializer:
+        handler = _decoding_handler(handler, serializer)
+
+    # Wrapped last so it runs first: the body is decompressed before it is deserialized
+    if codec is not None:
+        handler = _codec_handler(handler, codec)
+
+    # Redeliveries are answered before anything is decoded
+    if dedup_store is not None:
+        from fastapi_cloud_tasks.dedup import dedup_handler
+
+        handler = dedup_handler(handler, dedup_store, route_path=route_path)
+
+    # Unauthenticated requests are rejected before their body is decoded, and never get a stored response
+    if token_verifier is not None:
+        handler = _token_handler(handler, token_verifier, audience=audience)
+
+    # Requests over the limit are turned away before any other work; the tracer still sees them
+    if limiter is not None:
+        handler = limiter.wrap(handler, route_path=route_path)
+
+    if tracer is not None:
+        handler = tracer.wrap(handler, route_path=route_path)
+
+    return handler
+
+
+def _decoding_handler(handler: Callable, serializer: Serializer) -> Callable:
+    content_type = serializer.content_type
+
+    async def decoding_route_handler(request: Request) -> Response:
+        if request.headers.get("content-type", "").partition(";")[0].strip() == content_type:
+            body = await request.body()
+            if body:
+                try:
+                    decoded = serializer.loads(body)
+                except Exception:
+                    # Left untouched, FastAPI answers with its usual 422
+                    decoded = _UNDECODED
+                if decoded is not _UNDECODED:
+                    request = rebuild_request(
+                        request,
+                        body=body,
+                        headers={"content-type": "application/json"},
+                        json_body=decoded,
+                    )
+        return await handler(request)
+
+    return decoding_route_handler
+
+
+def _codec_handler(handler: Callable, codec: PayloadCodec) -> Callable:
+    async def codec_route_handler(request: Request) -> Response:
+        content_encoding = request.headers.get(CONTENT_ENCODING_HEADER)
+        reference = request.headers.get(PAYLOAD_REFERENCE_HEADER)
+        if content_encoding or reference:
+            body = await request.body()
+            try:
+                if reference:
+                    # Fetching from the blob store is blocking I/O
+                    body = await run_in_threadpool(
+                        codec.decode, body, content_encoding=content_encoding, reference=reference
+                    )
+                else:
+                    body = codec.decode(body, content_encoding=content_encoding, reference=None)
+            except (ValueError, OSError, zlib.error) as exc:
+                raise HTTPException(status_code=400, detail=f"Could not decode task body: {exc}") from exc
+            request = rebuild_request(
+                request,
+                body=body,
+                headers={CONTENT_ENCODING_HEADER: None, PAYLOAD_REFERENCE_HEADER: None, "content-length": len(body)},
+            )
+        return await handler(request)
+
+    return codec_route_handler
+
+
+def _token_handler(handler: Callable, token_verifier: "OIDCTokenVerifier", *, audience: str | None) -> Callable:
+    from fastapi_cloud_tasks.providers.gcp.exceptions import InvalidTokenError
+
+    async def token_route_handler(request: Request) -> Response:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPException(status_code=401, detail="Missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+
+        claims = token_verifier.cached(token, audience=audience)
+        if claims is None:
+            try:
+                # Only the first request with a token gets here; it may have to fetch signing keys
+                claims = await run_in_threadpool(token_verifier.verify, token, audience=audience)
+            except InvalidTokenError as exc:
+                raise HTTPException(
+                    status_code=401, detail=f"Invalid token: {exc}", headers={"WWW-Authenticate": "Bearer"}
+                ) from exc
+
+        request.state.token_claims = claims
+        return await handler(request)
+
+    return token_route_handler
+
+
+def rebuild_request(
+    request: Request,
+    *,
+    body: bytes,
+    headers: dict | None = None,
+    json_body: Any = _UNDECODED,
+) -> Request:
+    """
+    Returns a copy of `request` with its body replaced and the given headers overridden, or removed when set to None.
+    When `json_body` is passed it is what FastAPI gets from request.json(), so the body is not parsed again.
+    """
+    scope = request.scope
+    if headers:
+        overridden = {key.lower().encode() for key in headers}
+        scope = dict(scope)
+        scope["headers"] = [
+            *(item for item in request.scope["headers"] if item[0] not in overridden),
+            *((key.lower().encode(), str(value).encode()) for key, value in headers.items() if value is not None),
+        ]
+
+    rebuilt = Request(scope, request.receive)
+    rebuilt._body = body
+    if json_body is not _UNDECODED:
+        rebuilt._json = json_body
+    return rebuilt
@@ -1,13 +1,24 @@
-from typing import Callable, Type
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, Type
 
-from fastapi import Request, Response
 from fastapi.routing import APIRoute
-from google.cloud import scheduler_v1
 
-from fastapi_cloud_tasks.providers.gcp.scheduler import gcp_create_scheduler_job, gcp_update_scheduler_job, gcp_delete_scheduler_job
+from fastapi_cloud_tasks.metrics import MetricLabels, MetricsSink, track_enqueue
+from fastapi_cloud_tasks.route_handler import build_route_handler
+from fastapi_cloud_tasks.serializers import DEFAULT_SERIALIZER, Serializer, encode_task_body
+from fastapi_cloud_tasks.tracing import RequestTracer
+
+# Provider SDKs are heavy to import, so they are only loaded when their builder is called
+if TYPE_CHECKING:
+    from google.cloud import scheduler_v1
 
-from fastapi_cloud_tasks.providers.aws.utils import deploy_lambda, create_aws_cloud_tasks_role
-from fastapi_cloud_tasks.providers.aws.scheduler import aws_schedule_job
+    from fastapi_cloud_tasks.providers.aws.clients import AWSClientRegistry
+    from fastapi_cloud_tasks.providers.aws.utils import AWSInfrastructure
+    from fastapi_cloud_tasks.providers.gcp.auth import OIDCTokenVerifier
+    from fastapi_cloud_tasks.providers.gcp.hooks import ScheduledHook
+    from fastapi_cloud_tasks.providers.gcp.scheduler import SchedulePlan
+    from fastapi_cloud_tasks.shedding import ConcurrencyLimiter
 
 import logging
 
@@ -17,10 +28,62 @@ def GCPScheduleRouteBuilder(
     base_url: str,
     location_path: str,
     job_create_timeout: float = 10.0,
-    client: scheduler_v1.CloudSchedulerClient | None = None
+    client: scheduler_v1.CloudSchedulerClient | None = None,
+    metrics: MetricsSink | None = None,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    pre_create_hook: ScheduledHook | None = None,
+    token_verifier: OIDCTokenVerifier | None = None,
+    limiter: ConcurrencyLimiter | None = None,
 ) -> Type[APIRoute]:
-    
+    """
+    With a `token_verifier`, requests to the routes must carry a valid OIDC token, as
+    added by oidc_scheduled_hook; the claims are in request.state.token_claims.
+
+    With a `limiter`, requests over its in-flight limit are answered with 503 and
+    Retry-After at once, so Cloud Scheduler retries them later.
+    """
+    from google.cloud import scheduler_v1
+
+    from fastapi_cloud_tasks.providers.gcp.scheduler import (
+        MANAGED_JOB_DESCRIPTION,
+        build_scheduler_job_from_template,
+        build_scheduler_job_template,
+        gcp_apply_schedule_plan,
+        gcp_create_scheduler_job_from_template,
+        gcp_delete_scheduler_job,
+        gcp_plan_scheduler_jobs,
+        gcp_update_scheduler_job,
+    )
+
     client = client or scheduler_v1.CloudSchedulerClient()
+    serializer = serializer or DEFAULT_SERIALIZER
+
+    # Filled by declare_schedule() on any route of this builder, keyed by full job name
+    declared_jobs: Dict[str, scheduler_v1.Job] = {}
+    managed_uri_prefix = f"{base_url.rstrip('/')}/"
+
+    def reconcile_schedules(*, dry_run: bool = False, max_workers: int = 8) -> SchedulePlan:
+        """
+        Brings Cloud Scheduler in line with the declared schedules: one list_jobs call, then
+        only the creates, updates and deletes that differ, sent concurrently. Deletes are
+        limited to jobs declared through this library that target `base_url`. With
+        `dry_run` the plan is logged and returned without changing anything.
+        """
+        plan = gcp_plan_scheduler_jobs(
+            client=client,
+            location_path=location_path,
+            jobs=declared_jobs.values(),
+            is_managed=lambda job: (
+                job.description == MANAGED_JOB_DESCRIPTION and job.http_target.uri.startswith(managed_uri_prefix)
+            ),
+            timeout=job_create_timeout,
+        )
+        if dry_run:
+            logger.info("Cloud Scheduler plan (dry run):\n%s", plan)
+            return plan
+
+        return gcp_apply_schedule_plan(client=client, plan=plan, max_workers=max_workers, timeout=job_create_timeout)
 
     class ScheduleRoute(APIRoute):
         def __init__(self, *args, **kwargs):
@@ -30,46 +93,91 @@ def GCPScheduleRouteBuilder(
             self.client = client
             self.endpoint_url = f"{self.base_url}{self.path}"
             self.http_method = list(self.methods)[0] if self.methods else "POST"
+            self.metric_labels = {
+                operation: MetricLabels(route=self.path, provider="gcp", queue=location_path, operation=operation)
+                for operation in ("schedule", "update_schedule", "delete_schedule")
+            }
+            # Everything that does not change between jobs is built once, hooks included
+            self.job_template = build_scheduler_job_template(
+                location_path=location_path,
+                endpoint_url=self.endpoint_url,
+                http_method=self.http_method,
+                serializer=serializer,
+                pre_create_hook=pre_create_hook,
+            )
         
         def get_route_handler(self) -> Callable:
             original_route_handler = super().get_route_handler()
             self.endpoint.schedule = self.schedule
             self.endpoint.update_schedule = self.update_schedule_job
             self.endpoint.delete_schedule = self.delete_schedule_job
+            self.endpoint.declare_schedule = self.declare_schedule
 
-            async def custom_route_handler(request: Request) -> Response:
-                endpoint_url = str(request.url)
-                print(f"Endpoint url: {endpoint_url}")
-                response: Response = await original_route_handler(request)
-                return response
-
-            return custom_route_handler
+            return build_route_handler(
+                original_route_handler,
+                route_path=self.path,
+                tracer=tracer,
+                serializer=serializer,
+                token_verifier=token_verifier,
+                audience=f"{base_url}{self.path}",
+                limiter=limiter,
+            )
 
-        def schedule(
+        def declare_schedule(
             self,
             *,
-            name: str = "",
+            name: str,
             schedule: str,
-            client = client,
             timezone: str = "UTC",
             retry_config: scheduler_v1.RetryConfig = None,
             headers: dict | None = None,
-            body: dict | None = None,  # <-- allow body here
+            body: Any = None,
         ):
-            gcp_create_scheduler_job(
+            """
+            Registers the job this route should have without calling Cloud Scheduler;
+            ScheduleRoute.reconcile_schedules() applies every declaration at once.
+            """
+            if not name:
+                raise ValueError("Declared schedules need a name")
+
+            job = build_scheduler_job_from_template(
+                self.job_template,
                 name=name,
                 schedule=schedule,
-                client=client,
-                location_path=self.location_path,
-                endpoint_url=self.endpoint_url,
-                base_url=self.base_url,
-                http_method=self.http_method,
-                timeout=job_create_timeout,
+                retry_config=retry_config,
                 time_zone=timezone,
                 headers=headers,
                 body=body,
-                retry_config=retry_config
+                serializer=serializer,
+                description=MANAGED_JOB_DESCRIPTION,
             )
+            declared_jobs[job.name] = job
+
+        def schedule(
+            self,
+            *,
+            name: str = "",
+            schedule: str,
+            client = client,
+            timezone: str = "UTC",
+            retry_config: scheduler_v1.RetryConfig = None,
+            headers: dict | None = None,
+            body: Any = None,
+        ):
+            encoded_body = encode_task_body(body, serializer)
+            with track_enqueue(metrics, self.metric_labels["schedule"], encoded_body):
+                gcp_create_scheduler_job_from_template(
+                    client=client,
+                    template=self.job_template,
+                    name=name,
+                    schedule=schedule,
+                    timeout=job_create_timeout,
+                    time_zone=timezone,
+                    headers=headers,
+                    body=encoded_body,
+                    retry_config=retry_config,
+                    serializer=serializer,
+                )
 
         def update_schedule_job(
             self,
@@ -80,16 +188,17 @@ def GCPScheduleRouteBuilder(
             update_mask: list[str] | None = None,
             **kwargs,
         ):  
-            if update_mask is None:
-                update_mask = ["schedule"] + list(kwargs.keys())
-            gcp_update_scheduler_job(
-                name=name,
-                client = client,
-                schedule=schedule,
-                update_mask=update_mask,
-                location_path=self.location_path,
-                **kwargs
-            )
+            with track_enqueue(metrics, self.metric_labels["update_schedule"], None):
+                if update_mask is None:
+                    update_mask = ["schedule"] + list(kwargs.keys())
+                gcp_update_scheduler_job(
+                    name=name,
+                    client = client,
+                    schedule=schedule,
+                    update_mask=update_mask,
+                    location_path=self.location_path,
+                    **kwargs
+                )
         
         def delete_schedule_job(
             self,
@@ -97,17 +206,67 @@ def GCPScheduleRouteBuilder(
             name,
             client = client,
         ):
-            gcp_delete_scheduler_job(
-                name=name,
-                client=client,
-                location_path=self.location_path
-            )
+            with track_enqueue(metrics, self.metric_labels["delete_schedule"], None):
+                gcp_delete_scheduler_job(
+                    name=name,
+                    client=client,
+                    location_path=self.location_path
+                )
+
+    ScheduleRoute.declared_jobs = declared_jobs
+    ScheduleRoute.reconcile_schedules = staticmethod(reconcile_schedules)
 
     return ScheduleRoute
 
 def AWSScheduleRouteBuilder(
     base_url: str,
+    events_client=None,
+    clients: AWSClientRegistry | None = None,
+    metrics: MetricsSink | None = None,
+    tracer: RequestTracer | None = None,
+    serializer: Serializer | None = None,
+    backend: str = "rules",
+    scheduler_client=None,
+    schedule_group: str = "default",
+    limiter: ConcurrencyLimiter | None = None,
 ) -> Type[APIRoute]:
+    """
+    `backend` picks where schedules live: "rules" creates one EventBridge rule per
+    schedule on the default bus, "scheduler" uses EventBridge Scheduler, which is not
+    bound by the per-bus rule quota.
+
+    With a `limiter`, requests over its in-flight limit are answered with 503 and
+    Retry-After at once.
+    """
+    from fastapi_cloud_tasks.providers.aws.clients import get_default_registry
+    from fastapi_cloud_tasks.providers.aws.utils import provision_aws_infrastructure, provision_scheduler_role
+    from fastapi_cloud_tasks.providers.aws.scheduler import (
+        SCHEDULE_BACKENDS,
+        aws_delete_schedule_job,
+        aws_schedule_job,
+        aws_update_schedule_job,
+    )
+
+    if backend not in SCHEDULE_BACKENDS:
+        raise ValueError(f"backend must be one of {SCHEDULE_BACKENDS}, got {backend!r}")
+
+    clients = (clients or get_default_registry()).with_clients(
+        {"events": events_client, "scheduler": scheduler_client}
+    )
+    serializer = serializer or DEFAULT_SERIALIZER
+    queue_label = "eventbridge" if backend == "rules" else "eventbridge-scheduler"
+
+    infrastructure = None
+    scheduler_role_arn = None
+
+    def get_infrastructure() -> AWSInfrastructure:
+        # Provisioned when the first route is built and shared by every route after it
+        nonlocal infrastructure, scheduler_role_arn
+        if infrastructure is None:
+            infrastructure = provision_aws_infrastructure(queue_name=None, clients=clients)
+            if backend == "scheduler":
+                scheduler_role_arn = provision_scheduler_role(clients=clients)
+        return infrastructure
 
     class ScheduleRoute(APIRoute):
         def __init__(self, *args, **kwargs):
@@ -115,8 +274,11 @@ def AWSScheduleRouteBuilder(
             self.base_url = base_url
             self.endpoint_url = f"{self.base_url}{self.path}"
             self.http_method = list(self.methods)[0] if self.methods else "POST"
-            self.role_arn = create_aws_cloud_tasks_role()
-            self.lambda_arn = deploy_lambda(function_name="DelayerLambda", role_arn=self.role_arn)
+            self.role_arn, self.lambda_arn, _ = get_infrastructure()
+            self.metric_labels = {
+                operation: MetricLabels(route=self.path, provider="aws", queue=queue_label, operation=operation)
+                for operation in ("schedule", "update_schedule", "delete_schedule")
+            }
         
         def get_route_handler(self) -> Callable:
             original_route_handler = super().get_route_handler()
@@ -124,13 +286,9 @@ def AWSScheduleRouteBuilder(
             self.endpoint.update_schedule = self.update_schedule_job
             self.endpoint.delete_schedule = self.delete_schedule_job
 
-            async def custom_route_handler(request: Request) -> Response:
-                endpoint_url = str(request.url)
-                print(f"Endpoint url: {endpoint_url}")
-                response: Response = await original_route_handler(request)
-                return response
-
-            return custom_route_handler
+            return build_route_handler(
+                original_route_handler, route_path=self.path, tracer=tracer, serializer=serializer, limiter=limiter
+            )
 
         def schedule(
             self,
@@ -138,33 +296,64 @@ def AWSScheduleRouteBuilder(
             name: str = "",
             schedule: str,
             headers: dict | None = None,
-            body: dict | None = None,
+            body: Any = None,
         ):
-            aws_schedule_job(
-                name=name,
-                endpoint_url=self.endpoint_url,
-                schedule=schedule,
-                headers=headers,
-                body=body, 
-                http_method=self.http_method,
-                lambda_arn=self.lambda_arn
-            )
+            encoded_body = encode_task_body(body, serializer)
+            with track_enqueue(metrics, self.metric_labels["schedule"], encoded_body):
+                aws_schedule_job(
+                    name=name or "SchedulerEventBridge",
+                    endpoint_url=self.endpoint_url,
+                    schedule=schedule,
+                    headers=headers,
+                    body=encoded_body,
+                    http_method=self.http_method,
+                    lambda_arn=self.lambda_arn,
+                    clients=clients,
+                    serializer=serializer,
+                    backend=backend,
+                    scheduler_role_arn=scheduler_role_arn,
+                    schedule_group=schedule_group,
+                )
 
         def update_schedule_job(
             self,
             *,
             name: str,
             schedule: str,
-            update_mask: list[str] | None = None,
-            **kwargs,
-        ):  
-            pass
+            headers: dict | None = None,
+            body: Any = None,
+        ):
+            """
+            Changes the schedule expression; the request sent is only replaced when `headers` or `body` are given.
+            """
+            encoded_body = encode_task_body(body, serializer)
+            with track_enqueue(metrics, self.metric_labels["update_schedule"], encoded_body):
+                aws_update_schedule_job(
+                    name=name,
+                    schedule=schedule,
+                    lambda_arn=self.lambda_arn,
+                    endpoint_url=self.endpoint_url,
+                    http_method=self.http_method,
+                    headers=headers,
+                    body=encoded_body,
+                    clients=clients,
+                    serializer=serializer,
+                    backend=backend,
+                    schedule_group=schedule_group,
+                )
         
         def delete_schedule_job(
             self,
             *,
             name,
         ):
-            pass
+            with track_enqueue(metrics, self.metric_labels["delete_schedule"], None):
+                aws_delete_schedule_job(
+                    name=name,
+                    lambda_arn=self.lambda_arn,
+                    clients=clients,
+                    backend=backend,
+                    schedule_group=schedule_group,
+                )
 
-    return ScheduleRoute
\ No newline at end of file
+    return ScheduleRoute
@@ -0,0 +1,115 @@
+import dataclasses
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class Serializer:
+    """
+    Encodes task bodies on the enqueue side and decodes them on the receiving route.
+
+    `encode_body` accepts dicts, lists, Pydantic models and dataclass instances.
+    `is_text` tells whether the output is JSON text, so it can be embedded as is in
+    the JSON envelope of an SQS message instead of being base64 encoded.
+    """
+
+    content_type = "application/json"
+    is_text = True
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def encode_body(self, body: Any) -> bytes:
+        return self.dumps(to_primitive(body))
+
+
+class JSONSerializer(Serializer):
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+    def encode_body(self, body: Any) -> bytes:
+        # pydantic-core serializes models straight to JSON bytes without building a dict first
+        if isinstance(body, BaseModel):
+            return body.model_dump_json().encode()
+        return self.dumps(to_primitive(body))
+
+
+class ORJSONSerializer(Serializer):
+    def __init__(self, option: int | None = None):
+        try:
+            import orjson
+        except ImportError as exc:
+            raise ImportError("ORJSONSerializer requires the orjson package: pip install orjson") from exc
+
+        self._orjson = orjson
+        # orjson serializes dataclasses, datetimes and UUIDs natively
+        self.option = option if option is not None else orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj, option=self.option)
+
+    def loads(self, data: bytes) -> Any:
+        return self._orjson.loads(data)
+
+    def encode_body(self, body: Any) -> bytes:
+        if isinstance(body, BaseModel):
+            return self._orjson.dumps(body.model_dump(mode="json"), option=self.option)
+        return self._orjson.dumps(body, option=self.option)
+
+
+class MsgpackSerializer(Serializer):
+    content_type = "application/msgpack"
+    is_text = False
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError as exc:
+            raise ImportError("MsgpackSerializer requires the msgpack package: pip install msgpack") from exc
+
+        self._msgpack = msgpack
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+DEFAULT_SERIALIZER = JSONSerializer()
+
+
+def to_primitive(body: Any) -> Any:
+    if isinstance(body, BaseModel):
+        return body.model_dump(mode="json")
+    if dataclasses.is_dataclass(body) and not isinstance(body, type):
+        return dataclasses.asdict(body)
+    return body
+
+
+def encode_task_body(body: Any, serializer: Serializer | None = None) -> bytes | None:
+    """
+    Returns the body bytes to send, or None when the task has no body. Bytes are passed through unchanged.
+    """
+    if body is None or (isinstance(body, dict) and not body):
+        return None
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    return (serializer or DEFAULT_SERIALIZER).encode_body(body)
+
+
+def with_content_type(headers: dict | None, content_type: str) -> dict:
+    """
+    Adds a Content-Type header unless the caller already set one.
+    """
+    headers = dict(headers or {})
+    if not any(key.lower() == "content-type" for key in headers):
+        headers["Content-Type"] = content_type
+    return headers
@@ -0,0 +1,149 @@
+import math
+import threading
+import time
+from typing import Callable, Dict, List
+
+from fastapi import Request, Response
+
+
+class ConcurrencyLimiter:
+    """
+    Load shedding for task-receiving routes: at most `max_in_flight` requests run at
+    once, and any request above that is answered right away with `status_code` (503,
+    or 429) and a Retry-After of `retry_after_seconds`. Cloud Tasks backs the queue off
+    on those, and the delay_handler Lambda hides the message for that long, so the
+    excess waits in the queue instead of piling up inside the server.
+
+    One limiter is meant to be shared by every route of a service; stats() reports the
+    admitted and shed counts per route.
+    """
+
+    def __init__(self, max_in_flight: int = 100, *, status_code: int = 503, retry_after_seconds: int = 1):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        if status_code not in (429, 503):
+            raise ValueError("status_code must be 429 or 503")
+
+        self.status_code = status_code
+        self.retry_after_seconds = retry_after_seconds
+        self._limit = float(max_in_flight)
+        self._in_flight = 0
+        # route -> [admitted, shed]
+        self._counts: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "admitted": sum(admitted for admitted, _ in self._counts.values()),
+                "shed": sum(shed for _, shed in self._counts.values()),
+                "routes": {route: {"admitted": admitted, "shed": shed} for route, (admitted, shed) in self._counts.items()},
+            }
+
+    def try_acquire(self, route_path: str = "") -> bool:
+        with self._lock:
+            counts = self._counts.get(route_path)
+            if counts is None:
+                counts = self._counts[route_path] = [0, 0]
+            if self._in_flight >= int(self._limit):
+                counts[1] += 1
+                return False
+            self._in_flight += 1
+            counts[0] += 1
+            return True
+
+    def release(self, latency_seconds: float):
+        with self._lock:
+            self._in_flight -= 1
+            self._on_sample(latency_seconds)
+
+    def wrap(self, handler: Callable, *, route_path: str) -> Callable:
+        retry_after = str(self.retry_after_seconds)
+
+        async def limited_route_handler(request: Request) -> Response:
+            if not self.try_acquire(route_path):
+                # No HTTPException: a shed request should cost as little as possible
+                return Response(status_code=self.status_code, headers={"Retry-After": retry_after})
+
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                self.release(time.perf_counter() - started)
+
+        return limited_route_handler
+
+    def _on_sample(self, latency_seconds: float):
+        # Caller must hold self._lock. The fixed limit ignores latency.
+        pass
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    A ConcurrencyLimiter whose limit follows the handler latency (a gradient limiter).
+    The baseline is the lowest latency seen over the last one or two `window` samples,
+    i.e. the latency without queueing. While samples stay within `tolerance` times the
+    baseline the limit grows towards limit + sqrt(limit); once requests queue and
+    latency climbs past that, it shrinks in proportion, towards at most half. Each
+    sample moves the limit `smoothing` of the way, and it stays between `min_limit`
+    and `max_limit`.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        tolerance: float = 1.5,
+        smoothing: float = 0.05,
+        window: int = 500,
+        status_code: int = 503,
+        retry_after_seconds: int = 1,
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit")
+        if tolerance < 1:
+            raise ValueError("tolerance must be >= 1")
+
+        super().__init__(initial_limit, status_code=status_code, retry_after_seconds=retry_after_seconds)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.window = window
+
+        self._previous_min = math.inf
+        self._window_min = math.inf
+        self._samples = 0
+
+    def _on_sample(self, latency_seconds: float):
+        if latency_seconds <= 0:
+            return
+
+        # The baseline is renewed every window, so it can also go up when the handler gets slower for good
+        self._window_min = min(self._window_min, latency_seconds)
+        self._samples += 1
+        if self._samples >= self.window:
+            self._previous_min, self._window_min, self._samples = self._window_min, math.inf, 0
+        baseline = min(self._previous_min, self._window_min)
+
+        # Only grow when the limit is what holds requests back, not while traffic is light
+        if self._in_flight + 1 < self._limit / 2 and latency_seconds <= baseline * self.tolerance:
+            return
+
+        gradient = max(0.5, min(1.0, self.tolerance * baseline / latency_seconds))
+        new_limit = self._limit * gradient + math.sqrt(self._limit)
+        self._limit = min(
+            max(self._limit * (1 - self.smoothing) + new_limit * self.smoothing, self.min_limit), self.max_limit
+        )